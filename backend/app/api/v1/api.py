@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, items, contracts, users, analytics, categories, admin, pricing, blockchain, wallet
+from app.api.v1.endpoints import auth, items, contracts, users, analytics, categories, admin, pricing, blockchain, wallet, notifications
 
 api_router = APIRouter()
 
@@ -12,4 +12,5 @@ api_router.include_router(analytics.router, prefix="/analytics", tags=["analytic
 api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 api_router.include_router(pricing.router, prefix="/pricing", tags=["pricing"])
 api_router.include_router(blockchain.router, prefix="/blockchain", tags=["blockchain"])
-api_router.include_router(wallet.router, prefix="/wallet", tags=["wallet"])
\ No newline at end of file
+api_router.include_router(wallet.router, prefix="/wallet", tags=["wallet"])
+api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
\ No newline at end of file
@@ -4,13 +4,15 @@ Admin endpoints.
 
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.utils.dependencies import get_current_admin_user
 from app.services.admin import AdminService
+from app.services.export import validate_export_format
 from app.schemas.common import Response, PaginatedResponse
 from app.models.user import User, UserRole
 
@@ -23,15 +25,22 @@ def get_admin_service(db: Session = Depends(get_db)) -> AdminService:
     return AdminService(db)
 
 
+def get_admin_read_service(db: Session = Depends(get_read_db)) -> AdminService:
+    """Get admin service dependency for reports and exports (read replica)."""
+    from app.services.admin import AdminService
+    return AdminService(db)
+
+
 @router.get("/dashboard", response_model=Response[dict])
 async def get_admin_dashboard(
-    admin_service: AdminService = Depends(get_admin_service),
+    max_staleness: Optional[int] = Query(None, ge=0, description="Maximum snapshot age in seconds"),
+    admin_service: AdminService = Depends(get_admin_read_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
     Get admin dashboard with key metrics.
     """
-    dashboard_data = admin_service.get_dashboard_overview()
+    dashboard_data = admin_service.get_dashboard_overview(max_staleness)
     return Response(data=dashboard_data)
 
 
@@ -185,10 +194,10 @@ async def resolve_dispute(
 
 
 @router.get("/reports/activity", response_model=Response[dict])
-async def get_activity_report(
+def get_activity_report(
     start_date: datetime,
     end_date: datetime,
-    admin_service: AdminService = Depends(get_admin_service),
+    admin_service: AdminService = Depends(get_admin_read_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
@@ -199,10 +208,10 @@ async def get_activity_report(
 
 
 @router.get("/reports/financial", response_model=Response[dict])
-async def get_financial_report(
+def get_financial_report(
     start_date: datetime,
     end_date: datetime,
-    admin_service: AdminService = Depends(get_admin_service),
+    admin_service: AdminService = Depends(get_admin_read_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
@@ -304,13 +313,27 @@ async def backup_database(
 
 @router.get("/export/users", response_model=Response[str])
 async def export_users_data(
-    format: str = Query("csv", description="Export format: csv, json"),
-    admin_service: AdminService = Depends(get_admin_service),
+    format: str = Query("csv", description="Export format: csv, json, parquet"),
+    background: bool = Query(False, description="Write the file in a background job"),
+    admin_service: AdminService = Depends(get_admin_read_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
-    Export users data.
-    """
+    Export users data to a file.
+    
+    With background=true the export runs in a Celery job and the admin
+    is notified with a download link when it is ready.
+    """
+    validate_export_format(format)
+    
+    if background:
+        from app.tasks import export_data_task
+        task = export_data_task.delay("users", format, str(current_user.id))
+        return Response(
+            data=task.id,
+            message="Users export queued"
+        )
+    
     file_url = admin_service.export_users_data(format)
     return Response(
         data=file_url,
@@ -318,17 +341,51 @@ async def export_users_data(
     )
 
 
+@router.get("/export/users/stream")
+async def stream_users_export(
+    format: str = Query("csv", description="Export format: csv, json"),
+    admin_service: AdminService = Depends(get_admin_read_service),
+    current_user: User = Depends(get_current_admin_user)
+) -> Any:
+    """
+    Stream users export as a file download.
+    """
+    chunks, media_type, filename = admin_service.stream_users_export(format)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/export/analytics", response_model=Response[str])
 async def export_analytics_data(
     start_date: datetime,
     end_date: datetime,
-    format: str = Query("csv", description="Export format: csv, json"),
-    admin_service: AdminService = Depends(get_admin_service),
+    format: str = Query("csv", description="Export format: csv, json, parquet"),
+    background: bool = Query(False, description="Write the file in a background job"),
+    admin_service: AdminService = Depends(get_admin_read_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
-    Export analytics data.
-    """
+    Export analytics data to a file.
+    
+    With background=true the export runs in a Celery job and the admin
+    is notified with a download link when it is ready.
+    """
+    validate_export_format(format)
+    
+    if background:
+        from app.tasks import export_data_task
+        task = export_data_task.delay(
+            "analytics", format, str(current_user.id),
+            start_date.isoformat(), end_date.isoformat()
+        )
+        return Response(
+            data=task.id,
+            message="Analytics export queued"
+        )
+    
     file_url = admin_service.export_analytics_data(start_date, end_date, format)
     return Response(
         data=file_url,
@@ -336,6 +393,25 @@ async def export_analytics_data(
     )
 
 
+@router.get("/export/analytics/stream")
+async def stream_analytics_export(
+    start_date: datetime,
+    end_date: datetime,
+    format: str = Query("csv", description="Export format: csv, json"),
+    admin_service: AdminService = Depends(get_admin_read_service),
+    current_user: User = Depends(get_current_admin_user)
+) -> Any:
+    """
+    Stream analytics export as a file download.
+    """
+    chunks, media_type, filename = admin_service.stream_analytics_export(start_date, end_date, format)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.post("/bulk/email", response_model=Response[dict])
 async def send_bulk_email(
     subject: str,
@@ -372,7 +448,7 @@ async def toggle_maintenance_mode(
 
 @router.delete("/cache/clear", response_model=Response[None])
 async def clear_cache(
-    cache_type: str = Query("all", description="Cache type: all, redis, memory"),
+    cache_type: str = Query("all", description="Cache type: all, redis, reports, memory"),
     admin_service: AdminService = Depends(get_admin_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
@@ -8,17 +8,17 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.utils.dependencies import get_current_user, get_current_admin_user
 from app.services.analytics import AnalyticsService
-from app.schemas.common import Response
+from app.schemas.common import Response, PaginatedResponse
 from app.models.user import User
 
 router = APIRouter()
 
 
-def get_analytics_service(db: Session = Depends(get_db)) -> AnalyticsService:
-    """Get analytics service dependency."""
+def get_analytics_service(db: Session = Depends(get_read_db)) -> AnalyticsService:
+    """Get analytics service dependency (read replica)."""
     from app.services.analytics import AnalyticsService
     return AnalyticsService(db)
 
@@ -26,31 +26,33 @@ def get_analytics_service(db: Session = Depends(get_db)) -> AnalyticsService:
 @router.get("/dashboard", response_model=Response[dict])
 async def get_dashboard_stats(
     period: str = Query("30d", description="Period: 7d, 30d, 90d, 1y"),
+    max_staleness: Optional[int] = Query(None, ge=0, description="Maximum snapshot age in seconds"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
     Get dashboard statistics (admin only).
     """
-    stats = analytics_service.get_dashboard_stats(period)
+    stats = analytics_service.get_dashboard_stats(period, max_staleness)
     return Response(data=stats)
 
 
 @router.get("/items/popular", response_model=Response[List[dict]])
-async def get_popular_items(
+def get_popular_items(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     limit: int = Query(10, ge=1, le=50, description="Number of items"),
+    mode: str = Query("top", description="Ranking: top, trending"),
     analytics_service: AnalyticsService = Depends(get_analytics_service)
 ) -> Any:
     """
     Get popular items analytics.
     """
-    items = analytics_service.get_popular_items(period, limit)
+    items = analytics_service.get_popular_items(period, limit, mode)
     return Response(data=items)
 
 
 @router.get("/items/categories", response_model=Response[List[dict]])
-async def get_categories_stats(
+def get_categories_stats(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service)
 ) -> Any:
@@ -62,7 +64,7 @@ async def get_categories_stats(
 
 
 @router.get("/items/price-trends", response_model=Response[List[dict]])
-async def get_price_trends(
+def get_price_trends(
     category_id: Optional[uuid.UUID] = Query(None, description="Category filter"),
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service)
@@ -75,7 +77,7 @@ async def get_price_trends(
 
 
 @router.get("/users/activity", response_model=Response[List[dict]])
-async def get_user_activity(
+def get_user_activity(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
@@ -88,7 +90,7 @@ async def get_user_activity(
 
 
 @router.get("/users/retention", response_model=Response[dict])
-async def get_user_retention(
+def get_user_retention(
     period: str = Query("30d", description="Period: 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
@@ -100,8 +102,23 @@ async def get_user_retention(
     return Response(data=retention)
 
 
+@router.get("/users/cohorts", response_model=Response[dict])
+def get_cohort_retention(
+    period: str = Query("90d", description="Signup window: 30d, 90d, 1y"),
+    granularity: str = Query("week", description="Cohort granularity: week, month"),
+    activity: str = Query("any", description="Activity: logins, contracts, views, any"),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    current_user: User = Depends(get_current_admin_user)
+) -> Any:
+    """
+    Get signup cohort retention matrix (admin only).
+    """
+    cohorts = analytics_service.get_cohort_retention(period, granularity, activity)
+    return Response(data=cohorts)
+
+
 @router.get("/contracts/completion-rate", response_model=Response[dict])
-async def get_contract_completion_rate(
+def get_contract_completion_rate(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
@@ -114,7 +131,7 @@ async def get_contract_completion_rate(
 
 
 @router.get("/revenue", response_model=Response[dict])
-async def get_revenue_analytics(
+def get_revenue_analytics(
     period: str = Query("30d", description="Period: 7d, 30d, 90d, 1y"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
@@ -157,7 +174,7 @@ async def get_item_recommendations(
 
 
 @router.get("/geography", response_model=Response[List[dict]])
-async def get_geography_analytics(
+def get_geography_analytics(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
@@ -196,30 +213,50 @@ async def get_my_analytics(
     return Response(data=stats)
 
 
-@router.get("/my/items/performance", response_model=Response[List[dict]])
+@router.get("/my/items/performance", response_model=PaginatedResponse[dict])
 async def get_my_items_performance(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
+    page: int = Query(1, ge=1, description="Page number"),
+    size: int = Query(20, ge=1, le=100, description="Page size"),
+    sort_by: str = Query("revenue", description="Sort field: revenue, views, favorites, contracts, conversion, price, title"),
+    sort_order: str = Query("desc", description="Sort order"),
     current_user: User = Depends(get_current_user),
     analytics_service: AnalyticsService = Depends(get_analytics_service)
 ) -> Any:
     """
     Get current user's items performance analytics.
     """
-    performance = analytics_service.get_user_items_performance(current_user.id, period)
-    return Response(data=performance)
+    return analytics_service.get_user_items_performance(
+        current_user.id, period, page, size, sort_by, sort_order
+    )
 
 
 @router.post("/ml/retrain", response_model=Response[dict])
 async def retrain_ml_models(
-    model_type: str = Query("all", description="Model type: all, rental_prediction, recommendations"),
+    model_type: str = Query("all", description="Model type: all, rental_prediction, pricing"),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_admin_user)
 ) -> Any:
     """
-    Retrain ML models (admin only).
+    Queue ML models retraining (admin only).
+    
+    Returns task IDs; poll /ml/training/{task_id} for progress.
     """
     result = analytics_service.retrain_ml_models(model_type)
     return Response(
         data=result,
         message="ML models retraining started"
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/ml/training/{task_id}", response_model=Response[dict])
+async def get_ml_training_status(
+    task_id: str,
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    current_user: User = Depends(get_current_admin_user)
+) -> Any:
+    """
+    Get ML training task progress (admin only).
+    """
+    training_status = analytics_service.get_ml_training_status(task_id)
+    return Response(data=training_status)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Notifications endpoints.
+"""
+
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Body
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+import uuid
+
+from app.core.database import get_db
+from app.utils.dependencies import get_current_user
+from app.services.notification import NotificationService
+from app.services.notification_stream import notification_hub, is_valid_event_id
+from app.schemas.common import Response
+from app.models.user import User
+
+router = APIRouter()
+
+
+def get_notification_service(db: Session = Depends(get_db)) -> NotificationService:
+    """Get notification service dependency."""
+    return NotificationService(db)
+
+
+@router.get("/unread-count", response_model=Response[dict])
+async def get_unread_count(
+    current_user: User = Depends(get_current_user),
+    notification_service: NotificationService = Depends(get_notification_service)
+) -> Any:
+    """
+    Get count of unread notifications.
+    """
+    count = notification_service.get_unread_count(current_user.id)
+    return Response(data={"unread_count": count})
+
+
+@router.post("/read", response_model=Response[dict])
+async def mark_notifications_read(
+    notification_ids: List[uuid.UUID] = Body(..., embed=True, description="Notification IDs"),
+    current_user: User = Depends(get_current_user),
+    notification_service: NotificationService = Depends(get_notification_service)
+) -> Any:
+    """
+    Mark selected notifications as read.
+    """
+    count = notification_service.mark_notifications_read(current_user.id, notification_ids)
+    return Response(
+        data={"marked_count": count},
+        message="Notifications marked as read"
+    )
+
+
+@router.post("/read-all", response_model=Response[dict])
+async def mark_all_notifications_read(
+    before: Optional[datetime] = Body(None, embed=True, description="Only notifications created before"),
+    current_user: User = Depends(get_current_user),
+    notification_service: NotificationService = Depends(get_notification_service)
+) -> Any:
+    """
+    Mark all notifications as read.
+    """
+    count = notification_service.mark_all_notifications_read(current_user.id, before)
+    return Response(
+        data={"marked_count": count},
+        message="All notifications marked as read"
+    )
+
+
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[str] = Query(None, description="Resume after this event ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Stream user notifications as Server-Sent Events.
+
+    Clients reconnect with the Last-Event-ID header (or last_event_id
+    query parameter) to receive events missed while disconnected.
+    """
+    user_id = current_user.id
+    resume_from = last_event_id_header or last_event_id
+
+    if resume_from and not is_valid_event_id(resume_from):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Last-Event-ID"
+        )
+
+    # Соединение с БД не нужно на время жизни стрима
+    db.close()
+
+    try:
+        # Поднимаем общую подписку заранее, чтобы вернуть 503 вместо оборванного стрима
+        await notification_hub.start()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Notification stream is not available"
+        )
+
+    return StreamingResponse(
+        notification_hub.stream(user_id, resume_from),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
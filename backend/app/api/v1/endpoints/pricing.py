@@ -8,9 +8,11 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.utils.dependencies import get_current_user, get_current_admin_user
+from app.core.config import settings
 from app.services.pricing_service import PricingService
+from app.services.pricing_engine import get_season
 from app.schemas.common import Response
 from app.models.user import User
 from pydantic import BaseModel, Field
@@ -36,6 +38,8 @@ class PricingRecommendationResponse(BaseModel):
     estimated_bookings_increase: float
     estimated_revenue_change: float
     risk_assessment: str
+    tier: Optional[str] = Field(None, description="Уровень движка: precomputed, ml или heuristic")
+    latency_ms: Optional[float] = Field(None, description="Время ответа уровня, мс")
     
     class Config:
         from_attributes = True
@@ -51,6 +55,15 @@ class AutoPricingSettings(BaseModel):
     update_frequency_hours: int = Field(24, ge=1, le=168, description="Частота обновления в часах")
 
 
+class PriceSimulationRequest(BaseModel):
+    """Запрос симуляции выручки на сетке цен."""
+    
+    item_ids: List[uuid.UUID] = Field(..., min_length=1, description="ID товаров")
+    min_change_percentage: float = Field(-50.0, ge=-99.0, le=0.0, description="Минимальное изменение цены в %")
+    max_change_percentage: float = Field(50.0, ge=0.0, le=200.0, description="Максимальное изменение цены в %")
+    step_percentage: float = Field(1.0, gt=0.0, le=50.0, description="Шаг сетки в %")
+
+
 class PricingAnalyticsResponse(BaseModel):
     """Ответ с аналитикой по ценообразованию."""
     
@@ -68,19 +81,25 @@ def get_pricing_service(db: Session = Depends(get_db)) -> PricingService:
     return PricingService(db)
 
 
+def get_pricing_read_service(db: Session = Depends(get_read_db)) -> PricingService:
+    """Get pricing service dependency for read-only endpoints (read replica)."""
+    return PricingService(db)
+
+
 @router.get("/recommendation/{item_id}", response_model=Response[PricingRecommendationResponse])
 async def get_item_pricing_recommendation(
     item_id: uuid.UUID,
     target_date: Optional[datetime] = Query(None, description="Целевая дата для анализа"),
+    budget_ms: Optional[int] = Query(None, ge=1, le=settings.PRICING_MAX_LATENCY_BUDGET_MS, description="Бюджет времени, мс"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить рекомендацию по ценообразованию для товара.
     """
     try:
         recommendation = pricing_service.get_pricing_recommendation(
-            item_id, current_user.id, target_date
+            item_id, current_user.id, target_date, budget_ms
         )
         
         return Response(
@@ -98,15 +117,16 @@ async def get_item_pricing_recommendation(
 async def get_bulk_pricing_recommendations(
     category_id: Optional[uuid.UUID] = Query(None, description="Фильтр по категории"),
     limit: Optional[int] = Query(50, ge=1, le=100, description="Максимальное количество"),
+    budget_ms: Optional[int] = Query(None, ge=1, le=settings.PRICING_MAX_LATENCY_BUDGET_MS, description="Бюджет времени, мс"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить рекомендации по ценообразованию для всех товаров пользователя.
     """
     try:
         recommendations = pricing_service.get_bulk_recommendations(
-            current_user.id, category_id, limit
+            current_user.id, category_id, limit, budget_ms
         )
         
         recommendation_responses = [
@@ -125,6 +145,35 @@ async def get_bulk_pricing_recommendations(
         )
 
 
+@router.post("/simulate", response_model=Response[List[Dict[str, Any]]])
+async def simulate_prices(
+    request: PriceSimulationRequest,
+    current_user: User = Depends(get_current_user),
+    pricing_service: PricingService = Depends(get_pricing_read_service)
+) -> Any:
+    """
+    Смоделировать букинги и выручку товаров на сетке цен и найти цену с максимальной выручкой.
+    """
+    try:
+        simulations = pricing_service.simulate_prices(
+            current_user.id,
+            request.item_ids,
+            request.min_change_percentage,
+            request.max_change_percentage,
+            request.step_percentage
+        )
+        
+        return Response(
+            data=simulations,
+            message=f"Simulated {len(simulations)} items"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.post("/apply/{item_id}", response_model=Response[Dict[str, Any]])
 async def apply_pricing_recommendation(
     item_id: uuid.UUID,
@@ -155,7 +204,7 @@ async def apply_pricing_recommendation(
 async def get_category_pricing_insights(
     category_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить инсайты по ценообразованию для категории.
@@ -178,7 +227,7 @@ async def get_category_pricing_insights(
 async def get_pricing_analytics(
     period_days: int = Query(30, ge=1, le=365, description="Период анализа в днях"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить аналитику по ценообразованию для пользователя.
@@ -258,7 +307,7 @@ async def get_pricing_history(
     item_id: uuid.UUID,
     limit: int = Query(50, ge=1, le=200, description="Максимальное количество записей"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить историю изменения цен для товара.
@@ -300,11 +349,56 @@ async def schedule_pricing_updates(
         )
 
 
+@router.get("/admin/auto-pricing/runs/{run_id}", response_model=Response[Dict[str, Any]])
+async def get_auto_pricing_run(
+    run_id: uuid.UUID,
+    current_user: User = Depends(get_current_admin_user),
+    pricing_service: PricingService = Depends(get_pricing_service)
+) -> Any:
+    """
+    Получить метрики запуска автопрайсинга (только для админов).
+    """
+    try:
+        run = pricing_service.get_auto_pricing_run(run_id)
+        
+        return Response(
+            data=run,
+            message="Auto-pricing run retrieved successfully"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/admin/tiers/metrics", response_model=Response[Dict[str, Any]])
+async def get_pricing_tier_metrics(
+    current_user: User = Depends(get_current_admin_user),
+    pricing_service: PricingService = Depends(get_pricing_read_service)
+) -> Any:
+    """
+    Получить метрики уровней движка ценообразования (только для админов).
+    """
+    try:
+        metrics = pricing_service.get_pricing_tier_stats()
+        
+        return Response(
+            data=metrics,
+            message="Pricing tier metrics retrieved successfully"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get("/admin/category/{category_id}/insights", response_model=Response[Dict[str, Any]])
 async def get_admin_category_insights(
     category_id: uuid.UUID,
     current_user: User = Depends(get_current_admin_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить полные инсайты по категории (только для админов).
@@ -328,7 +422,7 @@ async def get_user_pricing_analytics_admin(
     user_id: uuid.UUID,
     period_days: int = Query(30, ge=1, le=365, description="Период анализа в днях"),
     current_user: User = Depends(get_current_admin_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить аналитику по ценообразованию для конкретного пользователя (только для админов).
@@ -360,7 +454,7 @@ async def get_user_pricing_analytics_admin(
 async def get_item_market_position(
     item_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить рыночную позицию товара.
@@ -397,7 +491,7 @@ async def get_competitive_analysis(
     price_range_min: Optional[float] = Query(None, description="Минимальная цена для анализа"),
     price_range_max: Optional[float] = Query(None, description="Максимальная цена для анализа"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить конкурентный анализ для категории.
@@ -434,7 +528,7 @@ async def get_optimization_suggestions(
     limit: int = Query(10, ge=1, le=50, description="Максимальное количество предложений"),
     min_impact: float = Query(5.0, ge=0.0, le=100.0, description="Минимальное влияние на выручку в %"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить предложения по оптимизации цен.
@@ -560,7 +654,7 @@ async def bulk_apply_recommendations(
 async def get_seasonal_pricing_trends(
     category_id: Optional[uuid.UUID] = Query(None, description="Фильтр по категории"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить сезонные тренды ценообразования.
@@ -568,7 +662,7 @@ async def get_seasonal_pricing_trends(
     try:
         # Базовые сезонные факторы
         seasonal_data = {
-            "current_season": pricing_service.pricing_model._get_season(datetime.utcnow()),
+            "current_season": get_season(datetime.utcnow()),
             "seasonal_factors": {
                 "spring": 1.0,
                 "summer": 1.2,
@@ -606,7 +700,7 @@ async def get_seasonal_pricing_trends(
 async def get_pricing_performance_summary(
     period_days: int = Query(30, ge=7, le=365, description="Период анализа в днях"),
     current_user: User = Depends(get_current_user),
-    pricing_service: PricingService = Depends(get_pricing_service)
+    pricing_service: PricingService = Depends(get_pricing_read_service)
 ) -> Any:
     """
     Получить сводку по эффективности ценообразования.
@@ -633,8 +727,8 @@ async def get_pricing_performance_summary(
                 ]),
                 "low_risk_optimizations": analytics["risk_distribution"].get("low", 0)
             },
-            "market_position": self._analyze_overall_market_position(analytics),
-            "next_steps": self._generate_next_steps(analytics)
+            "market_position": _analyze_overall_market_position(analytics),
+            "next_steps": _generate_next_steps(analytics)
         }
         
         return Response(
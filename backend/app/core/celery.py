@@ -6,6 +6,7 @@ Celery configuration for background tasks.
 """
 
 from celery import Celery
+from celery.schedules import crontab
 from app.core.config import settings
 
 # Create Celery app
@@ -40,6 +41,17 @@ celery_app.conf.task_routes = {
     'app.tasks.send_welcome_email_task': {'queue': 'email'},
     'app.tasks.send_contract_notification_task': {'queue': 'email'},
     'app.tasks.update_item_analytics': {'queue': 'analytics'},
+    'app.tasks.refresh_dashboard_snapshots': {'queue': 'analytics'},
+    'app.tasks.export_data_task': {'queue': 'analytics'},
+    'app.tasks.refresh_pricing_features': {'queue': 'analytics'},
+    'app.tasks.refresh_pricing_dimensions': {'queue': 'analytics'},
+    'app.tasks.refresh_category_price_stats': {'queue': 'analytics'},
+    'app.tasks.refresh_pricing_recommendations': {'queue': 'analytics'},
+    'app.tasks.compute_pricing_recommendations': {'queue': 'analytics'},
+    'app.tasks.fit_price_elasticities': {'queue': 'analytics'},
+    'app.tasks.train_ml_model': {'queue': 'ml_training'},
+    'app.tasks.run_auto_pricing': {'queue': 'pricing'},
+    'app.tasks.apply_auto_pricing_chunk': {'queue': 'pricing'},
     'app.tasks.process_blockchain_transaction': {'queue': 'blockchain'},
 }
 
@@ -53,6 +65,49 @@ celery_app.conf.beat_schedule = {
         'task': 'app.tasks.update_item_analytics',
         'schedule': 1800.0,  # Run every 30 minutes
     },
+    'refresh-dashboard-snapshots': {
+        'task': 'app.tasks.refresh_dashboard_snapshots',
+        'schedule': float(settings.DASHBOARD_SNAPSHOT_REFRESH_INTERVAL),
+    },
+    'refresh-pricing-features': {
+        'task': 'app.tasks.refresh_pricing_features',
+        'schedule': float(settings.PRICING_FEATURES_REFRESH_INTERVAL),
+    },
+    'refresh-pricing-dimensions': {
+        'task': 'app.tasks.refresh_pricing_dimensions',
+        'schedule': float(settings.PRICING_DIMENSIONS_REFRESH_INTERVAL),
+    },
+    'refresh-category-price-stats': {
+        'task': 'app.tasks.refresh_category_price_stats',
+        'schedule': float(settings.CATEGORY_PRICE_STATS_REFRESH_INTERVAL),
+    },
+    'refresh-pricing-recommendations': {
+        'task': 'app.tasks.refresh_pricing_recommendations',
+        # Ночной пересчет (вместе с полным пересчетом признаков)
+        'schedule': crontab(hour=settings.PRICING_RECOMMENDATIONS_HOUR, minute=0),
+    },
+    'fit-price-elasticities': {
+        'task': 'app.tasks.fit_price_elasticities',
+        'schedule': float(settings.PRICE_ELASTICITY_REFIT_INTERVAL),
+    },
+    'run-auto-pricing': {
+        'task': 'app.tasks.run_auto_pricing',
+        'schedule': float(settings.AUTO_PRICING_INTERVAL),
+    },
+    'retrain-pricing-model': {
+        'task': 'app.tasks.train_ml_model',
+        'schedule': float(settings.MODEL_RETRAIN_INTERVAL),
+        'args': ('pricing',),
+    },
+    'retrain-rental-prediction-model': {
+        'task': 'app.tasks.train_ml_model',
+        'schedule': float(settings.MODEL_RETRAIN_INTERVAL),
+        'args': ('rental_prediction',),
+    },
+    'purge-old-notifications': {
+        'task': 'app.tasks.purge_old_notifications',
+        'schedule': 86400.0,  # Run once a day
+    },
 }
 
 # Настройки для разработки
@@ -32,6 +32,16 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DATABASE_REPLICA_URLS: Union[str, List[str]] = []  # Через запятую или JSON-список
+    DATABASE_REPLICA_MAX_LAG_SECONDS: int = 30  # Больше - чтение уходит в primary
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL: int = 10
+    
+    @field_validator("DATABASE_REPLICA_URLS", mode="before")
+    @classmethod
+    def assemble_replica_urls(cls, v: Union[str, List[str]]) -> List[str]:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        return v
     
     # CORS
     BACKEND_CORS_ORIGINS: Union[str, List[AnyHttpUrl]] = []
@@ -73,6 +83,10 @@ class Settings(BaseSettings):
                 return [item.strip() for item in v.split(",")]
         return v
     
+    # Data exports
+    EXPORT_DIR: str = "exports"
+    EXPORT_BATCH_SIZE: int = 1000  # Строк на чанк / row group, размер окна серверного курсора
+    
     # Email Settings
     EMAIL_HOST: Optional[str] = None
     EMAIL_PORT: Optional[int] = None
@@ -96,12 +110,94 @@ class Settings(BaseSettings):
     # Redis Settings (for caching)
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Notification stream (SSE)
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: int = 15
+    NOTIFICATION_STREAM_QUEUE_SIZE: int = 100
+    NOTIFICATION_STREAM_HISTORY_SIZE: int = 200  # Событий на пользователя для Last-Event-ID
+    
+    # Notification retention
+    NOTIFICATION_RETENTION_DAYS: int = 90  # Прочитанные уведомления старше N дней
+    NOTIFICATION_PURGE_BATCH_SIZE: int = 5000
+    NOTIFICATION_ARCHIVE_ENABLED: bool = True  # False = удалять без архивации
+    
+    # Dashboard snapshots
+    DASHBOARD_SNAPSHOT_MAX_STALENESS: int = 300  # Секунд, после которых снимок обновляется в фоне
+    DASHBOARD_SNAPSHOT_TTL: int = 86400
+    DASHBOARD_SNAPSHOT_REFRESH_INTERVAL: int = 240
+    
+    # Analytics rollups
+    ANALYTICS_USE_ROLLUPS: bool = True
+    ANALYTICS_ROLLUP_BACKFILL_DAYS: int = 365  # Глубина первой сборки / full_rebuild
+    ANALYTICS_ROLLUP_LOOKBACK_DAYS: int = 1  # Пересчитываемые дни до high-water mark
+    ANALYTICS_ROLLUP_RECONCILE_HOURS: int = 24  # Период полной сверки listed_items/listed_price_sum
+    
+    # Popularity ranking
+    POPULARITY_VIEW_WEIGHT: float = 1.0
+    POPULARITY_FAVORITE_WEIGHT: float = 3.0
+    POPULARITY_RENTAL_WEIGHT: float = 10.0
+    POPULARITY_TRENDING_HALF_LIFE_DAYS: float = 3.0  # Вес активности падает вдвое за N дней
+    
+    # Search tracking
+    SEARCH_TRACKING_ENABLED: bool = True
+    SEARCH_TRACKING_MAX_QUERIES_PER_DAY: int = 10000  # Размер дневного top-N запросов
+    SEARCH_TRACKING_RETENTION_DAYS: int = 400
+    SEARCH_TRENDING_CACHE_SECONDS: int = 300
+    
+    # Report cache
+    REPORT_CACHE_ENABLED: bool = True
+    REPORT_CACHE_TTL: int = 300  # Секунд, после которых отчет пересчитывается в фоне
+    REPORT_CACHE_STALE_TTL: int = 3600  # Сколько хранить устаревший отчет
+    REPORT_CACHE_ALIGN_SECONDS: int = 300  # Округление дат в ключе кэша
+    REPORT_CACHE_LOCK_TIMEOUT: int = 60
+    
+    # Pricing feature store
+    PRICING_FEATURES_REFRESH_INTERVAL: int = 900  # Инкрементальное обновление, секунд
+    PRICING_DIMENSIONS_REFRESH_INTERVAL: int = 3600  # Пересчет спроса по брендам и локациям, секунд
+    PRICING_RECOMMENDATIONS_HOUR: int = 3  # Час (UTC) ночного пересчета рекомендаций
+    PRICING_RECOMMENDATIONS_BATCH_SIZE: int = 500  # Товаров на задачу пересчета
+    PRICING_RECOMMENDATION_REFRESH_DEDUP_SECONDS: int = 300  # Не чаще одного фонового пересчета товара, секунд
+    CATEGORY_PRICE_QUANTILES: int = 100  # Шагов сетки квантилей цен категории
+    CATEGORY_PRICE_STATS_MAX_AGE: int = 3600  # Срок жизни распределения цен категории в Redis, секунд
+    CATEGORY_PRICE_STATS_REFRESH_INTERVAL: int = 60  # Пересчет категорий с изменившимися ценами, секунд
+    COMPETITION_INDEX_CHECK_INTERVAL: int = 30  # Как часто сверять версии категорий индекса конкуренции, секунд
+    COMPETITION_INDEX_MAX_AGE: int = 300  # Максимальный возраст категории индекса, секунд
+    
+    # Pricing engine
+    PRICING_LATENCY_BUDGET_MS: int = 250  # Бюджет времени на запрос рекомендаций по умолчанию, мс
+    PRICING_MAX_LATENCY_BUDGET_MS: int = 5000
+    
+    # Auto-pricing
+    AUTO_PRICING_INTERVAL: int = 900  # Как часто искать конфиги к применению, секунд
+    AUTO_PRICING_MAX_CONFIGS_PER_RUN: int = 5000
+    AUTO_PRICING_CHUNK_SIZE: int = 50  # Конфигов на задачу воркера
+    AUTO_PRICING_BATCH_SIZE: int = 500  # Товаров на один вызов модели
+    AUTO_PRICING_CLAIM_TIMEOUT: int = 1800  # Через сколько секунд захват незавершенного чанка истекает
+    
+    # Price elasticity simulator
+    PRICE_ELASTICITY_REFIT_INTERVAL: int = 86400  # Переоценка эластичностей, секунд
+    PRICE_ELASTICITY_WINDOW_DAYS: int = 30  # Окно букингов до и после изменения цены
+    PRICE_ELASTICITY_LOOKBACK_DAYS: int = 365  # Глубина истории цен для оценки
+    PRICE_ELASTICITY_PRIOR_WEIGHT: int = 20  # Вес априорной эластичности (в изменениях цены)
+    PRICE_ELASTICITY_MIN: float = -5.0
+    PRICE_ELASTICITY_MAX: float = -0.1
+    PRICE_ELASTICITY_CACHE_SECONDS: int = 300
+    PRICE_SIMULATION_MAX_ITEMS: int = 100
+    PRICE_SIMULATION_MAX_POINTS: int = 1001  # Точек ценовой сетки на товар
+    
     # Celery Settings
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     
     # ML Model Settings
     MODEL_PATH: str = "models"
+    MODEL_REGISTRY_CHECK_INTERVAL: int = 30  # Как часто проверять новую версию модели, секунд
+    MODEL_REGISTRY_KEEP_VERSIONS: int = 5
+    MODEL_TRAINING_DEDUP_SECONDS: int = 3600  # Не ставить повторное обучение модели чаще, секунд
+    MODEL_RETRAIN_INTERVAL: int = 86400  # Плановое переобучение моделей, секунд
+    MODEL_TRAINING_TIME_LIMIT: int = 2 * 60 * 60  # Лимит времени задачи обучения, секунд
+    ML_TRAINING_CHUNK_SIZE: int = 5000  # Строк обучающей выборки на порцию (server-side cursor)
+    ML_TRAINING_HOLDOUT_FRACTION: float = 0.2
+    ML_TRAINING_SGD_EPOCHS: int = 5  # Проходов по данным для моделей с partial_fit
     
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = False
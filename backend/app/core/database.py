@@ -2,11 +2,15 @@
 Database configuration and session management.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
+from fastapi import Request
 import redis
-from typing import Generator
+import itertools
+import logging
+import time
+from typing import Any, Dict, Generator, List, Optional
 
 from app.core.config import settings
 from app.models.base import Base
@@ -20,6 +24,37 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+logger = logging.getLogger(__name__)
+
+# Read replicas (reports, exports, ML training). Без реплик чтение идет
+# в primary, но в read-only транзакции.
+replica_engines = [
+    create_engine(url, pool_pre_ping=True, echo=settings.DEBUG)
+    for url in settings.DATABASE_REPLICA_URLS
+]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+PrimaryReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine.execution_options(postgresql_readonly=True)
+)
+
+READ_ROUTING_KEY = "db:read_routing"
+
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+_replica_cycle = itertools.cycle(range(len(replica_engines)))
+# index -> (checked_at, lag in seconds or None if unreachable)
+_replica_lag_cache: Dict[int, tuple] = {}
+
 # Redis setup
 try:
     redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
@@ -43,6 +78,97 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+def get_replica_lag(index: int) -> Optional[float]:
+    """
+    Get replication lag of a replica, cached for DATABASE_REPLICA_LAG_CHECK_INTERVAL.
+    
+    Args:
+        index: Replica index in DATABASE_REPLICA_URLS
+        
+    Returns:
+        Lag in seconds or None if the replica is unreachable
+    """
+    now = time.monotonic()
+    cached = _replica_lag_cache.get(index)
+    if cached and now - cached[0] < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+        return cached[1]
+    
+    try:
+        with replica_engines[index].connect() as connection:
+            lag = float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0)
+    except Exception as e:
+        logger.warning(f"Replica {index} lag check failed: {e}")
+        lag = None
+    
+    _replica_lag_cache[index] = (now, lag)
+    return lag
+
+def _record_read_routing(route: str, target: str) -> None:
+    """Count read session routing per route (best-effort)."""
+    if redis_client is None:
+        return
+    try:
+        redis_client.hincrby(READ_ROUTING_KEY, f"{route}|{target}", 1)
+    except Exception:
+        pass
+
+def get_read_session(route: str = "unknown") -> Session:
+    """
+    Open a read-only session on a replica within the lag budget.
+    
+    Replicas are tried round-robin; if none is reachable and within
+    DATABASE_REPLICA_MAX_LAG_SECONDS the session falls back to the primary.
+    The caller must close the session.
+    
+    Args:
+        route: Route or job name for routing metrics
+        
+    Returns:
+        Database session
+    """
+    for _ in range(len(replica_engines)):
+        index = next(_replica_cycle)
+        lag = get_replica_lag(index)
+        if lag is not None and lag <= settings.DATABASE_REPLICA_MAX_LAG_SECONDS:
+            _record_read_routing(route, "replica")
+            return ReplicaSessionLocals[index]()
+    
+    _record_read_routing(route, "fallback" if replica_engines else "primary")
+    return PrimaryReadSessionLocal()
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Read-only database dependency for report endpoints.
+    
+    Yields:
+        Database session on a replica or the primary
+    """
+    route = request.scope.get("route")
+    db = get_read_session(route.path if route else request.url.path)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_routing_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get read session routing counters.
+    
+    Returns:
+        Counts by route and target (replica, fallback, primary)
+    """
+    if redis_client is None:
+        return {}
+    
+    stats: Dict[str, Dict[str, int]] = {}
+    try:
+        for field, count in redis_client.hgetall(READ_ROUTING_KEY).items():
+            route, target = field.rsplit("|", 1)
+            stats.setdefault(route, {})[target] = int(count)
+    except Exception as e:
+        logger.warning(f"Failed to read routing stats: {e}")
+    return stats
+
 def get_redis() -> redis.Redis:
     """
     Get Redis client.
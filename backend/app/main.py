@@ -16,6 +16,7 @@ from app.core.config import settings
 from app.core.database import engine
 from app.models.base import Base
 from app.api.v1.api import api_router
+from app.services.notification_stream import notification_hub
 from app.utils.exceptions import (
     CustomHTTPException,
     ValidationException,
@@ -247,6 +248,7 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event."""
     logger.info("Shutting down application")
+    await notification_hub.close()
 
 # Root endpoint
 @app.get("/")
@@ -9,7 +9,8 @@ from app.models.contract import (
     Contract, ContractMessage, Payment, Dispute, ContractHistory,
     ContractStatus, PaymentStatus, DisputeStatus
 )
-from app.models.notification import Notification, NotificationType
+from app.models.notification import Notification, NotificationArchive, NotificationType
+from app.models.analytics import DailyCategoryStats, DailyItemStats, DailyUserStats, UserLoginDay, AnalyticsRollupState
 
 __all__ = [
     "Base",
@@ -17,5 +18,6 @@ __all__ = [
     "Item", "Category", "ItemStatus", "ItemCondition", "Favorite", "ItemView", "Review",
     "Contract", "ContractMessage", "Payment", "Dispute", "ContractHistory",
     "ContractStatus", "PaymentStatus", "DisputeStatus",
-    "Notification", "NotificationType"
+    "Notification", "NotificationArchive", "NotificationType",
+    "DailyCategoryStats", "DailyItemStats", "DailyUserStats", "UserLoginDay", "AnalyticsRollupState"
 ]
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Analytics rollup models.
+"""
+
+from sqlalchemy import Column, String, Date, DateTime, Integer, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+
+from app.models.base import Base
+
+
+class DailyCategoryStats(Base):
+    """Daily activity rollup by category."""
+
+    __tablename__ = "analytics_daily_category_stats"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    date = Column(Date, nullable=False, index=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False, index=True)
+
+    # Items created that day (listed = currently active)
+    new_items = Column(Integer, default=0, nullable=False)
+    listed_items = Column(Integer, default=0, nullable=False)
+    listed_price_sum = Column(Numeric(28, 8), default=0, nullable=False)
+
+    # Contracts
+    new_contracts = Column(Integer, default=0, nullable=False)
+    completed_contracts = Column(Integer, default=0, nullable=False)
+    revenue = Column(Numeric(28, 8), default=0, nullable=False)  # In ETH, by completed_at
+
+    # Engagement
+    views = Column(Integer, default=0, nullable=False)
+    favorites = Column(Integer, default=0, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("date", "category_id", name="uq_analytics_daily_category"),
+    )
+
+    def __repr__(self):
+        return f"<DailyCategoryStats(date={self.date}, category_id={self.category_id})>"
+
+
+class DailyItemStats(Base):
+    """Daily engagement rollup by item (only days with activity are stored)."""
+
+    __tablename__ = "analytics_daily_item_stats"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    date = Column(Date, nullable=False, index=True)
+    item_id = Column(UUID(as_uuid=True), ForeignKey("items.id"), nullable=False, index=True)
+
+    views = Column(Integer, default=0, nullable=False)
+    favorites = Column(Integer, default=0, nullable=False)
+    rentals = Column(Integer, default=0, nullable=False)  # Contracts created that day
+
+    __table_args__ = (
+        UniqueConstraint("date", "item_id", name="uq_analytics_daily_item"),
+    )
+
+    def __repr__(self):
+        return f"<DailyItemStats(date={self.date}, item_id={self.item_id})>"
+
+
+class DailyUserStats(Base):
+    """Daily user activity rollup."""
+
+    __tablename__ = "analytics_daily_user_stats"
+
+    date = Column(Date, primary_key=True)
+    registrations = Column(Integer, default=0, nullable=False)
+    logins = Column(Integer, default=0, nullable=False)  # Users whose last login fell on that day
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DailyUserStats(date={self.date})>"
+
+
+class UserLoginDay(Base):
+    """Days on which a user logged in (one row per user and day)."""
+
+    __tablename__ = "analytics_user_login_days"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True, index=True)
+
+    def __repr__(self):
+        return f"<UserLoginDay(user_id={self.user_id}, date={self.date})>"
+
+
+class AnalyticsRollupState(Base):
+    """High-water marks of incremental analytics jobs."""
+
+    __tablename__ = "analytics_rollup_state"
+
+    name = Column(String(100), primary_key=True)
+    high_water_mark = Column(DateTime(timezone=True), nullable=False)
+    reconciled_at = Column(DateTime(timezone=True))  # Last full recount of listed totals
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AnalyticsRollupState(name={self.name}, high_water_mark={self.high_water_mark})>"
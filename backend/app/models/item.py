@@ -4,7 +4,7 @@ Item model for rental items.
 
 from sqlalchemy import (
     Column, String, Text, Boolean, DateTime, Integer, 
-    Numeric, JSON, ForeignKey, Enum as SQLEnum
+    Numeric, JSON, ForeignKey, Computed, Enum as SQLEnum
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
@@ -72,6 +72,14 @@ class Item(Base):
     model = Column(String(100))
     year = Column(Integer)
     
+    # Нормализованные ключи бренда и локации (справочники спроса в ценообразовании)
+    brand_key = Column(String(100), Computed(
+        "nullif(lower(regexp_replace(btrim(brand), '\\s+', ' ', 'g')), '')", persisted=True
+    ), index=True)
+    location_key = Column(String(200), Computed(
+        "nullif(lower(regexp_replace(btrim(location), '\\s+', ' ', 'g')), '')", persisted=True
+    ), index=True)
+    
     # Media
     images = Column(JSON, default=list)  # List of image URLs
     documents = Column(JSON, default=list)  # List of document URLs
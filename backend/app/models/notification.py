@@ -4,7 +4,7 @@ Notification model for user notifications.
 
 from sqlalchemy import (
     Column, String, Text, Boolean, DateTime, JSON,
-    ForeignKey, Enum as SQLEnum
+    ForeignKey, Index, Enum as SQLEnum
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
@@ -84,5 +84,38 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
     
+    __table_args__ = (
+        # Лента пользователя и непрочитанные
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # Очистка старых прочитанных (пачки по created_at без фильтра по user_id)
+        Index("ix_notifications_read_created", "created_at", postgresql_where=is_read == True),
+    )
+    
+    def __repr__(self):
+        return f"<Notification(id={self.id}, type={self.type})>"
+
+
+class NotificationArchive(Base):
+    """Archived read notifications moved out by the retention policy."""
+    
+    __tablename__ = "notifications_archive"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    
+    title = Column(String(200), nullable=False)
+    message = Column(Text)
+    type = Column(SQLEnum(NotificationType))
+    action_url = Column(String(500))
+    action_text = Column(String(100))
+    is_read = Column(Boolean, default=True)
+    is_sent = Column(Boolean, default=False)
+    data = Column(JSON, default=dict)
+    
+    created_at = Column(DateTime(timezone=True))
+    read_at = Column(DateTime(timezone=True))
+    sent_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
     def __repr__(self):
-        return f"<Notification(id={self.id}, type={self.type})>"
\ No newline at end of file
+        return f"<NotificationArchive(id={self.id}, user_id={self.user_id})>"
\ No newline at end of file
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, Text, Boolean, DateTime, Integer, Numeric, JSON, ForeignKey
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Integer, Float, Numeric, JSON, ForeignKey, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.models.base import Base
+from app.models.item import ItemStatus
 import uuid
 
 
@@ -66,6 +67,7 @@ class AutoPricingConfiguration(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_applied_at = Column(DateTime(timezone=True))
+    claimed_at = Column(DateTime(timezone=True))  # Захвачен запуском автопрайсинга
     
     # Связи
     user = relationship("User")
@@ -85,6 +87,8 @@ class PricingModelMetrics(Base):
     # Информация о модели
     model_type = Column(String(50), nullable=False)  # demand_prediction, price_optimization
     model_version = Column(String(20), nullable=False)
+    artifact_path = Column(String(500))  # Каталог версии в реестре моделей
+    is_active = Column(Boolean, default=False, index=True)  # Текущая опубликованная версия
     
     # Метрики качества
     accuracy_score = Column(Numeric(5, 4))
@@ -109,3 +113,156 @@ class PricingModelMetrics(Base):
     def __repr__(self):
         return f"<PricingModelMetrics(type={self.model_type}, accuracy={self.accuracy_score})>"
 
+
+
+class ItemPricingFeatures(Base):
+    """Предрасчитанные признаки товара для модели ценообразования."""
+    
+    __tablename__ = "pricing_item_features"
+    
+    item_id = Column(UUID(as_uuid=True), ForeignKey("items.id"), primary_key=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False, index=True)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Рыночные факторы
+    brand_popularity_score = Column(Float, default=0.5, nullable=False)
+    category_avg_price = Column(Float, default=0, nullable=False)
+    category_median_price = Column(Float, default=0, nullable=False)
+    similar_items_count = Column(Integer, default=0, nullable=False)
+    competition_density = Column(Float, default=0, nullable=False)
+    location_demand_score = Column(Float, default=0.5, nullable=False)
+    
+    # Факторы спроса
+    booking_rate_7d = Column(Float, default=0, nullable=False)
+    booking_rate_30d = Column(Float, default=0, nullable=False)
+    cancellation_rate = Column(Float, default=0, nullable=False)
+    
+    # Владелец
+    owner_rating = Column(Float, default=0, nullable=False)
+    owner_total_items = Column(Integer, default=0, nullable=False)
+    owner_completion_rate = Column(Float, default=0, nullable=False)
+    owner_response_time_score = Column(Float, default=0.8, nullable=False)
+    
+    # Поля товара на момент расчета: по ним ищутся изменившиеся товары
+    # (Item.updated_at меняется и при каждом просмотре)
+    item_price = Column(Numeric(20, 8))
+    item_status = Column(SQLEnum(ItemStatus))
+    brand_key = Column(String(100))
+    location_key = Column(String(200))
+    
+    # Меняется, только если изменились значения признаков
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<ItemPricingFeatures(item_id={self.item_id}, computed_at={self.computed_at})>"
+
+
+class ItemPricingRecommendation(Base):
+    """Предрасчитанная рекомендация по цене товара (ночной пересчет)."""
+    
+    __tablename__ = "pricing_recommendations"
+    
+    item_id = Column(UUID(as_uuid=True), ForeignKey("items.id"), primary_key=True)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False, index=True)
+    
+    # Рекомендация
+    current_price = Column(Float, nullable=False)
+    recommended_price = Column(Float, nullable=False)
+    price_change_percentage = Column(Float, nullable=False)
+    confidence_score = Column(Float, nullable=False)
+    reasoning = Column(JSON, default=list)
+    expected_demand_change = Column(Float, nullable=False)
+    market_position = Column(String(20), nullable=False)
+    
+    # Корректировки и прогнозы
+    seasonal_adjustment = Column(Float, nullable=False)
+    competition_adjustment = Column(Float, nullable=False)
+    demand_adjustment = Column(Float, nullable=False)
+    estimated_bookings_increase = Column(Float, nullable=False)
+    estimated_revenue_change = Column(Float, nullable=False)
+    risk_assessment = Column(String(10), nullable=False)
+    
+    # Версия модели ('heuristic', пока модель не обучена) и время расчета
+    model_version = Column(String(20), nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<ItemPricingRecommendation(item_id={self.item_id}, model_version={self.model_version})>"
+
+
+class AutoPricingRun(Base):
+    """Запуск автопрайсинга и его пропускная способность."""
+    
+    __tablename__ = "auto_pricing_runs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    
+    # Шардирование
+    configs_claimed = Column(Integer, default=0, nullable=False)
+    chunks_total = Column(Integer, default=0, nullable=False)
+    chunks_completed = Column(Integer, default=0, nullable=False)
+    
+    # Результаты (увеличиваются задачами чанков)
+    configs_processed = Column(Integer, default=0, nullable=False)
+    items_evaluated = Column(Integer, default=0, nullable=False)
+    prices_changed = Column(Integer, default=0, nullable=False)
+    items_skipped = Column(Integer, default=0, nullable=False)
+    errors = Column(Integer, default=0, nullable=False)
+    processing_seconds = Column(Float, default=0, nullable=False)  # Сумма по чанкам
+    
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True))  # Время завершения последнего чанка
+    
+    def __repr__(self):
+        return f"<AutoPricingRun(id={self.id}, changed={self.prices_changed})>"
+
+
+class CategoryPriceElasticity(Base):
+    """Ценовая эластичность спроса по категории (оценка по истории цен и сделкам)."""
+    
+    __tablename__ = "category_price_elasticities"
+    
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), primary_key=True)
+    
+    elasticity = Column(Float, nullable=False)  # С поправкой к априорной оценке
+    raw_elasticity = Column(Float)  # Оценка только по данным категории
+    sample_size = Column(Integer, default=0, nullable=False)  # Изменений цены в выборке
+    
+    fitted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<CategoryPriceElasticity(category_id={self.category_id}, elasticity={self.elasticity})>"
+
+
+class BrandDemand(Base):
+    """Доля бренда среди активных товаров (периодический пересчет)."""
+    
+    __tablename__ = "pricing_brand_demand"
+    
+    brand_key = Column(String(100), primary_key=True)  # Item.brand_key
+    
+    item_count = Column(Integer, default=0, nullable=False)
+    share = Column(Float, default=0, nullable=False)  # Доля активных товаров
+    popularity_score = Column(Float, default=0, nullable=False)  # Признак brand_popularity_score
+    
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<BrandDemand(brand_key={self.brand_key}, share={self.share})>"
+
+
+class LocationDemand(Base):
+    """Спрос (букинги за 90 дней) по локации (периодический пересчет)."""
+    
+    __tablename__ = "pricing_location_demand"
+    
+    location_key = Column(String(200), primary_key=True)  # Item.location_key
+    
+    bookings_90d = Column(Integer, default=0, nullable=False)
+    demand_score = Column(Float, default=0, nullable=False)  # Признак location_demand_score
+    
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<LocationDemand(location_key={self.location_key}, bookings_90d={self.bookings_90d})>"
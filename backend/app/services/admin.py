@@ -2,15 +2,12 @@
 Admin service for administrative operations.
 """
 
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Iterator, Tuple
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy import and_, or_, func, desc, text
 from datetime import datetime, timedelta
 import uuid
-import csv
 import json
-import os
-from io import StringIO
 
 from app.models.user import User, UserStatus, UserRole
 from app.models.item import Item, ItemStatus
@@ -18,8 +15,44 @@ from app.models.contract import Contract, ContractStatus, Dispute, DisputeStatus
 from app.models.notification import Notification, NotificationType
 from app.schemas.common import PaginatedResponse, PaginationMeta
 from app.utils.exceptions import NotFoundError, ForbiddenError, BadRequestError
-from app.core.database import redis_client
+from app.core.config import settings
+from app.core.database import redis_client, replica_engines, get_replica_lag, get_read_routing_stats
 from app.services.email import EmailService
+from app.services.export import (
+    EXPORT_MEDIA_TYPES, STREAMABLE_FORMATS, iter_csv, iter_json,
+    validate_export_format, write_export
+)
+from app.services.snapshot_cache import get_snapshot, write_snapshot
+from app.services.report_cache import cached_report, invalidate_reports
+from app.services.category_price_stats import mark_category_prices_changed
+from app.services.notification_stream import publish_notification_event, serialize_notification
+
+
+USERS_EXPORT_COLUMNS = [
+    ("id", "ID", "string"),
+    ("email", "Email", "string"),
+    ("first_name", "First Name", "string"),
+    ("last_name", "Last Name", "string"),
+    ("status", "Status", "string"),
+    ("role", "Role", "string"),
+    ("is_verified", "Verified", "bool"),
+    ("created_at", "Created At", "timestamp"),
+    ("last_login", "Last Login", "timestamp"),
+    ("total_earnings", "Total Earnings", "float")
+]
+
+ANALYTICS_EXPORT_COLUMNS = [
+    ("id", "Contract ID", "string"),
+    ("item_title", "Item Title", "string"),
+    ("owner_email", "Owner Email", "string"),
+    ("tenant_email", "Tenant Email", "string"),
+    ("start_date", "Start Date", "timestamp"),
+    ("end_date", "End Date", "timestamp"),
+    ("total_price", "Total Price", "float"),
+    ("status", "Status", "string"),
+    ("created_at", "Created At", "timestamp"),
+    ("completed_at", "Completed At", "timestamp")
+]
 
 
 class AdminService:
@@ -29,72 +62,109 @@ class AdminService:
         self.db = db
         self.email_service = EmailService()
     
-    def get_dashboard_overview(self) -> Dict[str, Any]:
+    def get_dashboard_overview(self, max_staleness: Optional[int] = None) -> Dict[str, Any]:
         """
         Get admin dashboard overview with key metrics.
         
+        Served from a cached snapshot refreshed in the background.
+        
+        Args:
+            max_staleness: Maximum acceptable snapshot age in seconds (0 = compute now)
+            
         Returns:
             Dashboard overview data
         """
-        # Current totals
-        total_users = self.db.query(User).count()
-        total_items = self.db.query(Item).count()
-        total_contracts = self.db.query(Contract).count()
-        
-        # Active counts
-        active_users = self.db.query(User).filter(User.status == UserStatus.ACTIVE).count()
-        active_items = self.db.query(Item).filter(
-            Item.status == ItemStatus.ACTIVE,
-            Item.is_approved == True
-        ).count()
-        active_contracts = self.db.query(Contract).filter(
-            Contract.status == ContractStatus.ACTIVE
-        ).count()
+        if max_staleness is None:
+            max_staleness = settings.DASHBOARD_SNAPSHOT_MAX_STALENESS
+        
+        def schedule_refresh():
+            from app.tasks import refresh_dashboard_snapshots
+            refresh_dashboard_snapshots.delay(periods=[], include_admin=True)
+        
+        return get_snapshot(
+            "admin_overview",
+            self.compute_dashboard_overview,
+            max_staleness=max_staleness,
+            ttl=settings.DASHBOARD_SNAPSHOT_TTL,
+            schedule_refresh=schedule_refresh
+        )
+    
+    def refresh_dashboard_overview(self) -> Dict[str, Any]:
+        """
+        Recompute dashboard overview and store the snapshot.
         
-        # Pending approvals
-        pending_items = self.db.query(Item).filter(Item.is_approved == False).count()
-        pending_disputes = self.db.query(Dispute).filter(
-            Dispute.status == DisputeStatus.OPEN
-        ).count()
+        Returns:
+            Dashboard overview data
+        """
+        overview = self.compute_dashboard_overview()
+        write_snapshot("admin_overview", overview, ttl=settings.DASHBOARD_SNAPSHOT_TTL)
+        return overview
+    
+    def compute_dashboard_overview(self) -> Dict[str, Any]:
+        """
+        Compute dashboard overview with one aggregate query per table.
         
-        # Revenue (last 30 days)
+        Returns:
+            Dashboard overview data
+        """
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_revenue = self.db.query(func.sum(Contract.total_price)).filter(
-            Contract.status == ContractStatus.COMPLETED,
-            Contract.completed_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        # Growth metrics (compare with previous month)
         sixty_days_ago = datetime.utcnow() - timedelta(days=60)
         
-        prev_month_users = self.db.query(User).filter(
-            User.created_at >= sixty_days_ago,
-            User.created_at < thirty_days_ago
-        ).count()
-        
-        curr_month_users = self.db.query(User).filter(
-            User.created_at >= thirty_days_ago
-        ).count()
+        users = self.db.query(
+            func.count(User.id).label("total"),
+            func.count(User.id).filter(User.status == UserStatus.ACTIVE).label("active"),
+            func.count(User.id).filter(User.created_at >= thirty_days_ago).label("curr_month"),
+            func.count(User.id).filter(
+                User.created_at >= sixty_days_ago,
+                User.created_at < thirty_days_ago
+            ).label("prev_month")
+        ).one()
+        
+        items = self.db.query(
+            func.count(Item.id).label("total"),
+            func.count(Item.id).filter(
+                Item.status == ItemStatus.ACTIVE,
+                Item.is_approved == True
+            ).label("active"),
+            func.count(Item.id).filter(Item.is_approved == False).label("pending")
+        ).one()
+        
+        contracts = self.db.query(
+            func.count(Contract.id).label("total"),
+            func.count(Contract.id).filter(Contract.status == ContractStatus.ACTIVE).label("active"),
+            func.coalesce(
+                func.sum(Contract.total_price).filter(
+                    Contract.status == ContractStatus.COMPLETED,
+                    Contract.completed_at >= thirty_days_ago
+                ),
+                0
+            ).label("recent_revenue")
+        ).one()
+        
+        pending_disputes = self.db.query(func.count(Dispute.id)).filter(
+            Dispute.status == DisputeStatus.OPEN
+        ).scalar()
         
-        user_growth = ((curr_month_users - prev_month_users) / max(prev_month_users, 1)) * 100
+        # Growth metrics (compare with previous month)
+        user_growth = ((users.curr_month - users.prev_month) / max(users.prev_month, 1)) * 100
         
         return {
             "totals": {
-                "users": total_users,
-                "items": total_items,
-                "contracts": total_contracts
+                "users": users.total,
+                "items": items.total,
+                "contracts": contracts.total
             },
             "active": {
-                "users": active_users,
-                "items": active_items,
-                "contracts": active_contracts
+                "users": users.active,
+                "items": items.active,
+                "contracts": contracts.active
             },
             "pending": {
-                "items": pending_items,
+                "items": items.pending,
                 "disputes": pending_disputes
             },
             "revenue": {
-                "last_30_days": float(recent_revenue),
+                "last_30_days": float(contracts.recent_revenue),
                 "currency": "ETH"
             },
             "growth": {
@@ -391,6 +461,7 @@ class AdminService:
         
         self.db.commit()
         self.db.refresh(item)
+        mark_category_prices_changed([item.category_id])
         
         # Notify owner
         self._create_notification(
@@ -429,6 +500,7 @@ class AdminService:
         
         self.db.commit()
         self.db.refresh(item)
+        mark_category_prices_changed([item.category_id])
         
         # Notify owner
         self._create_notification(
@@ -565,6 +637,7 @@ class AdminService:
             "resolved_at": dispute.resolution_date
         }
     
+    @cached_report("admin.get_activity_report")
     def get_activity_report(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """
         Get platform activity report.
@@ -614,6 +687,7 @@ class AdminService:
             }
         }
     
+    @cached_report("admin.get_financial_report")
     def get_financial_report(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """
         Get financial report.
@@ -673,12 +747,25 @@ class AdminService:
         except:
             redis_status = "unhealthy"
         
+        # Read replicas
+        replicas = []
+        for index in range(len(replica_engines)):
+            lag = get_replica_lag(index)
+            replicas.append({
+                "index": index,
+                "status": "unreachable" if lag is None else
+                          "lagging" if lag > settings.DATABASE_REPLICA_MAX_LAG_SECONDS else "healthy",
+                "lag_seconds": lag
+            })
+        
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "services": {
                 "database": db_status,
                 "redis": redis_status
             },
+            "database_replicas": replicas,
+            "read_routing": get_read_routing_stats(),
             "overall_status": "healthy" if all([db_status == "healthy", redis_status == "healthy"]) else "degraded"
         }
     
@@ -809,22 +896,20 @@ class AdminService:
     
     def export_users_data(self, format: str = "csv") -> str:
         """
-        Export users data.
+        Export users data to a file.
         
         Args:
-            format: Export format (csv, json)
+            format: Export format (csv, json, parquet)
             
         Returns:
             File URL or path
         """
-        users = self.db.query(User).all()
-        
-        if format == "csv":
-            return self._export_users_csv(users)
-        elif format == "json":
-            return self._export_users_json(users)
-        else:
-            raise BadRequestError("Unsupported export format")
+        return write_export(
+            f"users_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
+            format,
+            USERS_EXPORT_COLUMNS,
+            self._iter_users_export_rows()
+        )
     
     def export_analytics_data(
         self, 
@@ -833,28 +918,67 @@ class AdminService:
         format: str = "csv"
     ) -> str:
         """
-        Export analytics data.
+        Export analytics data to a file.
         
         Args:
             start_date: Start date
             end_date: End date
-            format: Export format
+            format: Export format (csv, json, parquet)
             
         Returns:
             File URL or path
         """
-        # Get analytics data
-        contracts = self.db.query(Contract).filter(
-            Contract.created_at >= start_date,
-            Contract.created_at <= end_date
-        ).all()
+        prefix, suffix = self._analytics_json_envelope(start_date, end_date)
+        return write_export(
+            f"analytics_export_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}",
+            format,
+            ANALYTICS_EXPORT_COLUMNS,
+            self._iter_analytics_export_rows(start_date, end_date),
+            json_prefix=prefix,
+            json_suffix=suffix
+        )
+    
+    def stream_users_export(self, format: str = "csv") -> Tuple[Iterator[str], str, str]:
+        """
+        Stream users export.
         
+        Args:
+            format: Export format (csv, json)
+            
+        Returns:
+            Chunk iterator, media type and file name
+        """
+        self._validate_streamable_format(format)
+        rows = self._iter_users_export_rows()
+        chunks = iter_csv(USERS_EXPORT_COLUMNS, rows) if format == "csv" else iter_json(rows)
+        filename = f"users_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+        return chunks, EXPORT_MEDIA_TYPES[format], filename
+    
+    def stream_analytics_export(
+        self, 
+        start_date: datetime, 
+        end_date: datetime, 
+        format: str = "csv"
+    ) -> Tuple[Iterator[str], str, str]:
+        """
+        Stream analytics export.
+        
+        Args:
+            start_date: Start date
+            end_date: End date
+            format: Export format (csv, json)
+            
+        Returns:
+            Chunk iterator, media type and file name
+        """
+        self._validate_streamable_format(format)
+        rows = self._iter_analytics_export_rows(start_date, end_date)
         if format == "csv":
-            return self._export_analytics_csv(contracts, start_date, end_date)
-        elif format == "json":
-            return self._export_analytics_json(contracts, start_date, end_date)
+            chunks = iter_csv(ANALYTICS_EXPORT_COLUMNS, rows)
         else:
-            raise BadRequestError("Unsupported export format")
+            chunks = iter_json(rows, *self._analytics_json_envelope(start_date, end_date))
+        filename = f"analytics_export_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.{format}"
+        return chunks, EXPORT_MEDIA_TYPES[format], filename
     
     def send_bulk_email(
         self, 
@@ -932,6 +1056,8 @@ class AdminService:
             if cache_type in ["all", "redis"]:
                 # Clear Redis cache
                 redis_client.flushdb()
+            elif cache_type == "reports":
+                invalidate_reports()
             
             # Add other cache clearing logic here
             
@@ -963,183 +1089,105 @@ class AdminService:
         
         self.db.add(notification)
         self.db.commit()
-    
-    def _export_users_csv(self, users: List[User]) -> str:
-        """
-        Export users to CSV format.
         
-        Args:
-            users: List of users
-            
-        Returns:
-            CSV file path or URL
-        """
-        # Create CSV content
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'ID', 'Email', 'First Name', 'Last Name', 'Status', 'Role',
-            'Verified', 'Created At', 'Last Login', 'Total Earnings'
-        ])
-        
-        # Write data
-        for user in users:
-            writer.writerow([
-                str(user.id),
-                user.email,
-                user.first_name,
-                user.last_name,
-                user.status.value,
-                user.role.value,
-                user.is_verified,
-                user.created_at.isoformat() if user.created_at else '',
-                user.last_login.isoformat() if user.last_login else '',
-                float(user.total_earnings) if user.total_earnings else 0.0
-            ])
-        
-        # Save to file (in production, upload to cloud storage)
-        filename = f"users_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        file_path = os.path.join("exports", filename)
-        os.makedirs("exports", exist_ok=True)
-        
-        with open(file_path, 'w', newline='') as f:
-            f.write(output.getvalue())
-        
-        return f"/exports/{filename}"
+        publish_notification_event(user_id, serialize_notification(notification))
+    
+    def _validate_streamable_format(self, format: str) -> None:
+        """Check that format can be streamed over HTTP."""
+        validate_export_format(format)
+        if format not in STREAMABLE_FORMATS:
+            raise BadRequestError("Parquet exports are written to a file, use the background export")
     
-    def _export_users_json(self, users: List[User]) -> str:
+    def _iter_users_export_rows(self) -> Iterator[Dict[str, Any]]:
         """
-        Export users to JSON format.
+        Iterate users for export using a server-side cursor.
         
-        Args:
-            users: List of users
-            
-        Returns:
-            JSON file path or URL
+        Yields:
+            User rows
         """
-        users_data = []
-        for user in users:
-            users_data.append({
-                "id": str(user.id),
+        query = self.db.query(
+            User.id,
+            User.email,
+            User.first_name,
+            User.last_name,
+            User.status,
+            User.role,
+            User.is_verified,
+            User.created_at,
+            User.last_login,
+            User.total_earnings
+        ).order_by(User.created_at).yield_per(settings.EXPORT_BATCH_SIZE)
+        
+        for user in query:
+            yield {
+                "id": user.id,
                 "email": user.email,
                 "first_name": user.first_name,
                 "last_name": user.last_name,
                 "status": user.status.value,
                 "role": user.role.value,
                 "is_verified": user.is_verified,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "last_login": user.last_login.isoformat() if user.last_login else None,
+                "created_at": user.created_at,
+                "last_login": user.last_login,
                 "total_earnings": float(user.total_earnings) if user.total_earnings else 0.0
-            })
-        
-        # Save to file
-        filename = f"users_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
-        file_path = os.path.join("exports", filename)
-        os.makedirs("exports", exist_ok=True)
-        
-        with open(file_path, 'w') as f:
-            json.dump(users_data, f, indent=2)
-        
-        return f"/exports/{filename}"
+            }
     
-    def _export_analytics_csv(
+    def _iter_analytics_export_rows(
         self, 
-        contracts: List[Contract], 
         start_date: datetime, 
         end_date: datetime
-    ) -> str:
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Export analytics to CSV format.
+        Iterate contracts in range for export using a server-side cursor.
         
-        Args:
-            contracts: List of contracts
-            start_date: Start date
-            end_date: End date
-            
-        Returns:
-            CSV file path or URL
-        """
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Contract ID', 'Item Title', 'Owner Email', 'Tenant Email',
-            'Start Date', 'End Date', 'Total Price', 'Status', 'Created At', 'Completed At'
-        ])
-        
-        # Write data
-        for contract in contracts:
-            writer.writerow([
-                str(contract.id),
-                contract.item.title if contract.item else '',
-                contract.owner.email if contract.owner else '',
-                contract.tenant.email if contract.tenant else '',
-                contract.start_date.isoformat() if contract.start_date else '',
-                contract.end_date.isoformat() if contract.end_date else '',
-                float(contract.total_price),
-                contract.status.value,
-                contract.created_at.isoformat() if contract.created_at else '',
-                contract.completed_at.isoformat() if contract.completed_at else ''
-            ])
-        
-        # Save to file
-        filename = f"analytics_export_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
-        file_path = os.path.join("exports", filename)
-        os.makedirs("exports", exist_ok=True)
-        
-        with open(file_path, 'w', newline='') as f:
-            f.write(output.getvalue())
-        
-        return f"/exports/{filename}"
-    
-    def _export_analytics_json(
-        self, 
-        contracts: List[Contract], 
-        start_date: datetime, 
-        end_date: datetime
-    ) -> str:
-        """
-        Export analytics to JSON format.
+        Item title and party emails are joined in the same query.
         
-        Args:
-            contracts: List of contracts
-            start_date: Start date
-            end_date: End date
-            
-        Returns:
-            JSON file path or URL
+        Yields:
+            Contract rows
         """
-        analytics_data = {
-            "period": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            },
-            "contracts": []
-        }
-        
-        for contract in contracts:
-            analytics_data["contracts"].append({
-                "id": str(contract.id),
-                "item_title": contract.item.title if contract.item else None,
-                "owner_email": contract.owner.email if contract.owner else None,
-                "tenant_email": contract.tenant.email if contract.tenant else None,
-                "start_date": contract.start_date.isoformat() if contract.start_date else None,
-                "end_date": contract.end_date.isoformat() if contract.end_date else None,
-                "total_price": float(contract.total_price),
-                "status": contract.status.value,
-                "created_at": contract.created_at.isoformat() if contract.created_at else None,
-                "completed_at": contract.completed_at.isoformat() if contract.completed_at else None
-            })
-        
-        # Save to file
-        filename = f"analytics_export_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.json"
-        file_path = os.path.join("exports", filename)
-        os.makedirs("exports", exist_ok=True)
-        
-        with open(file_path, 'w') as f:
-            json.dump(analytics_data, f, indent=2)
-        
-        return f"/exports/{filename}"
\ No newline at end of file
+        owner = aliased(User)
+        tenant = aliased(User)
+        
+        query = self.db.query(
+            Contract.id,
+            Item.title,
+            owner.email,
+            tenant.email,
+            Contract.start_date,
+            Contract.end_date,
+            Contract.total_price,
+            Contract.status,
+            Contract.created_at,
+            Contract.completed_at
+        ).outerjoin(
+            Item, Item.id == Contract.item_id
+        ).outerjoin(
+            owner, owner.id == Contract.owner_id
+        ).outerjoin(
+            tenant, tenant.id == Contract.tenant_id
+        ).filter(
+            Contract.created_at >= start_date,
+            Contract.created_at <= end_date
+        ).order_by(Contract.created_at).yield_per(settings.EXPORT_BATCH_SIZE)
+        
+        for contract_id, item_title, owner_email, tenant_email, start, end, total_price, status, created_at, completed_at in query:
+            yield {
+                "id": contract_id,
+                "item_title": item_title,
+                "owner_email": owner_email,
+                "tenant_email": tenant_email,
+                "start_date": start,
+                "end_date": end,
+                "total_price": float(total_price),
+                "status": status.value,
+                "created_at": created_at,
+                "completed_at": completed_at
+            }
+    
+    def _analytics_json_envelope(self, start_date: datetime, end_date: datetime) -> Tuple[str, str]:
+        """JSON text surrounding the contracts array in analytics exports."""
+        period = json.dumps({
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        })
+        return f'{{"period": {period}, "contracts": ', '}'
@@ -2,23 +2,34 @@
 Analytics service for data analysis and ML predictions.
 """
 
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc, text
+from typing import Callable, List, Optional, Dict, Any
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, func, desc, text, select, union, union_all, literal, cast, extract, case, Date, false
 from datetime import datetime, timedelta
 import uuid
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-import joblib
-import os
 
 from app.models.user import User, UserStatus
-from app.models.item import Item, ItemStatus, Category, ItemView
+from app.models.item import Item, ItemStatus, Category, ItemView, Favorite
 from app.models.contract import Contract, ContractStatus
+from app.models.analytics import DailyCategoryStats, DailyItemStats, DailyUserStats, UserLoginDay
+from app.schemas.common import PaginatedResponse, PaginationMeta
+from app.utils.exceptions import BadRequestError
 from app.core.config import settings
+from app.services.analytics_rollup import AnalyticsRollupService
+from app.services.search_tracking import get_trending_searches
+from app.services.snapshot_cache import get_snapshot, write_snapshot
+from app.services.report_cache import cached_report
+from app.services.model_registry import model_registry
+from app.services.training_data import iter_frames, holdout_mask
+
+RENTAL_PREDICTION_MODEL = "rental_prediction"
+
+# Models trained by the train_ml_model task (see retrain_ml_models)
+TRAINABLE_MODELS = (RENTAL_PREDICTION_MODEL, "pricing")
 
 
 class AnalyticsService:
@@ -26,120 +37,232 @@ class AnalyticsService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.model_path = settings.MODEL_PATH
-        os.makedirs(self.model_path, exist_ok=True)
     
-    def get_dashboard_stats(self, period: str = "30d") -> Dict[str, Any]:
+    def get_dashboard_stats(self, period: str = "30d", max_staleness: Optional[int] = None) -> Dict[str, Any]:
         """
         Get dashboard statistics for admin panel.
         
+        Served from a cached snapshot refreshed in the background.
+        
         Args:
             period: Time period (7d, 30d, 90d, 1y)
+            max_staleness: Maximum acceptable snapshot age in seconds (0 = compute now)
             
         Returns:
             Dashboard statistics
         """
         days = self._parse_period(period)
-        start_date = datetime.utcnow() - timedelta(days=days)
+        if max_staleness is None:
+            max_staleness = settings.DASHBOARD_SNAPSHOT_MAX_STALENESS
+        
+        def schedule_refresh():
+            from app.tasks import refresh_dashboard_snapshots
+            refresh_dashboard_snapshots.delay(periods=[period], include_admin=False)
+        
+        return get_snapshot(
+            f"dashboard_stats:{days}d",
+            lambda: self.compute_dashboard_stats(period),
+            max_staleness=max_staleness,
+            ttl=settings.DASHBOARD_SNAPSHOT_TTL,
+            schedule_refresh=schedule_refresh
+        )
+    
+    def refresh_dashboard_stats(self, period: str = "30d") -> Dict[str, Any]:
+        """
+        Recompute dashboard statistics and store the snapshot.
         
-        # Total counts
-        total_users = self.db.query(User).count()
-        total_items = self.db.query(Item).count()
-        total_contracts = self.db.query(Contract).count()
+        Args:
+            period: Time period (7d, 30d, 90d, 1y)
+            
+        Returns:
+            Dashboard statistics
+        """
+        stats = self.compute_dashboard_stats(period)
+        write_snapshot(
+            f"dashboard_stats:{self._parse_period(period)}d",
+            stats,
+            ttl=settings.DASHBOARD_SNAPSHOT_TTL
+        )
+        return stats
+    
+    def compute_dashboard_stats(self, period: str = "30d") -> Dict[str, Any]:
+        """
+        Compute dashboard statistics with one aggregate query per table.
         
-        # Period counts
-        new_users = self.db.query(User).filter(User.created_at >= start_date).count()
-        new_items = self.db.query(Item).filter(Item.created_at >= start_date).count()
-        new_contracts = self.db.query(Contract).filter(Contract.created_at >= start_date).count()
+        Args:
+            period: Time period (7d, 30d, 90d, 1y)
+            
+        Returns:
+            Dashboard statistics
+        """
+        days = self._parse_period(period)
+        start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Active counts
-        active_users = self.db.query(User).filter(User.status == UserStatus.ACTIVE).count()
-        active_items = self.db.query(Item).filter(
-            Item.status == ItemStatus.ACTIVE,
-            Item.is_approved == True
-        ).count()
-        active_contracts = self.db.query(Contract).filter(
-            Contract.status == ContractStatus.ACTIVE
-        ).count()
+        users = self.db.query(
+            func.count(User.id).label("total"),
+            func.count(User.id).filter(User.created_at >= start_date).label("new"),
+            func.count(User.id).filter(User.status == UserStatus.ACTIVE).label("active")
+        ).one()
+        
+        items = self.db.query(
+            func.count(Item.id).label("total"),
+            func.count(Item.id).filter(Item.created_at >= start_date).label("new"),
+            func.count(Item.id).filter(
+                Item.status == ItemStatus.ACTIVE,
+                Item.is_approved == True
+            ).label("active")
+        ).one()
         
-        # Revenue calculation
-        completed_contracts = self.db.query(Contract).filter(
+        completed_in_period = and_(
             Contract.status == ContractStatus.COMPLETED,
             Contract.completed_at >= start_date
-        ).all()
-        
-        total_revenue = sum(float(contract.total_price) for contract in completed_contracts)
-        
-        # Completion rate
-        period_contracts = self.db.query(Contract).filter(
-            Contract.created_at >= start_date
-        ).count()
+        )
+        contracts = self.db.query(
+            func.count(Contract.id).label("total"),
+            func.count(Contract.id).filter(Contract.created_at >= start_date).label("new"),
+            func.count(Contract.id).filter(Contract.status == ContractStatus.ACTIVE).label("active"),
+            func.count(Contract.id).filter(completed_in_period).label("completed"),
+            func.coalesce(func.sum(Contract.total_price).filter(completed_in_period), 0).label("revenue")
+        ).one()
         
-        completion_rate = (len(completed_contracts) / period_contracts * 100) if period_contracts > 0 else 0
+        completion_rate = (contracts.completed / contracts.new * 100) if contracts.new > 0 else 0
         
         return {
             "total_stats": {
-                "users": total_users,
-                "items": total_items,
-                "contracts": total_contracts
+                "users": users.total,
+                "items": items.total,
+                "contracts": contracts.total
             },
             "period_stats": {
-                "new_users": new_users,
-                "new_items": new_items,
-                "new_contracts": new_contracts,
-                "revenue": total_revenue,
+                "new_users": users.new,
+                "new_items": items.new,
+                "new_contracts": contracts.new,
+                "revenue": float(contracts.revenue),
                 "completion_rate": completion_rate
             },
             "active_stats": {
-                "users": active_users,
-                "items": active_items,
-                "contracts": active_contracts
+                "users": users.active,
+                "items": items.active,
+                "contracts": contracts.active
             }
         }
     
-    def get_popular_items(self, period: str = "30d", limit: int = 10) -> List[Dict[str, Any]]:
+    @cached_report("analytics.get_popular_items")
+    def get_popular_items(
+        self, 
+        period: str = "30d", 
+        limit: int = 10, 
+        mode: str = "top"
+    ) -> List[Dict[str, Any]]:
         """
-        Get most popular items by views and rentals.
+        Get most popular items by views, favorites and rentals in period.
         
         Args:
             period: Time period
             limit: Number of items to return
+            mode: "top" ranks by weighted activity in period,
+                  "trending" additionally decays activity by age
             
         Returns:
             List of popular items
         """
-        days = self._parse_period(period)
-        start_date = datetime.utcnow() - timedelta(days=days)
+        if mode not in ("top", "trending"):
+            raise BadRequestError("Mode must be 'top' or 'trending'")
         
-        # Get items with view counts in period
-        items = self.db.query(Item).filter(
+        today = datetime.utcnow().date()
+        start_day = today - timedelta(days=self._parse_period(period))
+        
+        source = self._get_item_activity_source(start_day)
+        
+        activity = (
+            source.c.views * settings.POPULARITY_VIEW_WEIGHT +
+            source.c.favorites * settings.POPULARITY_FAVORITE_WEIGHT +
+            source.c.rentals * settings.POPULARITY_RENTAL_WEIGHT
+        )
+        if mode == "trending":
+            age_days = literal(today, Date) - source.c.date
+            activity = activity * func.power(0.5, age_days / settings.POPULARITY_TRENDING_HALF_LIFE_DAYS)
+        
+        scores = select(
+            source.c.item_id,
+            func.sum(source.c.views).label('views'),
+            func.sum(source.c.favorites).label('favorites'),
+            func.sum(source.c.rentals).label('rentals'),
+            func.sum(activity).label('score')
+        ).group_by(source.c.item_id).subquery()
+        
+        score = func.coalesce(scores.c.score, 0)
+        
+        # Один запрос: ранжирование, карточка товара и владелец.
+        # Товары без активности за период остаются в выдаче с нулями
+        result = self.db.query(
+            Item,
+            func.coalesce(scores.c.views, 0),
+            func.coalesce(scores.c.favorites, 0),
+            func.coalesce(scores.c.rentals, 0),
+            score
+        ).outerjoin(
+            scores, scores.c.item_id == Item.id
+        ).options(
+            joinedload(Item.owner)
+        ).filter(
             Item.status == ItemStatus.ACTIVE,
             Item.is_approved == True
-        ).order_by(desc(Item.views_count)).limit(limit).all()
+        ).order_by(desc(score), Item.id).limit(limit).all()
         
-        result = []
-        for item in items:
-            # Count rentals in period
-            rentals_count = self.db.query(Contract).filter(
-                Contract.item_id == item.id,
-                Contract.created_at >= start_date
-            ).count()
-            
-            result.append({
+        return [
+            {
                 "id": item.id,
                 "title": item.title,
                 "price_per_day": float(item.price_per_day),
                 "views_count": item.views_count,
-                "rentals_count": rentals_count,
+                "period_views": int(views),
+                "period_favorites": int(favorites),
+                "rentals_count": int(rentals),
+                "score": round(float(score), 4),
                 "rating": float(item.rating) if item.rating else None,
                 "owner": {
                     "id": item.owner.id,
                     "name": f"{item.owner.first_name} {item.owner.last_name}"
                 }
-            })
+            }
+            for item, views, favorites, rentals, score in result
+        ]
+    
+    def _get_item_activity_source(self, start_day):
+        """
+        Get per-day item activity (item_id, date, views, favorites, rentals).
         
-        return result
+        Reads the daily item rollup when it is maintained, otherwise
+        buckets raw events by day.
+        """
+        if self._use_rollups():
+            return select(
+                DailyItemStats.item_id,
+                DailyItemStats.date,
+                DailyItemStats.views,
+                DailyItemStats.favorites,
+                DailyItemStats.rentals
+            ).filter(DailyItemStats.date >= start_day).subquery()
+        
+        start = datetime.combine(start_day, datetime.min.time())
+        
+        def events(item_column, created_column, views: int, favorites: int, rentals: int):
+            return select(
+                item_column.label('item_id'),
+                cast(func.date_trunc('day', created_column), Date).label('date'),
+                literal(views).label('views'),
+                literal(favorites).label('favorites'),
+                literal(rentals).label('rentals')
+            ).filter(created_column >= start)
+        
+        return union_all(
+            events(ItemView.item_id, ItemView.created_at, 1, 0, 0),
+            events(Favorite.item_id, Favorite.created_at, 0, 1, 0),
+            events(Contract.item_id, Contract.created_at, 0, 0, 1)
+        ).subquery()
     
+    @cached_report("analytics.get_categories_stats")
     def get_categories_stats(self, period: str = "30d") -> List[Dict[str, Any]]:
         """
         Get statistics by categories.
@@ -150,6 +273,9 @@ class AnalyticsService:
         Returns:
             Category statistics
         """
+        if self._use_rollups():
+            return self._get_categories_stats_from_rollups(period)
+        
         days = self._parse_period(period)
         start_date = datetime.utcnow() - timedelta(days=days)
         
@@ -186,6 +312,7 @@ class AnalyticsService:
             for cat_id, name, items_count, contracts_count, avg_price in result
         ]
     
+    @cached_report("analytics.get_price_trends")
     def get_price_trends(self, category_id: Optional[uuid.UUID] = None, period: str = "30d") -> List[Dict[str, Any]]:
         """
         Get price trends over time.
@@ -197,6 +324,9 @@ class AnalyticsService:
         Returns:
             Price trends data
         """
+        if self._use_rollups():
+            return self._get_price_trends_from_rollups(category_id, period)
+        
         days = self._parse_period(period)
         start_date = datetime.utcnow() - timedelta(days=days)
         
@@ -226,6 +356,7 @@ class AnalyticsService:
             for date, avg_price, items_count in result
         ]
     
+    @cached_report("analytics.get_user_activity")
     def get_user_activity(self, period: str = "30d") -> List[Dict[str, Any]]:
         """
         Get user activity statistics.
@@ -236,6 +367,9 @@ class AnalyticsService:
         Returns:
             User activity data
         """
+        if self._use_rollups():
+            return self._get_user_activity_from_rollups(period)
+        
         days = self._parse_period(period)
         start_date = datetime.utcnow() - timedelta(days=days)
         
@@ -275,6 +409,7 @@ class AnalyticsService:
         
         return list(activity_data.values())
     
+    @cached_report("analytics.get_user_retention")
     def get_user_retention(self, period: str = "30d") -> Dict[str, Any]:
         """
         Calculate user retention rates.
@@ -286,35 +421,38 @@ class AnalyticsService:
             Retention data
         """
         days = self._parse_period(period)
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Get users who registered in the period
-        new_users = self.db.query(User).filter(
-            User.created_at >= start_date
-        ).all()
-        
-        if not new_users:
-            return {"retention_rate": 0, "cohort_data": []}
+        now = datetime.utcnow()
+        start_date = now - timedelta(days=days)
         
         # Calculate retention for different periods
         retention_periods = [7, 14, 30]  # days
-        cohort_data = []
         
+        counts = [func.count(User.id)]
         for days_after in retention_periods:
-            retained_count = 0
-            check_date = datetime.utcnow() - timedelta(days=days_after)
-            
-            for user in new_users:
-                if user.created_at <= check_date and user.last_login and user.last_login >= check_date:
-                    retained_count += 1
-            
-            retention_rate = (retained_count / len(new_users)) * 100
-            cohort_data.append({
+            check_date = now - timedelta(days=days_after)
+            counts.append(
+                func.count(User.id).filter(
+                    User.created_at <= check_date,
+                    User.last_login >= check_date
+                )
+            )
+        
+        total_users, *retained = self.db.query(*counts).filter(
+            User.created_at >= start_date
+        ).one()
+        
+        if not total_users:
+            return {"retention_rate": 0, "cohort_data": []}
+        
+        cohort_data = [
+            {
                 "period": f"{days_after}d",
-                "retention_rate": retention_rate,
+                "retention_rate": (retained_count / total_users) * 100,
                 "retained_users": retained_count,
-                "total_users": len(new_users)
-            })
+                "total_users": total_users
+            }
+            for days_after, retained_count in zip(retention_periods, retained)
+        ]
         
         overall_retention = sum(data["retention_rate"] for data in cohort_data) / len(cohort_data)
         
@@ -323,6 +461,145 @@ class AnalyticsService:
             "cohort_data": cohort_data
         }
     
+    @cached_report("analytics.get_cohort_retention")
+    def get_cohort_retention(
+        self, 
+        period: str = "90d", 
+        granularity: str = "week", 
+        activity: str = "any"
+    ) -> Dict[str, Any]:
+        """
+        Get signup cohort retention matrix.
+        
+        Users are grouped by signup week or month; a user is retained in
+        period N if they had activity N weeks/months after their cohort start.
+        Counting is done in one grouped SQL query, the matrix is assembled with NumPy.
+        
+        Args:
+            period: Signup window (30d, 90d, 1y)
+            granularity: Cohort size: week or month
+            activity: Activity source: logins, contracts, views or any
+            
+        Returns:
+            Retention matrix
+        """
+        if granularity not in ("week", "month"):
+            raise BadRequestError("Granularity must be 'week' or 'month'")
+        if activity not in ("logins", "contracts", "views", "any"):
+            raise BadRequestError("Activity must be one of: logins, contracts, views, any")
+        
+        today = datetime.utcnow().date()
+        start = datetime.utcnow() - timedelta(days=self._parse_period(period))
+        
+        def bucket(column):
+            return cast(func.date_trunc(granularity, column), Date)
+        
+        cohorts = select(
+            User.id.label('user_id'),
+            bucket(User.created_at).label('cohort')
+        ).filter(User.created_at >= start).subquery()
+        
+        sources = []
+        if activity in ("logins", "any"):
+            sources.append(select(UserLoginDay.user_id, bucket(UserLoginDay.date).label('bucket')).filter(
+                UserLoginDay.date >= start.date()
+            ))
+            # Последний вход покрывает историю до появления журнала входов
+            sources.append(select(User.id, bucket(User.last_login)).filter(User.last_login >= start))
+        if activity in ("contracts", "any"):
+            sources.append(select(Contract.tenant_id, bucket(Contract.created_at)).filter(Contract.created_at >= start))
+            sources.append(select(Contract.owner_id, bucket(Contract.created_at)).filter(Contract.created_at >= start))
+        if activity in ("views", "any"):
+            sources.append(select(ItemView.user_id, bucket(ItemView.created_at)).filter(
+                ItemView.created_at >= start,
+                ItemView.user_id.isnot(None)
+            ))
+        
+        events = union(*sources).subquery()
+        events_user_id, events_bucket = events.c[0], events.c[1]
+        
+        offset = self._cohort_offset(cohorts.c.cohort, events_bucket, granularity)
+        
+        cohort_sizes = self.db.execute(
+            select(cohorts.c.cohort, func.count(cohorts.c.user_id)).group_by(cohorts.c.cohort)
+        ).all()
+        
+        if not cohort_sizes:
+            return {"granularity": granularity, "activity": activity, "periods": [], "cohorts": [], "average_retention": []}
+        
+        retained_rows = self.db.execute(
+            select(
+                cohorts.c.cohort,
+                offset.label('offset'),
+                func.count(func.distinct(cohorts.c.user_id))
+            ).join(
+                events, events_user_id == cohorts.c.user_id
+            ).filter(
+                events_bucket >= cohorts.c.cohort
+            ).group_by(cohorts.c.cohort, offset)
+        ).all()
+        
+        cohort_dates = sorted(cohort for cohort, _ in cohort_sizes)
+        index = {cohort: position for position, cohort in enumerate(cohort_dates)}
+        sizes = np.zeros(len(cohort_dates), dtype=np.int64)
+        for cohort, size in cohort_sizes:
+            sizes[index[cohort]] = size
+        
+        # Число наблюдаемых периодов для каждой когорты (включая текущий)
+        observable = np.array([
+            self._cohort_periods_between(cohort, today, granularity) + 1 for cohort in cohort_dates
+        ])
+        n_periods = int(observable.max())
+        
+        retained = np.zeros((len(cohort_dates), n_periods), dtype=np.int64)
+        if retained_rows:
+            rows = np.array(
+                [(index[cohort], int(offset_value), count) for cohort, offset_value, count in retained_rows],
+                dtype=np.int64
+            )
+            valid = rows[:, 1] < n_periods
+            retained[rows[valid, 0], rows[valid, 1]] = rows[valid, 2]
+        
+        rates = retained / sizes[:, None] * 100
+        
+        # Средняя кривая учитывает только когорты, для которых период уже наступил
+        mask = np.arange(n_periods)[None, :] < observable[:, None]
+        weighted = np.where(mask, retained, 0).sum(axis=0)
+        exposed = np.where(mask, sizes[:, None], 0).sum(axis=0)
+        average = np.divide(weighted, exposed, out=np.zeros(n_periods), where=exposed > 0) * 100
+        
+        return {
+            "granularity": granularity,
+            "activity": activity,
+            "periods": list(range(n_periods)),
+            "cohorts": [
+                {
+                    "cohort": cohort.isoformat(),
+                    "size": int(sizes[position]),
+                    "retained": retained[position, :observable[position]].tolist(),
+                    "retention": [round(float(rate), 2) for rate in rates[position, :observable[position]]]
+                }
+                for position, cohort in enumerate(cohort_dates)
+            ],
+            "average_retention": [round(float(rate), 2) for rate in average]
+        }
+    
+    def _cohort_offset(self, cohort, bucket, granularity: str):
+        """SQL expression: number of weeks/months between cohort and activity bucket."""
+        if granularity == "week":
+            return (bucket - cohort) // 7
+        return (
+            (extract('year', bucket) - extract('year', cohort)) * 12 +
+            extract('month', bucket) - extract('month', cohort)
+        )
+    
+    def _cohort_periods_between(self, cohort, today, granularity: str) -> int:
+        """Number of whole weeks/months from cohort start to today."""
+        if granularity == "week":
+            return (today - cohort).days // 7
+        return (today.year - cohort.year) * 12 + today.month - cohort.month
+    
+    @cached_report("analytics.get_contract_completion_rate")
     def get_contract_completion_rate(self, period: str = "30d") -> Dict[str, Any]:
         """
         Get contract completion rate statistics.
@@ -360,6 +637,7 @@ class AnalyticsService:
             "status_breakdown": status_counts
         }
     
+    @cached_report("analytics.get_revenue_analytics")
     def get_revenue_analytics(self, period: str = "30d") -> Dict[str, Any]:
         """
         Get revenue analytics.
@@ -370,6 +648,9 @@ class AnalyticsService:
         Returns:
             Revenue data
         """
+        if self._use_rollups():
+            return self._get_revenue_analytics_from_rollups(period)
+        
         days = self._parse_period(period)
         start_date = datetime.utcnow() - timedelta(days=days)
         
@@ -436,6 +717,9 @@ class AnalyticsService:
         """
         Get ML predictions for rental probability.
         
+        Until a model version is published, training is queued in the
+        background and probabilities come from a heuristic score.
+        
         Args:
             item_id: Specific item prediction
             category_id: Category predictions
@@ -445,16 +729,10 @@ class AnalyticsService:
             List of predictions
         """
         try:
-            # Load trained model
-            model_file = os.path.join(self.model_path, "rental_prediction_model.pkl")
-            scaler_file = os.path.join(self.model_path, "rental_prediction_scaler.pkl")
-            
-            if not os.path.exists(model_file) or not os.path.exists(scaler_file):
-                # Train model if not exists
-                self._train_rental_prediction_model()
-            
-            model = joblib.load(model_file)
-            scaler = joblib.load(scaler_file)
+            # Model is kept in memory by the registry
+            loaded = model_registry.get(RENTAL_PREDICTION_MODEL)
+            if loaded is None:
+                model_registry.request_training(RENTAL_PREDICTION_MODEL)
             
             # Get items to predict
             query = self.db.query(Item).filter(
@@ -469,20 +747,25 @@ class AnalyticsService:
             
             items = query.limit(limit).all()
             
+            if not items:
+                return []
+            
+            features = np.array([self._prepare_item_features(item) for item in items], dtype=float)
+            if loaded is not None:
+                # One transform/predict for all items
+                features_scaled = loaded.artifacts["scaler"].transform(features)
+                probabilities = loaded.artifacts["model"].predict_proba(features_scaled)[:, 1]  # Probability of being rented
+            else:
+                probabilities = self._heuristic_rental_probability(features)
+            
             predictions = []
-            for item in items:
-                # Prepare features
-                features = self._prepare_item_features(item)
-                features_scaled = scaler.transform([features])
-                
-                # Make prediction
-                prob = model.predict_proba(features_scaled)[0][1]  # Probability of being rented
-                
+            for item, prob in zip(items, probabilities):
                 predictions.append({
                     "item_id": item.id,
                     "title": item.title,
                     "rental_probability": float(prob),
                     "confidence": "high" if prob > 0.7 else "medium" if prob > 0.4 else "low",
+                    "model_version": loaded.version if loaded is not None else None,
                     "features": {
                         "price_per_day": float(item.price_per_day),
                         "views_count": item.views_count,
@@ -552,89 +835,205 @@ class AnalyticsService:
     
     def retrain_ml_models(self, model_type: str = "all") -> Dict[str, Any]:
         """
-        Retrain ML models with latest data.
+        Queue retraining of ML models with latest data.
+        
+        Training runs in the train_ml_model Celery task; progress is
+        available through get_ml_training_status.
         
         Args:
-            model_type: Type of model to retrain
+            model_type: Type of model to retrain (all, rental_prediction, pricing)
             
         Returns:
-            Training results
+            Queued task IDs by model
         """
-        results = {}
+        if model_type != "all" and model_type not in TRAINABLE_MODELS:
+            raise BadRequestError(f"Unknown model type: {model_type}")
         
-        if model_type in ["all", "rental_prediction"]:
-            try:
-                accuracy = self._train_rental_prediction_model()
-                results["rental_prediction"] = {
-                    "status": "success",
-                    "accuracy": accuracy,
-                    "trained_at": datetime.utcnow().isoformat()
-                }
-            except Exception as e:
-                results["rental_prediction"] = {
-                    "status": "error",
-                    "error": str(e)
+        results = {}
+        for name in TRAINABLE_MODELS:
+            if model_type in ["all", name]:
+                task_id = model_registry.request_training(name, force=True)
+                results[name] = {
+                    "status": "queued" if task_id else "error",
+                    "task_id": task_id,
+                    "current_version": model_registry.current_version(name)
                 }
         
         return results
     
-    def _train_rental_prediction_model(self) -> float:
+    def get_ml_training_status(self, task_id: str) -> Dict[str, Any]:
         """
-        Train rental prediction model.
+        Get state of a model training task.
         
+        Args:
+            task_id: Celery task ID returned by retrain_ml_models
+            
         Returns:
-            Model accuracy
+            Task state with progress (stage, percent) or result
         """
-        # Get training data
-        items = self.db.query(Item).filter(Item.created_at <= datetime.utcnow() - timedelta(days=7)).all()
+        from app.core.celery import celery_app
         
-        if len(items) < 10:
-            raise ValueError("Not enough data for training")
+        result = celery_app.AsyncResult(task_id)
+        status = {"task_id": task_id, "state": result.state}
         
-        # Prepare features and labels
-        features = []
-        labels = []
+        if result.state == "PROGRESS":
+            status.update(result.info or {})
+        elif result.ready():
+            status["result"] = result.result if result.successful() else {"success": False, "error": str(result.result)}
         
-        for item in items:
-            # Check if item was rented
-            was_rented = self.db.query(Contract).filter(
-                Contract.item_id == item.id,
-                Contract.status.in_([ContractStatus.COMPLETED, ContractStatus.ACTIVE])
-            ).count() > 0
-            
-            # Extract features
-            item_features = self._prepare_item_features(item)
-            
-            features.append(item_features)
-            labels.append(1 if was_rented else 0)
+        return status
+    
+    def _train_rental_prediction_model(self, progress: Optional[Callable[[str, int], None]] = None) -> float:
+        """
+        Train rental prediction model and publish it to the registry.
         
-        # Convert to numpy arrays
-        X = np.array(features)
-        y = np.array(labels)
+        Runs in the train_ml_model task, never in a request. Training rows
+        are streamed in chunks and the model is fitted with partial_fit, so
+        memory stays flat as the item history grows.
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        Args:
+            progress: Callback receiving (stage, percent)
         
-        # Scale features
+        Returns:
+            Model accuracy
+        """
+        report = progress or (lambda stage, percent: None)
+        started_at = datetime.utcnow()
+        query = self._rental_training_query()
+        
+        def training_chunks():
+            """Chunks of features, labels and holdout mask."""
+            for data in iter_frames(self.db, query):
+                yield (
+                    self._item_features_frame(data, started_at),
+                    data["was_rented"].astype(int).to_numpy(),
+                    holdout_mask(data["id"])
+                )
+        
+        # Pass 1: dataset size and feature scaling
+        report("scanning_data", 5)
         scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+        samples = 0
+        train_samples = 0
+        for X, _, holdout in training_chunks():
+            samples += len(X)
+            if (~holdout).any():
+                scaler.partial_fit(X[~holdout])
+                train_samples += int((~holdout).sum())
+        
+        if samples < 10 or train_samples == 0:
+            raise ValueError("Not enough data for training")
         
-        # Train model
-        model = LogisticRegression(random_state=42)
-        model.fit(X_train_scaled, y_train)
+        # Pass 2: logistic regression fitted incrementally, several epochs
+        model = SGDClassifier(loss="log_loss", random_state=42)
+        epochs = settings.ML_TRAINING_SGD_EPOCHS
+        for epoch in range(epochs):
+            report("training", 20 + 70 * epoch // epochs)
+            for X, y, holdout in training_chunks():
+                if (~holdout).any():
+                    model.partial_fit(scaler.transform(X[~holdout]), y[~holdout], classes=np.array([0, 1]))
+        
+        # Pass 3: accuracy on holdout rows
+        report("evaluating", 90)
+        correct = 0
+        evaluated = 0
+        for X, y, holdout in training_chunks():
+            if holdout.any():
+                correct += int((model.predict(scaler.transform(X[holdout])) == y[holdout]).sum())
+                evaluated += int(holdout.sum())
+        accuracy = correct / evaluated if evaluated else 0.0
+        
+        # Publish model and scaler as a new registry version
+        report("publishing", 95)
+        model_registry.publish(
+            RENTAL_PREDICTION_MODEL,
+            {"model": model, "scaler": scaler},
+            metrics={"accuracy_score": float(accuracy)},
+            training_samples=samples,
+            training_duration_seconds=int((datetime.utcnow() - started_at).total_seconds()),
+            feature_count=len(scaler.mean_)
+        )
         
-        # Calculate accuracy
-        accuracy = model.score(X_test_scaled, y_test)
+        return accuracy
+    
+    def _rental_training_query(self):
+        """
+        Items older than a week with the rented label joined in SQL.
         
-        # Save model and scaler
-        model_file = os.path.join(self.model_path, "rental_prediction_model.pkl")
-        scaler_file = os.path.join(self.model_path, "rental_prediction_scaler.pkl")
+        Columns match what _item_features_frame expects.
+        """
+        was_rented = select(Contract.id).where(
+            Contract.item_id == Item.id,
+            Contract.status.in_([ContractStatus.COMPLETED, ContractStatus.ACTIVE])
+        ).exists()
+        has_images = case(
+            (func.json_typeof(Item.images) == "array", func.json_array_length(Item.images) > 0),
+            else_=false()
+        )
         
-        joblib.dump(model, model_file)
-        joblib.dump(scaler, scaler_file)
+        return select(
+            Item.id,
+            Item.price_per_day,
+            Item.rating,
+            Item.views_count,
+            Item.created_at,
+            has_images.label("has_images"),
+            func.coalesce(Item.is_featured, false()).label("is_featured"),
+            (func.coalesce(func.length(Item.description), 0) > 50).label("has_description"),
+            Item.total_reviews,
+            was_rented.label("was_rented")
+        ).where(Item.created_at <= datetime.utcnow() - timedelta(days=7))
+    
+    def _item_features_frame(self, data: pd.DataFrame, now: datetime) -> np.ndarray:
+        """
+        Vectorized _prepare_item_features for a chunk of training rows.
         
-        return accuracy
+        Args:
+            data: Rows of _rental_training_query
+            now: Reference time for item age (naive UTC)
+            
+        Returns:
+            Feature matrix
+        """
+        def numeric(column: str) -> pd.Series:
+            return data[column].astype(float).fillna(0)
+        
+        return np.column_stack([
+            numeric("price_per_day") / 100.0,
+            numeric("rating"),
+            np.minimum(numeric("views_count") / 100.0, 10.0),
+            (pd.Timestamp(now, tz="UTC") - pd.to_datetime(data["created_at"], utc=True, cache=False)).dt.days,
+            data["has_images"].astype(float),
+            data["is_featured"].astype(float),
+            data["has_description"].astype(float),
+            numeric("total_reviews")
+        ])
+    
+    def _heuristic_rental_probability(self, features: np.ndarray) -> np.ndarray:
+        """
+        Rental probability without a trained model.
+        
+        Args:
+            features: Matrix of _prepare_item_features rows
+            
+        Returns:
+            Probabilities in [0, 0.9]
+        """
+        rating = features[:, 1]
+        views = features[:, 2]
+        has_images = features[:, 4]
+        is_featured = features[:, 5]
+        has_description = features[:, 6]
+        
+        score = (
+            0.2 +
+            0.03 * views +  # views capped at 10
+            0.04 * rating +
+            0.1 * has_images +
+            0.05 * is_featured +
+            0.05 * has_description
+        )
+        return np.clip(score, 0.0, 0.9)
     
     def _prepare_item_features(self, item: Item) -> List[float]:
         """
@@ -668,6 +1067,7 @@ class AnalyticsService:
             float(item.total_reviews) if item.total_reviews else 0.0
         ]
     
+    @cached_report("analytics.get_geography_analytics")
     def get_geography_analytics(self, period: str = "30d") -> List[Dict[str, Any]]:
         """
         Get geography-based analytics.
@@ -703,7 +1103,7 @@ class AnalyticsService:
     
     def get_search_trends(self, period: str = "30d", limit: int = 20) -> List[Dict[str, Any]]:
         """
-        Get search trends (mock implementation).
+        Get most frequent search queries with growth vs the previous period.
         
         Args:
             period: Time period
@@ -712,9 +1112,7 @@ class AnalyticsService:
         Returns:
             Search trends data
         """
-        # This would require implementing search tracking
-        # For now, return popular categories as proxy
-        return self.get_categories_stats(period)[:limit]
+        return get_trending_searches(self._parse_period(period), limit)
     
     def get_user_analytics(self, user_id: uuid.UUID, period: str = "30d") -> Dict[str, Any]:
         """
@@ -731,97 +1129,316 @@ class AnalyticsService:
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # User's items performance
-        items = self.db.query(Item).filter(Item.owner_id == user_id).all()
-        
-        total_views = sum(item.views_count for item in items)
-        total_favorites = sum(item.favorites_count for item in items)
-        
-        # Contracts as owner
-        owner_contracts = self.db.query(Contract).filter(
+        items = self.db.query(
+            func.count(Item.id).label("total"),
+            func.coalesce(func.sum(Item.views_count), 0).label("views"),
+            func.coalesce(func.sum(Item.favorites_count), 0).label("favorites"),
+            func.avg(Item.price_per_day).label("average_price")
+        ).filter(Item.owner_id == user_id).one()
+        
+        # Contracts as owner and as tenant
+        completed_as_owner = and_(
             Contract.owner_id == user_id,
+            Contract.status == ContractStatus.COMPLETED
+        )
+        contracts = self.db.query(
+            func.count(Contract.id).filter(Contract.owner_id == user_id).label("as_owner"),
+            func.count(Contract.id).filter(Contract.tenant_id == user_id).label("as_tenant"),
+            func.count(Contract.id).filter(completed_as_owner).label("completed_as_owner"),
+            func.coalesce(func.sum(Contract.total_price).filter(completed_as_owner), 0).label("revenue")
+        ).filter(
+            or_(Contract.owner_id == user_id, Contract.tenant_id == user_id),
             Contract.created_at >= start_date
-        ).all()
-        
-        # Contracts as tenant
-        tenant_contracts = self.db.query(Contract).filter(
-            Contract.tenant_id == user_id,
-            Contract.created_at >= start_date
-        ).all()
-        
-        # Revenue calculation
-        completed_as_owner = [c for c in owner_contracts if c.status == ContractStatus.COMPLETED]
-        revenue = sum(float(c.total_price) for c in completed_as_owner)
+        ).one()
         
         return {
             "user_id": user_id,
             "period": period,
             "items_stats": {
-                "total_items": len(items),
-                "total_views": total_views,
-                "total_favorites": total_favorites,
-                "average_price": sum(float(i.price_per_day) for i in items) / len(items) if items else 0
+                "total_items": items.total,
+                "total_views": int(items.views),
+                "total_favorites": int(items.favorites),
+                "average_price": float(items.average_price) if items.average_price else 0
             },
             "contracts_stats": {
-                "as_owner": len(owner_contracts),
-                "as_tenant": len(tenant_contracts),
-                "completed_as_owner": len(completed_as_owner),
-                "revenue": revenue
+                "as_owner": contracts.as_owner,
+                "as_tenant": contracts.as_tenant,
+                "completed_as_owner": contracts.completed_as_owner,
+                "revenue": float(contracts.revenue)
             }
         }
     
-    def get_user_items_performance(self, user_id: uuid.UUID, period: str = "30d") -> List[Dict[str, Any]]:
+    def get_user_items_performance(
+        self, 
+        user_id: uuid.UUID, 
+        period: str = "30d",
+        page: int = 1,
+        size: int = 20,
+        sort_by: str = "revenue",
+        sort_order: str = "desc"
+    ) -> PaginatedResponse:
         """
         Get performance analytics for user's items.
         
+        Activity and revenue are aggregated per item in grouped subqueries,
+        so the cost does not depend on the number of listings.
+        
         Args:
             user_id: User ID
             period: Time period
+            page: Page number
+            size: Page size
+            sort_by: revenue, views, favorites, contracts, conversion, price or title
+            sort_order: asc or desc
             
         Returns:
-            Items performance data
+            Paginated items performance data
         """
-        days = self._parse_period(period)
-        start_date = datetime.utcnow() - timedelta(days=days)
+        today = datetime.utcnow().date()
+        start_day = today - timedelta(days=self._parse_period(period))
+        start_date = datetime.combine(start_day, datetime.min.time())
+        
+        source = self._get_item_activity_source(start_day)
+        activity = select(
+            source.c.item_id,
+            func.sum(source.c.views).label('views'),
+            func.sum(source.c.favorites).label('favorites'),
+            func.sum(source.c.rentals).label('contracts')
+        ).join(
+            Item, Item.id == source.c.item_id
+        ).filter(
+            Item.owner_id == user_id
+        ).group_by(source.c.item_id).subquery()
         
-        items = self.db.query(Item).filter(Item.owner_id == user_id).all()
+        revenue = select(
+            Contract.item_id,
+            func.sum(Contract.total_price).label('revenue')
+        ).filter(
+            Contract.owner_id == user_id,
+            Contract.status == ContractStatus.COMPLETED,
+            Contract.completed_at >= start_date
+        ).group_by(Contract.item_id).subquery()
+        
+        period_views = func.coalesce(activity.c.views, 0)
+        period_favorites = func.coalesce(activity.c.favorites, 0)
+        period_contracts = func.coalesce(activity.c.contracts, 0)
+        period_revenue = func.coalesce(revenue.c.revenue, 0)
+        conversion_rate = case(
+            (period_views > 0, period_contracts * 100.0 / period_views),
+            else_=0
+        )
         
-        performance = []
-        for item in items:
-            # Views in period
-            period_views = self.db.query(ItemView).filter(
-                ItemView.item_id == item.id,
-                ItemView.created_at >= start_date
-            ).count()
-            
-            # Contracts in period
-            period_contracts = self.db.query(Contract).filter(
-                Contract.item_id == item.id,
-                Contract.created_at >= start_date
-            ).count()
-            
-            # Revenue in period
-            completed_contracts = self.db.query(Contract).filter(
-                Contract.item_id == item.id,
-                Contract.status == ContractStatus.COMPLETED,
-                Contract.completed_at >= start_date
-            ).all()
-            
-            period_revenue = sum(float(c.total_price) for c in completed_contracts)
-            
-            performance.append({
-                "item_id": item.id,
-                "title": item.title,
-                "price_per_day": float(item.price_per_day),
-                "period_views": period_views,
-                "period_contracts": period_contracts,
-                "period_revenue": period_revenue,
-                "conversion_rate": (period_contracts / period_views * 100) if period_views > 0 else 0
-            })
+        sort_columns = {
+            "revenue": period_revenue,
+            "views": period_views,
+            "favorites": period_favorites,
+            "contracts": period_contracts,
+            "conversion": conversion_rate,
+            "price": Item.price_per_day,
+            "title": Item.title
+        }
+        if sort_by not in sort_columns:
+            raise BadRequestError(f"Sort field must be one of: {', '.join(sort_columns)}")
+        
+        sort_column = sort_columns[sort_by]
+        order = sort_column.asc() if sort_order.lower() == "asc" else sort_column.desc()
+        
+        total = self.db.query(func.count(Item.id)).filter(Item.owner_id == user_id).scalar()
+        
+        rows = self.db.query(
+            Item.id,
+            Item.title,
+            Item.price_per_day,
+            period_views,
+            period_favorites,
+            period_contracts,
+            period_revenue,
+            conversion_rate
+        ).outerjoin(
+            activity, activity.c.item_id == Item.id
+        ).outerjoin(
+            revenue, revenue.c.item_id == Item.id
+        ).filter(
+            Item.owner_id == user_id
+        ).order_by(order, Item.id).offset((page - 1) * size).limit(size).all()
+        
+        performance = [
+            {
+                "item_id": item_id,
+                "title": title,
+                "price_per_day": float(price_per_day),
+                "period_views": int(views),
+                "period_favorites": int(favorites),
+                "period_contracts": int(contracts),
+                "period_revenue": float(item_revenue),
+                "conversion_rate": float(conversion)
+            }
+            for item_id, title, price_per_day, views, favorites, contracts, item_revenue, conversion in rows
+        ]
+        
+        pages = (total + size - 1) // size
+        
+        return PaginatedResponse(
+            items=performance,
+            meta=PaginationMeta(
+                page=page,
+                size=size,
+                total=total,
+                pages=pages,
+                has_next=page < pages,
+                has_prev=page > 1
+            )
+        )
+    
+    def _use_rollups(self) -> bool:
+        """Check whether reports can be served from daily rollups."""
+        if not settings.ANALYTICS_USE_ROLLUPS:
+            return False
+        return AnalyticsRollupService(self.db).get_high_water_mark() is not None
+    
+    def _get_categories_stats_from_rollups(self, period: str) -> List[Dict[str, Any]]:
+        """Category statistics with period contracts taken from daily rollups."""
+        start_day = (datetime.utcnow() - timedelta(days=self._parse_period(period))).date()
+        
+        items = self.db.query(
+            Item.category_id.label('category_id'),
+            func.count(Item.id).label('items_count'),
+            func.avg(Item.price_per_day).label('avg_price')
+        ).filter(
+            Item.status == ItemStatus.ACTIVE,
+            Item.is_approved == True
+        ).group_by(Item.category_id).subquery()
+        
+        contracts = self.db.query(
+            DailyCategoryStats.category_id.label('category_id'),
+            func.sum(DailyCategoryStats.new_contracts).label('contracts_count')
+        ).filter(
+            DailyCategoryStats.date >= start_day
+        ).group_by(DailyCategoryStats.category_id).subquery()
+        
+        result = self.db.query(
+            Category.id,
+            Category.name,
+            func.coalesce(items.c.items_count, 0),
+            func.coalesce(contracts.c.contracts_count, 0),
+            items.c.avg_price
+        ).outerjoin(
+            items, items.c.category_id == Category.id
+        ).outerjoin(
+            contracts, contracts.c.category_id == Category.id
+        ).filter(
+            Category.is_active == True
+        ).all()
+        
+        return [
+            {
+                "id": cat_id,
+                "name": name,
+                "items_count": items_count,
+                "contracts_count": int(contracts_count),
+                "average_price": float(avg_price) if avg_price else 0.0
+            }
+            for cat_id, name, items_count, contracts_count, avg_price in result
+        ]
+    
+    def _get_price_trends_from_rollups(
+        self, 
+        category_id: Optional[uuid.UUID], 
+        period: str
+    ) -> List[Dict[str, Any]]:
+        """Daily average listing price from daily rollups."""
+        start_day = (datetime.utcnow() - timedelta(days=self._parse_period(period))).date()
+        
+        query = self.db.query(
+            DailyCategoryStats.date,
+            func.sum(DailyCategoryStats.listed_price_sum),
+            func.sum(DailyCategoryStats.listed_items)
+        ).filter(
+            DailyCategoryStats.date >= start_day
+        )
+        
+        if category_id:
+            query = query.filter(DailyCategoryStats.category_id == category_id)
+        
+        result = query.group_by(DailyCategoryStats.date).having(
+            func.sum(DailyCategoryStats.listed_items) > 0
+        ).order_by(DailyCategoryStats.date).all()
+        
+        return [
+            {
+                "date": day.isoformat(),
+                "average_price": float(price_sum) / items_count,
+                "items_count": int(items_count)
+            }
+            for day, price_sum, items_count in result
+        ]
+    
+    def _get_user_activity_from_rollups(self, period: str) -> List[Dict[str, Any]]:
+        """Daily registrations and logins from daily rollups."""
+        start_day = (datetime.utcnow() - timedelta(days=self._parse_period(period))).date()
+        
+        rows = self.db.query(DailyUserStats).filter(
+            DailyUserStats.date >= start_day
+        ).order_by(DailyUserStats.date).all()
+        
+        return [
+            {
+                "date": row.date.isoformat(),
+                "registrations": row.registrations,
+                "logins": row.logins
+            }
+            for row in rows
+        ]
+    
+    def _get_revenue_analytics_from_rollups(self, period: str) -> Dict[str, Any]:
+        """Revenue analytics from daily rollups."""
+        start_day = (datetime.utcnow() - timedelta(days=self._parse_period(period))).date()
         
-        # Sort by revenue
-        performance.sort(key=lambda x: x["period_revenue"], reverse=True)
+        daily_revenue = self.db.query(
+            DailyCategoryStats.date,
+            func.sum(DailyCategoryStats.revenue),
+            func.sum(DailyCategoryStats.completed_contracts)
+        ).filter(
+            DailyCategoryStats.date >= start_day
+        ).group_by(DailyCategoryStats.date).having(
+            func.sum(DailyCategoryStats.completed_contracts) > 0
+        ).order_by(DailyCategoryStats.date).all()
         
-        return performance
+        category_revenue = self.db.query(
+            Category.name,
+            func.sum(DailyCategoryStats.revenue)
+        ).join(
+            Category, Category.id == DailyCategoryStats.category_id
+        ).filter(
+            DailyCategoryStats.date >= start_day
+        ).group_by(Category.name).having(
+            func.sum(DailyCategoryStats.completed_contracts) > 0
+        ).all()
+        
+        total_revenue = sum(float(revenue) for _, revenue, _ in daily_revenue)
+        total_contracts = sum(int(contracts) for _, _, contracts in daily_revenue)
+        avg_contract_value = total_revenue / total_contracts if total_contracts > 0 else 0
+        
+        return {
+            "total_revenue": total_revenue,
+            "total_contracts": total_contracts,
+            "average_contract_value": avg_contract_value,
+            "daily_revenue": [
+                {
+                    "date": day.isoformat(),
+                    "revenue": float(revenue),
+                    "contracts": int(contracts)
+                }
+                for day, revenue, contracts in daily_revenue
+            ],
+            "category_revenue": [
+                {
+                    "category": name,
+                    "revenue": float(revenue)
+                }
+                for name, revenue in category_revenue
+            ]
+        }
     
     def _parse_period(self, period: str) -> int:
         """
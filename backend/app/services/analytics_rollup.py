@@ -0,0 +1,360 @@
+"""
+Analytics rollup service for incremental daily aggregates.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta, time, date
+import uuid
+
+from app.models.user import User
+from app.models.item import Item, ItemStatus, ItemView, Favorite
+from app.models.contract import Contract, ContractStatus
+from app.models.analytics import DailyCategoryStats, DailyItemStats, DailyUserStats, AnalyticsRollupState
+from app.core.config import settings
+
+
+class AnalyticsRollupService:
+    """Service maintaining daily rollups by date and category."""
+
+    ROLLUP_NAME = "daily_stats"
+    RECONCILE_BATCH_SIZE = 1000
+    # Отметка затравочной строки состояния: сборки еще не было
+    SEED_HIGH_WATER_MARK = datetime(1970, 1, 1)
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_high_water_mark(self) -> Optional[datetime]:
+        """
+        Get the time up to which rollups are complete.
+
+        Returns:
+            High-water mark or None if rollups were never built
+        """
+        state = self.db.query(AnalyticsRollupState).filter(
+            AnalyticsRollupState.name == self.ROLLUP_NAME,
+            AnalyticsRollupState.high_water_mark > self.SEED_HIGH_WATER_MARK
+        ).first()
+        return state.high_water_mark if state else None
+
+    def update_daily_rollups(self, full_rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Recompute daily rollups from the high-water mark up to now.
+
+        Every day touched is recomputed from raw rows and replaced as a
+        whole, so repeated or overlapping runs produce the same result.
+        Every ANALYTICS_ROLLUP_RECONCILE_HOURS the listed totals of older
+        days are recounted as well.
+
+        Args:
+            full_rebuild: Ignore the high-water mark and rebuild the backfill window
+
+        Returns:
+            Update summary
+        """
+        now = datetime.utcnow()
+        backfill_day = (now - timedelta(days=settings.ANALYTICS_ROLLUP_BACKFILL_DAYS)).date()
+
+        # Строка состояния создается заранее, иначе при первом запуске
+        # FOR UPDATE нечего блокировать и параллельные сборки не сериализуются
+        self.db.execute(
+            pg_insert(AnalyticsRollupState).values(
+                name=self.ROLLUP_NAME,
+                high_water_mark=self.SEED_HIGH_WATER_MARK
+            ).on_conflict_do_nothing(index_elements=[AnalyticsRollupState.name])
+        )
+        self.db.commit()
+
+        # Блокировка строки состояния сериализует параллельные запуски
+        state = self.db.query(AnalyticsRollupState).filter(
+            AnalyticsRollupState.name == self.ROLLUP_NAME
+        ).with_for_update().one()
+
+        high_water_mark = state.high_water_mark.replace(tzinfo=None)
+        if full_rebuild:
+            start_day = backfill_day
+        else:
+            # Затравочная отметка дает полную сборку окна backfill
+            start_day = max(
+                (high_water_mark - timedelta(days=settings.ANALYTICS_ROLLUP_LOOKBACK_DAYS)).date(),
+                backfill_day
+            )
+
+        start = datetime.combine(start_day, time.min)
+
+        reconciled_at = state.reconciled_at.replace(tzinfo=None) if state.reconciled_at else None
+        reconcile = (
+            full_rebuild
+            or reconciled_at is None
+            or now - reconciled_at >= timedelta(hours=settings.ANALYTICS_ROLLUP_RECONCILE_HOURS)
+        )
+
+        category_rows = self._aggregate_category_stats(start)
+        item_rows = self._aggregate_item_stats(start)
+        user_rows = self._aggregate_user_stats(start)
+
+        self.db.query(DailyCategoryStats).filter(
+            DailyCategoryStats.date >= start_day
+        ).delete(synchronize_session=False)
+        self.db.query(DailyItemStats).filter(
+            DailyItemStats.date >= start_day
+        ).delete(synchronize_session=False)
+        self.db.query(DailyUserStats).filter(
+            DailyUserStats.date >= start_day
+        ).delete(synchronize_session=False)
+
+        if category_rows:
+            self.db.execute(insert(DailyCategoryStats), category_rows)
+        if item_rows:
+            self.db.execute(insert(DailyItemStats), item_rows)
+        if user_rows:
+            self.db.execute(insert(DailyUserStats), user_rows)
+
+        reconciled_rows = self._reconcile_listed_totals(start) if reconcile else None
+
+        state.high_water_mark = now
+        if reconcile:
+            state.reconciled_at = now
+
+        self.db.commit()
+
+        return {
+            "from_date": start_day.isoformat(),
+            "high_water_mark": now.isoformat(),
+            "category_rows": len(category_rows),
+            "item_rows": len(item_rows),
+            "user_rows": len(user_rows),
+            "reconciled_rows": reconciled_rows
+        }
+
+    def _reconcile_listed_totals(self, before: datetime) -> int:
+        """
+        Recount listed_items/listed_price_sum of days before the rebuilt window.
+
+        These totals depend on the current status and price of items, which
+        change long after the creation day, so the incremental window alone
+        lets them drift.
+
+        Args:
+            before: Start of the window rebuilt by the current run
+
+        Returns:
+            Number of day/category rows with listed items
+        """
+        item_day = func.date_trunc('day', Item.created_at)
+        listed = self.db.query(
+            item_day,
+            Item.category_id,
+            func.count(Item.id),
+            func.sum(Item.price_per_day)
+        ).filter(
+            Item.status == ItemStatus.ACTIVE,
+            Item.created_at < before
+        ).group_by(item_day, Item.category_id).all()
+
+        self.db.query(DailyCategoryStats).filter(
+            DailyCategoryStats.date < before.date()
+        ).update({"listed_items": 0, "listed_price_sum": 0}, synchronize_session=False)
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "date": self._as_date(day),
+                "category_id": category_id,
+                "listed_items": listed_items,
+                "listed_price_sum": listed_price_sum
+            }
+            for day, category_id, listed_items, listed_price_sum in listed
+        ]
+
+        # Пачками, чтобы не упереться в лимит параметров запроса
+        for offset in range(0, len(rows), self.RECONCILE_BATCH_SIZE):
+            stmt = pg_insert(DailyCategoryStats).values(rows[offset:offset + self.RECONCILE_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_analytics_daily_category",
+                set_={
+                    "listed_items": stmt.excluded.listed_items,
+                    "listed_price_sum": stmt.excluded.listed_price_sum
+                }
+            )
+            self.db.execute(stmt)
+
+        return len(listed)
+
+    def _aggregate_category_stats(self, start: datetime) -> list:
+        """Aggregate raw rows created since start into per day/category rows."""
+        rows: Dict[Tuple[date, uuid.UUID], Dict[str, Any]] = {}
+
+        def row(day: datetime, category_id: uuid.UUID) -> Dict[str, Any]:
+            key = (self._as_date(day), category_id)
+            if key not in rows:
+                rows[key] = {
+                    "id": uuid.uuid4(),
+                    "date": key[0],
+                    "category_id": category_id,
+                    "new_items": 0,
+                    "listed_items": 0,
+                    "listed_price_sum": 0,
+                    "new_contracts": 0,
+                    "completed_contracts": 0,
+                    "revenue": 0,
+                    "views": 0,
+                    "favorites": 0
+                }
+            return rows[key]
+
+        # New items
+        item_day = func.date_trunc('day', Item.created_at)
+        items = self.db.query(
+            item_day,
+            Item.category_id,
+            func.count(Item.id),
+            func.count(Item.id).filter(Item.status == ItemStatus.ACTIVE),
+            func.coalesce(func.sum(Item.price_per_day).filter(Item.status == ItemStatus.ACTIVE), 0)
+        ).filter(
+            Item.created_at >= start
+        ).group_by(item_day, Item.category_id).all()
+
+        for day, category_id, new_items, listed_items, listed_price_sum in items:
+            target = row(day, category_id)
+            target["new_items"] = new_items
+            target["listed_items"] = listed_items
+            target["listed_price_sum"] = listed_price_sum
+
+        # New contracts
+        contract_day = func.date_trunc('day', Contract.created_at)
+        contracts = self.db.query(
+            contract_day,
+            Item.category_id,
+            func.count(Contract.id)
+        ).join(
+            Item, Contract.item_id == Item.id
+        ).filter(
+            Contract.created_at >= start
+        ).group_by(contract_day, Item.category_id).all()
+
+        for day, category_id, new_contracts in contracts:
+            row(day, category_id)["new_contracts"] = new_contracts
+
+        # Completions and revenue
+        completed_day = func.date_trunc('day', Contract.completed_at)
+        completions = self.db.query(
+            completed_day,
+            Item.category_id,
+            func.count(Contract.id),
+            func.coalesce(func.sum(Contract.total_price), 0)
+        ).join(
+            Item, Contract.item_id == Item.id
+        ).filter(
+            Contract.status == ContractStatus.COMPLETED,
+            Contract.completed_at >= start
+        ).group_by(completed_day, Item.category_id).all()
+
+        for day, category_id, completed_contracts, revenue in completions:
+            target = row(day, category_id)
+            target["completed_contracts"] = completed_contracts
+            target["revenue"] = revenue
+
+        # Views
+        view_day = func.date_trunc('day', ItemView.created_at)
+        views = self.db.query(
+            view_day,
+            Item.category_id,
+            func.count(ItemView.id)
+        ).join(
+            Item, ItemView.item_id == Item.id
+        ).filter(
+            ItemView.created_at >= start
+        ).group_by(view_day, Item.category_id).all()
+
+        for day, category_id, views_count in views:
+            row(day, category_id)["views"] = views_count
+
+        # Favorites
+        favorite_day = func.date_trunc('day', Favorite.created_at)
+        favorites = self.db.query(
+            favorite_day,
+            Item.category_id,
+            func.count(Favorite.id)
+        ).join(
+            Item, Favorite.item_id == Item.id
+        ).filter(
+            Favorite.created_at >= start
+        ).group_by(favorite_day, Item.category_id).all()
+
+        for day, category_id, favorites_count in favorites:
+            row(day, category_id)["favorites"] = favorites_count
+
+        return list(rows.values())
+
+    def _aggregate_item_stats(self, start: datetime) -> list:
+        """Aggregate views, favorites and rentals since start into per day/item rows."""
+        rows: Dict[Tuple[date, uuid.UUID], Dict[str, Any]] = {}
+
+        sources = [
+            ("views", ItemView.item_id, ItemView.id, ItemView.created_at),
+            ("favorites", Favorite.item_id, Favorite.id, Favorite.created_at),
+            ("rentals", Contract.item_id, Contract.id, Contract.created_at)
+        ]
+
+        for field, item_column, id_column, created_column in sources:
+            day_column = func.date_trunc('day', created_column)
+            counts = self.db.query(
+                day_column,
+                item_column,
+                func.count(id_column)
+            ).filter(
+                created_column >= start
+            ).group_by(day_column, item_column).all()
+
+            for day, item_id, count in counts:
+                key = (self._as_date(day), item_id)
+                if key not in rows:
+                    rows[key] = {
+                        "id": uuid.uuid4(),
+                        "date": key[0],
+                        "item_id": item_id,
+                        "views": 0,
+                        "favorites": 0,
+                        "rentals": 0
+                    }
+                rows[key][field] = count
+
+        return list(rows.values())
+
+    def _aggregate_user_stats(self, start: datetime) -> list:
+        """Aggregate registrations and logins since start into daily rows."""
+        rows: Dict[date, Dict[str, Any]] = {}
+
+        registration_day = func.date_trunc('day', User.created_at)
+        registrations = self.db.query(
+            registration_day,
+            func.count(User.id)
+        ).filter(
+            User.created_at >= start
+        ).group_by(registration_day).all()
+
+        for day, count in registrations:
+            day = self._as_date(day)
+            rows.setdefault(day, {"date": day, "registrations": 0, "logins": 0})["registrations"] = count
+
+        login_day = func.date_trunc('day', User.last_login)
+        logins = self.db.query(
+            login_day,
+            func.count(User.id)
+        ).filter(
+            User.last_login >= start
+        ).group_by(login_day).all()
+
+        for day, count in logins:
+            day = self._as_date(day)
+            rows.setdefault(day, {"date": day, "registrations": 0, "logins": 0})["logins"] = count
+
+        return list(rows.values())
+
+    def _as_date(self, value: Any) -> date:
+        """Convert date_trunc result to date."""
+        return value.date() if isinstance(value, datetime) else value
@@ -7,6 +7,7 @@ Authentication service for user management.
 
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
 import uuid
@@ -19,6 +20,7 @@ from app.core.security import (
     verify_email_verification_token
 )
 from app.models.user import User, UserStatus, UserRole
+from app.models.analytics import UserLoginDay
 from app.schemas.user import UserCreate, UserUpdate, UserLogin
 from app.core.config import settings
 
@@ -173,6 +175,13 @@ class AuthService:
         
         # Update last login
         user.last_login = datetime.utcnow()
+        
+        # Login day for cohort retention analytics
+        self.db.execute(
+            pg_insert(UserLoginDay).values(
+                user_id=user.id, date=user.last_login.date()
+            ).on_conflict_do_nothing()
+        )
         self.db.commit()
         
         # Generate tokens
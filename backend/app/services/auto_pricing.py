@@ -0,0 +1,349 @@
+"""
+Automatic pricing executor.
+
+A run claims due ``AutoPricingConfiguration`` rows (``FOR UPDATE SKIP LOCKED``
+and a ``claimed_at`` stamp committed with the run, so overlapping runs never
+pick the same configs; a claim expires after AUTO_PRICING_CLAIM_TIMEOUT),
+packs them into chunks of whole owners (an owner is never split, so it gets
+one notification per run) and hands each chunk to a Celery task. A chunk
+re-locks its configs, scores all affected items with batched model calls and
+applies the accepted price changes and their ``PricingHistory`` rows with bulk
+statements in a single transaction. Per-run throughput is accumulated in
+``AutoPricingRun``.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func, insert, update
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import groupby
+import logging
+import time
+import uuid
+
+from app.core.config import settings
+from app.models.item import Item, ItemStatus
+from app.models.pricing import AutoPricingConfiguration, AutoPricingRun, PricingHistory
+from app.services.dynamic_pricing_model import DynamicPricingModel, PricingRecommendation
+from app.services.category_price_stats import mark_category_prices_changed
+
+logger = logging.getLogger(__name__)
+
+MAX_HISTORY_CHANGE_PERCENTAGE = 999.99
+
+
+class AutoPricingExecutor:
+    """Claims due auto-pricing configs and applies price changes in bulk."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def start_run(self) -> Tuple[AutoPricingRun, List[List[str]]]:
+        """
+        Claim due configs and split them into chunks.
+
+        Returns:
+            Created run and chunks of config IDs (as strings, for task arguments)
+        """
+        claimed = self.db.query(
+            AutoPricingConfiguration.id, AutoPricingConfiguration.user_id
+        ).filter(
+            self._due()
+        ).order_by(
+            AutoPricingConfiguration.last_applied_at.asc().nullsfirst()
+        ).limit(
+            settings.AUTO_PRICING_MAX_CONFIGS_PER_RUN
+        ).with_for_update(skip_locked=True).all()
+
+        # Отметка захвата фиксируется вместе с запуском: параллельный запуск эти конфиги не увидит
+        if claimed:
+            self.db.query(AutoPricingConfiguration).filter(
+                AutoPricingConfiguration.id.in_([row.id for row in claimed])
+            ).update({AutoPricingConfiguration.claimed_at: func.now()}, synchronize_session=False)
+
+        chunks = self._chunk_by_owner(claimed, settings.AUTO_PRICING_CHUNK_SIZE)
+
+        run = AutoPricingRun(configs_claimed=len(claimed), chunks_total=len(chunks))
+        self.db.add(run)
+        self.db.commit()
+
+        return run, chunks
+
+    def _chunk_by_owner(self, claimed: List[Any], size: int) -> List[List[str]]:
+        """
+        Pack claimed configs into chunks of about `size`, keeping each owner whole.
+
+        An owner with more than `size` configs gets a chunk of its own.
+        """
+        chunks: List[List[str]] = []
+        current: List[str] = []
+
+        claimed = sorted(claimed, key=lambda row: str(row.user_id))
+        for _, rows in groupby(claimed, key=lambda row: str(row.user_id)):
+            owner_ids = [str(row.id) for row in rows]
+            if current and len(current) + len(owner_ids) > size:
+                chunks.append(current)
+                current = []
+            current.extend(owner_ids)
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def run_chunk(self, run_id: uuid.UUID, config_ids: List[uuid.UUID]) -> Dict[str, int]:
+        """
+        Apply auto-pricing for a chunk of configs in one transaction.
+
+        Args:
+            run_id: Run the chunk belongs to
+            config_ids: Config IDs
+
+        Returns:
+            Chunk counters
+        """
+        started = time.monotonic()
+        stats = {"configs_processed": 0, "items_evaluated": 0, "prices_changed": 0, "items_skipped": 0, "errors": 0}
+        notify: Dict[uuid.UUID, int] = {}
+
+        try:
+            # Повторная проверка под блокировкой: конфиг мог обработать другой запуск
+            configs = self.db.query(AutoPricingConfiguration).filter(
+                AutoPricingConfiguration.id.in_(config_ids),
+                self._due(include_claimed=True)
+            ).with_for_update(skip_locked=True).all()
+
+            now = datetime.utcnow()
+            model = DynamicPricingModel(self.db)
+            season = model._get_season(now)
+            price_updates: List[Dict[str, Any]] = []
+            history: List[Dict[str, Any]] = []
+
+            targets = [
+                (config, item) for config, item in self._resolve_items(configs)
+                if season not in (config.excluded_seasons or [])
+            ]
+            batch_size = settings.AUTO_PRICING_BATCH_SIZE
+            for start in range(0, len(targets), batch_size):
+                batch = targets[start:start + batch_size]
+                recommendations = {
+                    recommendation.item_id: recommendation
+                    for recommendation in model.get_bulk_recommendations([item.id for _, item in batch], now)
+                }
+
+                for config, item in batch:
+                    stats["items_evaluated"] += 1
+                    recommendation = recommendations.get(item.id)
+                    new_price = self._decide_price(config, item, recommendation)
+                    if new_price is None:
+                        stats["items_skipped"] += 1
+                        continue
+
+                    old_price = float(item.price_per_day)
+                    price_updates.append({"id": item.id, "price_per_day": Decimal(str(new_price)), "updated_at": now})
+                    history.append({
+                        "item_id": item.id,
+                        "user_id": config.user_id,
+                        "old_price": Decimal(str(old_price)),
+                        "new_price": Decimal(str(new_price)),
+                        "change_percentage": round((new_price - old_price) / old_price * 100, 2),
+                        "change_reason": "automatic",
+                        "confidence_score": round(recommendation.confidence_score, 2),
+                        "market_factors": {
+                            "seasonal_adjustment": recommendation.seasonal_adjustment,
+                            "competition_adjustment": recommendation.competition_adjustment,
+                            "demand_adjustment": recommendation.demand_adjustment
+                        },
+                        "price_metadata": {
+                            "run_id": str(run_id),
+                            "config_id": str(config.id),
+                            "model_version": model.model_version or "heuristic"
+                        }
+                    })
+                    if config.notification_enabled:
+                        notify[config.user_id] = notify.get(config.user_id, 0) + 1
+
+            # Цены, история и отметки конфигов - одной транзакцией
+            if price_updates:
+                self.db.execute(update(Item), price_updates)
+                self.db.execute(insert(PricingHistory), history)
+            for config in configs:
+                config.last_applied_at = now
+                config.claimed_at = None
+            self.db.commit()
+
+            stats["configs_processed"] = len(configs)
+            stats["prices_changed"] = len(price_updates)
+            mark_category_prices_changed({item.category_id for _, item in targets} if price_updates else [])
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Auto-pricing chunk of run {run_id} failed: {e}")
+            stats["errors"] += 1
+            notify = {}
+
+        self._record_chunk(run_id, stats, time.monotonic() - started)
+        self._notify_owners(notify)
+        return stats
+
+    def get_run(self, run_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get run progress and throughput.
+
+        Args:
+            run_id: Run ID
+
+        Returns:
+            Run counters or None if the run does not exist
+        """
+        run = self.db.query(AutoPricingRun).filter(AutoPricingRun.id == run_id).first()
+        if not run:
+            return None
+
+        elapsed = (run.finished_at - run.started_at).total_seconds() if run.finished_at else None
+        return {
+            "run_id": run.id,
+            "configs_claimed": run.configs_claimed,
+            "chunks_total": run.chunks_total,
+            "chunks_completed": run.chunks_completed,
+            "configs_processed": run.configs_processed,
+            "items_evaluated": run.items_evaluated,
+            "prices_changed": run.prices_changed,
+            "items_skipped": run.items_skipped,
+            "errors": run.errors,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "items_per_second": run.items_evaluated / elapsed if elapsed else None
+        }
+
+    def _due(self, include_claimed: bool = False):
+        """
+        Condition for enabled configs whose update interval has passed.
+
+        Args:
+            include_claimed: Also match configs claimed by a run (for its chunks)
+        """
+        condition = and_(
+            AutoPricingConfiguration.enabled == True,
+            or_(
+                AutoPricingConfiguration.last_applied_at.is_(None),
+                AutoPricingConfiguration.last_applied_at <= func.now() - func.make_interval(
+                    0, 0, 0, 0, AutoPricingConfiguration.update_frequency_hours
+                )
+            )
+        )
+        if include_claimed:
+            return condition
+
+        # Захват упавшего чанка истекает, и конфиг снова попадает в запуск
+        return and_(condition, or_(
+            AutoPricingConfiguration.claimed_at.is_(None),
+            AutoPricingConfiguration.claimed_at < datetime.utcnow() - timedelta(seconds=settings.AUTO_PRICING_CLAIM_TIMEOUT)
+        ))
+
+    def _resolve_items(self, configs: List[AutoPricingConfiguration]) -> List[Tuple[AutoPricingConfiguration, Item]]:
+        """
+        Active items affected by configs, locked for the price update.
+
+        Item-level configs take precedence over owner-wide ones; items locked
+        by another transaction are skipped until the next run.
+        """
+        item_configs = {config.item_id: config for config in configs if config.item_id}
+        owner_configs = {config.user_id: config for config in configs if not config.item_id}
+        if not item_configs and not owner_configs:
+            return []
+
+        has_item_config = self.db.query(AutoPricingConfiguration.id).filter(
+            AutoPricingConfiguration.item_id == Item.id,
+            AutoPricingConfiguration.enabled == True
+        ).exists()
+
+        items = self.db.query(Item).filter(
+            Item.status == ItemStatus.ACTIVE,
+            or_(
+                Item.id.in_(list(item_configs)),
+                and_(Item.owner_id.in_(list(owner_configs)), ~has_item_config)
+            )
+        ).with_for_update(skip_locked=True, of=Item).all()
+
+        targets = []
+        for item in items:
+            config = item_configs.get(item.id) or owner_configs.get(item.owner_id)
+            # Конфиг товара действует только для его владельца
+            if config and config.user_id == item.owner_id:
+                targets.append((config, item))
+        return targets
+
+    def _decide_price(
+        self,
+        config: AutoPricingConfiguration,
+        item: Item,
+        recommendation: Optional[PricingRecommendation]
+    ) -> Optional[float]:
+        """New price allowed by the config, or None to keep the current one."""
+        if recommendation is None:
+            return None
+        if recommendation.confidence_score < float(config.min_confidence_score or 0):
+            return None
+        if config.exclude_high_risk and recommendation.risk_assessment == "high":
+            return None
+
+        current = float(item.price_per_day or 0)
+        if current <= 0:
+            return None
+
+        new_price = recommendation.recommended_price
+        if config.min_price is not None:
+            new_price = max(new_price, float(config.min_price))
+        if config.max_price is not None:
+            new_price = min(new_price, float(config.max_price))
+
+        # Ограничение изменения за один запуск действует и после границ цены:
+        # товар ниже min_price доходит до нее за несколько запусков
+        max_change = float(config.max_change_percentage or 0) / 100
+        new_price = min(max(new_price, current * (1 - max_change)), current * (1 + max_change))
+
+        new_price = round(new_price, 8)
+        if new_price <= 0 or abs(new_price - current) < 1e-8:
+            return None
+        # PricingHistory.change_percentage - Numeric(5, 2)
+        if abs(round((new_price - current) / current * 100, 2)) > MAX_HISTORY_CHANGE_PERCENTAGE:
+            logger.warning(f"Auto-pricing change for item {item.id} exceeds the history range, skipped")
+            return None
+        return new_price
+
+    def _record_chunk(self, run_id: uuid.UUID, stats: Dict[str, int], seconds: float) -> None:
+        """Add chunk counters to the run with one atomic update."""
+        try:
+            self.db.query(AutoPricingRun).filter(AutoPricingRun.id == run_id).update({
+                **{
+                    getattr(AutoPricingRun, name): getattr(AutoPricingRun, name) + value
+                    for name, value in stats.items()
+                },
+                AutoPricingRun.chunks_completed: AutoPricingRun.chunks_completed + 1,
+                AutoPricingRun.processing_seconds: AutoPricingRun.processing_seconds + seconds,
+                AutoPricingRun.finished_at: func.now()
+            }, synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Failed to record auto-pricing run {run_id}: {e}")
+
+    def _notify_owners(self, changed_by_owner: Dict[uuid.UUID, int]) -> None:
+        """One notification per owner about applied changes."""
+        if not changed_by_owner:
+            return
+
+        from app.services.notification import NotificationService
+
+        notifications = NotificationService(self.db)
+        for user_id, changed in changed_by_owner.items():
+            try:
+                notifications.create_notification(
+                    user_id=user_id,
+                    title="Prices Updated Automatically",
+                    message=f"Auto-pricing changed the price of {changed} item(s)",
+                    type="info",
+                    data={"changed_items": changed}
+                )
+            except Exception as e:
+                logger.warning(f"Failed to notify {user_id} about auto-pricing: {e}")
@@ -0,0 +1,283 @@
+"""
+Shared per-category price distributions.
+
+For every category the prices of listed (active, approved) items are
+summarized as count, sum, min, max and a fixed grid of
+CATEGORY_PRICE_QUANTILES + 1 quantiles, together with average views and
+rating. Summaries are stored in Redis, so every process reads the same
+distribution with one GET (or MGET for many categories), and median,
+percentile and price-rank lookups are O(1) on the quantile grid.
+
+Code that changes an item's price, status, approval or category calls
+``mark_category_prices_changed``, which queues the category and bumps its
+change version; the ``refresh_category_price_stats`` task recomputes the
+queued categories with one grouped query and only then removes them from
+the queue. A missing or expired summary is computed on read. Summaries are
+always computed on the primary, since a lagging replica could miss the
+change that queued the category and the stale result would be cached for
+CATEGORY_PRICE_STATS_MAX_AGE. Without Redis, summaries are computed on
+every call.
+"""
+
+from typing import Dict, Iterable, List, Optional
+from dataclasses import dataclass, asdict
+from sqlalchemy import Float, func, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from datetime import datetime
+import json
+import logging
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import redis_client, PrimaryReadSessionLocal
+from app.models.item import Item, ItemStatus
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_PRICES_KEY = "pricing:category_prices:{category_id}"
+CATEGORY_PRICES_DIRTY_KEY = "pricing:category_prices:dirty"
+# Счетчик изменений категории (по нему процессы перезагружают индекс конкуренции)
+CATEGORY_PRICES_VERSION_KEY = "pricing:category_prices:{category_id}:version"
+
+
+@dataclass
+class CategoryPriceDistribution:
+    """Price distribution of a category's listed items."""
+
+    count: int
+    total: float
+    min_price: float
+    max_price: float
+    quantiles: List[float]  # Квантили на равномерной сетке от 0 до 1
+    avg_views: float
+    avg_rating: float
+    computed_at: float
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def quantile(self, q: float) -> float:
+        """Price at quantile q (linear between grid points)."""
+        if not self.quantiles:
+            return 0.0
+        position = min(max(q, 0.0), 1.0) * (len(self.quantiles) - 1)
+        lower = int(position)
+        if lower == len(self.quantiles) - 1:
+            return self.quantiles[lower]
+        return self.quantiles[lower] + (self.quantiles[lower + 1] - self.quantiles[lower]) * (position - lower)
+
+    def share_below(self, price: float) -> float:
+        """Approximate share of items priced strictly below price."""
+        return float(share_below(np.asarray(self.quantiles), np.array([price]))[0]) if self.count else 0.0
+
+
+def share_below(quantiles: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Approximate share of a distribution strictly below each price.
+
+    Args:
+        quantiles: Quantile grid from 0 to 1 (non-decreasing)
+        prices: Prices to rank
+
+    Returns:
+        Shares in [0, 1]
+    """
+    steps = len(quantiles) - 1
+    upper = np.searchsorted(quantiles, prices, side="left")
+    lower = np.clip(upper - 1, 0, steps)
+    upper = np.clip(upper, 0, steps)
+    span = quantiles[upper] - quantiles[lower]
+    fraction = np.where(span > 0, (prices - quantiles[lower]) / np.where(span > 0, span, 1), 0.0)
+    share = (lower + fraction) / steps
+    share = np.where(prices <= quantiles[0], 0.0, share)
+    return np.where(prices > quantiles[-1], 1.0, share)
+
+
+def mark_category_prices_changed(category_ids: Iterable[Optional[uuid.UUID]]) -> None:
+    """
+    Queue categories for a distribution refresh after item changes.
+
+    Args:
+        category_ids: Categories whose items changed price, status or approval
+    """
+    category_ids = {category_id for category_id in category_ids if category_id}
+    if not category_ids:
+        return
+
+    # Текущий процесс видит изменение сразу, остальные - по версии в Redis
+    from app.services.competition_index import competition_index
+    competition_index.invalidate(category_ids)
+
+    if redis_client is None:
+        return
+    category_ids = {str(category_id) for category_id in category_ids}
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(CATEGORY_PRICES_DIRTY_KEY, *category_ids)
+        for category_id in category_ids:
+            pipe.incr(CATEGORY_PRICES_VERSION_KEY.format(category_id=category_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to mark category prices as changed: {e}")
+
+
+class CategoryPriceStats:
+    """Read and refresh cached category price distributions."""
+
+    def get(self, category_id: uuid.UUID) -> Optional[CategoryPriceDistribution]:
+        """
+        Get the price distribution of a category.
+
+        Args:
+            category_id: Category ID
+
+        Returns:
+            Distribution or None if the category has no listed items
+        """
+        return self.get_many([category_id]).get(category_id)
+
+    def get_many(self, category_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, CategoryPriceDistribution]:
+        """
+        Get price distributions of several categories.
+
+        Args:
+            category_ids: Category IDs
+
+        Returns:
+            Distributions by category (categories without listed items are omitted)
+        """
+        category_ids = list({category_id for category_id in category_ids if category_id})
+        if not category_ids:
+            return {}
+
+        distributions: Dict[uuid.UUID, CategoryPriceDistribution] = {}
+        if redis_client is not None:
+            try:
+                cached = redis_client.mget([
+                    CATEGORY_PRICES_KEY.format(category_id=category_id) for category_id in category_ids
+                ])
+                for category_id, raw in zip(category_ids, cached):
+                    if raw:
+                        distributions[category_id] = CategoryPriceDistribution(**json.loads(raw))
+            except Exception as e:
+                logger.warning(f"Failed to read category price distributions: {e}")
+
+        missing = [category_id for category_id in category_ids if category_id not in distributions]
+        if missing:
+            distributions.update(self.refresh(missing))
+
+        # Пустая категория хранится как count=0, чтобы не пересчитывать ее на каждом запросе
+        return {
+            category_id: distribution
+            for category_id, distribution in distributions.items()
+            if distribution.count
+        }
+
+    def refresh(self, category_ids: Optional[List[uuid.UUID]] = None) -> Dict[uuid.UUID, CategoryPriceDistribution]:
+        """
+        Recompute distributions and store them in Redis.
+
+        Args:
+            category_ids: Categories to recompute (default: all marked as changed)
+
+        Returns:
+            Recomputed distributions by category
+        """
+        changed = None
+        if category_ids is None:
+            category_ids = changed = self._changed()
+        if not category_ids:
+            return {}
+
+        distributions = self._compute(category_ids)
+        if redis_client is not None:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for category_id, distribution in distributions.items():
+                    pipe.set(
+                        CATEGORY_PRICES_KEY.format(category_id=category_id),
+                        json.dumps(asdict(distribution)),
+                        ex=settings.CATEGORY_PRICE_STATS_MAX_AGE
+                    )
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to store category price distributions: {e}")
+                return distributions
+
+            # Снимаем отметки только после пересчета; новые отметки за время пересчета остаются
+            if changed:
+                try:
+                    redis_client.srem(CATEGORY_PRICES_DIRTY_KEY, *[str(category_id) for category_id in changed])
+                except Exception as e:
+                    logger.warning(f"Failed to clear changed categories: {e}")
+
+        return distributions
+
+    def _compute(self, category_ids: List[uuid.UUID]) -> Dict[uuid.UUID, CategoryPriceDistribution]:
+        """Distributions of several categories with one grouped query on the primary."""
+        steps = settings.CATEGORY_PRICE_QUANTILES
+        fractions = [i / steps for i in range(steps + 1)]
+        computed_at = datetime.utcnow().timestamp()
+
+        db = PrimaryReadSessionLocal()
+        try:
+            rows = db.query(
+                Item.category_id,
+                func.count(Item.id),
+                func.sum(Item.price_per_day),
+                func.min(Item.price_per_day),
+                func.max(Item.price_per_day),
+                type_coerce(
+                    func.percentile_cont(array(fractions)).within_group(Item.price_per_day), ARRAY(Float)
+                ),
+                func.avg(Item.views_count),
+                func.avg(Item.rating)
+            ).filter(
+                Item.category_id.in_(category_ids),
+                Item.status == ItemStatus.ACTIVE,
+                Item.is_approved == True
+            ).group_by(Item.category_id).all()
+        finally:
+            db.close()
+
+        distributions = {
+            category_id: CategoryPriceDistribution(
+                count=count,
+                total=float(total or 0),
+                min_price=float(min_price or 0),
+                max_price=float(max_price or 0),
+                quantiles=[float(value) for value in quantiles or []],
+                avg_views=float(avg_views or 0),
+                avg_rating=float(avg_rating or 0),
+                computed_at=computed_at
+            )
+            for category_id, count, total, min_price, max_price, quantiles, avg_views, avg_rating in rows
+        }
+        for category_id in category_ids:
+            distributions.setdefault(category_id, CategoryPriceDistribution(
+                count=0, total=0.0, min_price=0.0, max_price=0.0, quantiles=[],
+                avg_views=0.0, avg_rating=0.0, computed_at=computed_at
+            ))
+
+        return distributions
+
+    def _changed(self) -> List[uuid.UUID]:
+        """All categories marked as changed (they stay marked until refreshed)."""
+        if redis_client is None:
+            return []
+
+        try:
+            members = redis_client.smembers(CATEGORY_PRICES_DIRTY_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read changed categories: {e}")
+            return []
+
+        return [uuid.UUID(member.decode() if isinstance(member, bytes) else member) for member in members]
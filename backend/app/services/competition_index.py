@@ -0,0 +1,237 @@
+"""
+In-memory competition index.
+
+For each category the prices of listed (active, approved) items are kept in
+a sorted NumPy array, loaded on first use and shared by all requests of the
+process. Competitor counts within a price band, price ranks and nearest
+competitor prices are binary searches on that array, per item or for whole
+batches at once.
+
+Every ``mark_category_prices_changed`` call bumps a per-category version in
+Redis. The index compares versions at most every
+COMPETITION_INDEX_CHECK_INTERVAL seconds (one MGET for all requested
+categories) and reloads changed categories with one query on the primary, so
+a lagging replica cannot pair a new version with old prices. Every category
+is also reloaded after COMPETITION_INDEX_MAX_AGE seconds, with or without
+Redis.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import redis_client, PrimaryReadSessionLocal
+from app.models.item import Item, ItemStatus
+from app.services.category_price_stats import CATEGORY_PRICES_VERSION_KEY
+
+logger = logging.getLogger(__name__)
+
+# Конкуренты - товары категории с ценой в пределах ±30%; плотность насыщается на 20 конкурентах
+COMPETITION_PRICE_BAND = 0.3
+COMPETITION_DENSITY_SCALE = 20
+
+
+@dataclass
+class CategoryPriceIndex:
+    """Sorted prices of a category's listed items."""
+
+    prices: np.ndarray
+    item_ids: np.ndarray  # В порядке prices
+    version: Optional[int] = None
+    loaded_at: float = field(default_factory=time.monotonic)
+    checked_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.total = float(self.prices.sum())
+        self.members = set(self.item_ids.tolist())
+
+    @property
+    def count(self) -> int:
+        return len(self.prices)
+
+    def count_below(self, prices: np.ndarray) -> np.ndarray:
+        """Number of items priced strictly below each price."""
+        return np.searchsorted(self.prices, prices, side="left")
+
+    def count_between(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Number of items priced within [low, high] for each pair."""
+        return np.searchsorted(self.prices, high, side="right") - np.searchsorted(self.prices, low, side="left")
+
+    def nearest(self, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest prices strictly below and strictly above each price.
+
+        Returns:
+            Lower and higher neighbour prices (NaN where there is none)
+        """
+        below = np.searchsorted(self.prices, prices, side="left")
+        above = np.searchsorted(self.prices, prices, side="right")
+        padded = np.concatenate([[np.nan], self.prices, [np.nan]])
+        return padded[below], padded[above + 1]
+
+    def median_excluding(self, price: float, exclude: bool) -> float:
+        """Median price, optionally without one item at the given price."""
+        n = self.count - int(exclude)
+        if n <= 0:
+            return price
+        skip = int(self.count_below(np.array([price]))[0]) if exclude else n + 1
+
+        def nth(j: int) -> float:
+            return float(self.prices[j if j < skip else j + 1])
+
+        return nth(n // 2) if n % 2 else (nth(n // 2 - 1) + nth(n // 2)) / 2
+
+
+class CompetitionIndex:
+    """Process-wide cache of per-category sorted price arrays."""
+
+    def __init__(self):
+        self._categories: Dict[uuid.UUID, CategoryPriceIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, category_id: uuid.UUID) -> Optional[CategoryPriceIndex]:
+        """
+        Get the index of a category.
+
+        Args:
+            category_id: Category ID
+
+        Returns:
+            Index or None if the category has no listed items
+        """
+        return self.get_many([category_id]).get(category_id)
+
+    def get_many(self, category_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, CategoryPriceIndex]:
+        """
+        Get indexes of several categories, reloading stale ones in one query.
+
+        Args:
+            category_ids: Category IDs
+
+        Returns:
+            Indexes by category (categories without listed items are omitted)
+        """
+        category_ids = list({category_id for category_id in category_ids if category_id})
+        now = time.monotonic()
+
+        due = [
+            category_id for category_id in category_ids
+            if category_id not in self._categories
+            or now - self._categories[category_id].checked_at >= settings.COMPETITION_INDEX_CHECK_INTERVAL
+        ]
+        if due:
+            versions = self._versions(due)
+            stale = []
+            for category_id in due:
+                index = self._categories.get(category_id)
+                if index is None or self._is_stale(index, versions.get(category_id), now):
+                    stale.append(category_id)
+                else:
+                    index.checked_at = now
+            if stale:
+                self._load(stale, versions)
+
+        result = {}
+        for category_id in category_ids:
+            index = self._categories.get(category_id)
+            if index is not None and index.count:
+                result[category_id] = index
+        return result
+
+    def competitors_within(
+        self,
+        items: List[Item],
+        band: float = COMPETITION_PRICE_BAND
+    ) -> np.ndarray:
+        """
+        Count listed competitors priced within ±band of each item (the item itself excluded).
+
+        Args:
+            items: Items
+            band: Relative price band
+
+        Returns:
+            Competitor counts in the order of items
+        """
+        indexes = self.get_many(item.category_id for item in items)
+        prices = np.array([float(item.price_per_day) for item in items])
+        categories = np.array([item.category_id for item in items], dtype=object)
+        counts = np.zeros(len(items), dtype=int)
+
+        # Сам товар не считается своим конкурентом
+        is_member = np.array([
+            item.category_id in indexes and item.id in indexes[item.category_id].members for item in items
+        ], dtype=int)
+        for category_id, index in indexes.items():
+            mask = categories == category_id
+            in_band = index.count_between(prices[mask] * (1 - band), prices[mask] * (1 + band))
+            counts[mask] = np.maximum(in_band - is_member[mask], 0)
+
+        return counts
+
+    def invalidate(self, category_ids: Optional[Iterable[uuid.UUID]] = None) -> None:
+        """Drop categories (default: all) so they are reloaded on next use."""
+        with self._lock:
+            if category_ids is None:
+                self._categories.clear()
+            else:
+                for category_id in category_ids:
+                    self._categories.pop(category_id, None)
+
+    def _is_stale(self, index: CategoryPriceIndex, version: Optional[int], now: float) -> bool:
+        """Whether a loaded category must be reloaded."""
+        if now - index.loaded_at >= settings.COMPETITION_INDEX_MAX_AGE:
+            return True
+        return redis_client is not None and version != index.version
+
+    def _versions(self, category_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Optional[int]]:
+        """Current change versions of categories from Redis."""
+        if redis_client is None:
+            return {}
+
+        try:
+            values = redis_client.mget([
+                CATEGORY_PRICES_VERSION_KEY.format(category_id=category_id) for category_id in category_ids
+            ])
+        except Exception as e:
+            logger.warning(f"Failed to read category price versions: {e}")
+            return {}
+
+        return {
+            category_id: int(value) if value is not None else None
+            for category_id, value in zip(category_ids, values)
+        }
+
+    def _load(self, category_ids: List[uuid.UUID], versions: Dict[uuid.UUID, Optional[int]]) -> None:
+        """Load sorted prices of categories with one query on the primary and swap them in."""
+        db = PrimaryReadSessionLocal()
+        try:
+            rows = db.query(Item.category_id, Item.id, Item.price_per_day).filter(
+                Item.category_id.in_(category_ids),
+                Item.status == ItemStatus.ACTIVE,
+                Item.is_approved == True
+            ).order_by(Item.category_id, Item.price_per_day).all()
+        finally:
+            db.close()
+
+        grouped: Dict[uuid.UUID, Tuple[list, list]] = {category_id: ([], []) for category_id in category_ids}
+        for category_id, item_id, price in rows:
+            grouped[category_id][0].append(float(price))
+            grouped[category_id][1].append(item_id)
+
+        with self._lock:
+            for category_id, (prices, item_ids) in grouped.items():
+                self._categories[category_id] = CategoryPriceIndex(
+                    prices=np.array(prices, dtype=np.float64),
+                    item_ids=np.array(item_ids, dtype=object),
+                    version=versions.get(category_id)
+                )
+
+
+competition_index = CompetitionIndex()
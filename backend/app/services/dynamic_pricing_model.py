@@ -3,7 +3,7 @@ Dynamic Pricing Model for RentChain
 Модель динамического ценообразования для оптимизации цен на аренду
 """
 
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc, text
 from datetime import datetime, timedelta
@@ -11,11 +11,8 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import joblib
-import os
 import logging
+import math
 from dataclasses import dataclass
 import uuid
 
@@ -23,6 +20,13 @@ from app.models.item import Item, Category, ItemStatus
 from app.models.contract import Contract, ContractStatus
 from app.models.user import User
 from app.core.config import settings
+from app.core.database import get_read_session
+from app.services.search_tracking import get_item_search_impressions
+from app.services.pricing_features import PricingFeatureStore
+from app.services.category_price_stats import CategoryPriceStats
+from app.services.competition_index import competition_index, COMPETITION_DENSITY_SCALE
+from app.services.model_registry import model_registry
+from app.services.training_data import iter_frames, holdout_mask, StreamingRegressionMetrics
 from app.utils.exceptions import BadRequestError
 
 logger = logging.getLogger(__name__)
@@ -76,6 +80,29 @@ class PricingFeatures:
     owner_response_time_score: float
 
 
+PRICING_MODEL_NAME = "pricing"
+
+# Потолок уверенности для эвристических рекомендаций (пока модель не обучена)
+HEURISTIC_CONFIDENCE = 0.4
+HEURISTIC_REASON = "Модель ценообразования обучается: рекомендация рассчитана по упрощенной эвристике"
+
+# Эластичность спроса по цене, если для категории нет оценки
+DEFAULT_PRICE_ELASTICITY = -1.5
+# Предполагаемое количество букингов товара в месяц
+DEFAULT_MONTHLY_BOOKINGS = 10
+
+# Порядок признаков в векторе модели (см. _features_to_vector)
+FEATURE_VECTOR_COLUMNS = [
+    'current_price', 'item_age_days', 'item_condition_score', 'has_images',
+    'description_length', 'brand_popularity_score', 'views_count', 'favorites_count',
+    'total_reviews', 'average_rating', 'rental_history_count', 'month', 'day_of_week',
+    'is_holiday', 'is_weekend', 'category_avg_price', 'category_median_price',
+    'similar_items_count', 'competition_density', 'location_demand_score',
+    'recent_search_count', 'booking_rate_7d', 'booking_rate_30d', 'cancellation_rate',
+    'owner_rating', 'owner_total_items', 'owner_completion_rate', 'owner_response_time_score'
+]
+
+
 @dataclass 
 class PricingRecommendation:
     """Рекомендация по ценообразованию."""
@@ -98,6 +125,10 @@ class PricingRecommendation:
     estimated_bookings_increase: float
     estimated_revenue_change: float
     risk_assessment: str  # 'low', 'medium', 'high'
+    
+    # Уровень движка ценообразования, ответивший на запрос, и его время (см. PricingEngine)
+    tier: Optional[str] = None
+    latency_ms: Optional[float] = None
 
 
 class DynamicPricingModel:
@@ -105,22 +136,21 @@ class DynamicPricingModel:
     
     def __init__(self, db: Session):
         self.db = db
-        self.model_path = os.path.join(settings.MODEL_PATH, 'pricing')
-        os.makedirs(self.model_path, exist_ok=True)
         
-        # ML модели
+        # ML модели (загружаются из реестра в initialize_models)
+        self.model_version = None
         self.demand_model = None
         self.price_model = None
         self.scaler = StandardScaler()
         self.label_encoders = {}
         
-        # Кэш для оптимизации
-        self._cache = {}
-        self._cache_expiry = {}
+        # Предрасчитанные признаки товаров
+        self.feature_store = PricingFeatureStore(db)
         
         # Настройки модели
         self.model_config = {
             'min_training_samples': 100,
+            'n_estimators': 100,  # Деревьев на модель (всего, по всем порциям)
             'max_price_change': 0.5,  # Максимальное изменение цены: ±50%
             'confidence_threshold': 0.7,
             'update_frequency_hours': 24,
@@ -132,39 +162,37 @@ class DynamicPricingModel:
             }
         }
     
+    @property
+    def uses_heuristic(self) -> bool:
+        """Модели еще не опубликованы: рекомендации считаются эвристикой."""
+        return self.demand_model is None or self.price_model is None
+    
     def initialize_models(self) -> bool:
         """
-        Инициализация и загрузка ML моделей.
+        Загрузка ML моделей из реестра.
+        
+        Обучение в запросе не выполняется: если опубликованной версии нет,
+        ставится фоновая задача обучения, а рекомендации до ее завершения
+        считаются эвристикой.
         
         Returns:
-            True если модели успешно инициализированы
+            True если модели загружены
         """
         try:
-            model_files = {
-                'demand_model': 'demand_prediction_model.pkl',
-                'price_model': 'price_optimization_model.pkl',
-                'scaler': 'feature_scaler.pkl',
-                'encoders': 'label_encoders.pkl'
-            }
+            loaded = model_registry.get(PRICING_MODEL_NAME)
             
-            # Проверяем наличие файлов моделей
-            missing_models = []
-            for name, filename in model_files.items():
-                filepath = os.path.join(self.model_path, filename)
-                if not os.path.exists(filepath):
-                    missing_models.append(name)
-            
-            if missing_models:
-                logger.info(f"Missing models: {missing_models}. Training new models...")
-                return self.train_models()
+            if loaded is None:
+                logger.info("No published pricing model, queueing training")
+                model_registry.request_training(PRICING_MODEL_NAME)
+                return False
             
-            # Загружаем существующие модели
-            self.demand_model = joblib.load(os.path.join(self.model_path, model_files['demand_model']))
-            self.price_model = joblib.load(os.path.join(self.model_path, model_files['price_model']))
-            self.scaler = joblib.load(os.path.join(self.model_path, model_files['scaler']))
-            self.label_encoders = joblib.load(os.path.join(self.model_path, model_files['encoders']))
+            # Модели уже в памяти процесса - без чтения с диска
+            self.demand_model = loaded.artifacts['demand_model']
+            self.price_model = loaded.artifacts['price_model']
+            self.scaler = loaded.artifacts['scaler']
+            self.label_encoders = loaded.artifacts.get('label_encoders', {})
+            self.model_version = loaded.version
             
-            logger.info("Dynamic pricing models loaded successfully")
             return True
             
         except Exception as e:
@@ -186,9 +214,8 @@ class DynamicPricingModel:
         Returns:
             Рекомендация по ценообразованию
         """
-        if not self.demand_model or not self.price_model:
-            if not self.initialize_models():
-                raise BadRequestError("Pricing models not available")
+        if self.uses_heuristic:
+            self.initialize_models()
         
         # Получаем товар
         item = self.db.query(Item).filter(Item.id == item_id).first()
@@ -200,13 +227,24 @@ class DynamicPricingModel:
         # Извлекаем признаки
         features = self._extract_item_features(item, target_date)
         
+        # Анализируем конкуренцию
+        competition_analysis = self._analyze_competition(item)
+        
+        return self._score_single(item, features, competition_analysis, target_date)
+    
+    def _score_single(
+        self,
+        item: Item,
+        features: PricingFeatures,
+        competition_analysis: Dict[str, Any],
+        target_date: datetime
+    ) -> PricingRecommendation:
+        """Рассчитать рекомендацию для одного товара по готовым признакам."""
+        
         # Предсказываем спрос и оптимальную цену
         predicted_demand = self._predict_demand(features)
         recommended_price = self._predict_optimal_price(features, predicted_demand)
         
-        # Анализируем конкуренцию
-        competition_analysis = self._analyze_competition(item)
-        
         # Применяем корректировки
         final_price = self._apply_pricing_adjustments(
             item, recommended_price, features, competition_analysis
@@ -229,12 +267,17 @@ class DynamicPricingModel:
         # Оцениваем риски
         risk_assessment = self._assess_pricing_risk(price_change_pct, features)
         
+        confidence = self._calculate_confidence_score(features)
+        if self.uses_heuristic:
+            confidence = min(confidence, HEURISTIC_CONFIDENCE)
+            reasoning.append(HEURISTIC_REASON)
+        
         return PricingRecommendation(
-            item_id=item_id,
+            item_id=item.id,
             current_price=current_price,
             recommended_price=final_price,
             price_change_percentage=price_change_pct,
-            confidence_score=self._calculate_confidence_score(features),
+            confidence_score=confidence,
             reasoning=reasoning,
             expected_demand_change=predicted_demand,
             market_position=market_position,
@@ -258,23 +301,233 @@ class DynamicPricingModel:
         """
         Получить рекомендации для нескольких товаров.
         
+        Признаки всех товаров собираются в одну матрицу: по одному вызову
+        transform/predict на модель, корректировки считаются векторно.
+        
         Args:
             item_ids: Список ID товаров
             target_date: Целевая дата
             
         Returns:
-            Список рекомендаций
+            Список рекомендаций (в порядке item_ids, несуществующие товары пропускаются)
         """
-        recommendations = []
+        if self.uses_heuristic:
+            self.initialize_models()
+        
+        target_date = target_date or datetime.utcnow()
+        
+        order = {item_id: index for index, item_id in enumerate(item_ids)}
+        items = self.db.query(Item).filter(Item.id.in_(item_ids)).all()
+        items.sort(key=lambda item: order[item.id])
+        if not items:
+            return []
+        
+        features = self._extract_bulk_features(items, target_date)
+        competition = self._analyze_bulk_competition(items)
+        
+        return self._score_batch(items, features, competition, target_date)
+    
+    def _extract_bulk_features(self, items: List[Item], target_date: datetime) -> List[PricingFeatures]:
+        """Извлечь признаки для нескольких товаров (два запроса к БД, индекс конкуренции и Redis)."""
+        item_ids = [item.id for item in items]
+        stored = self.feature_store.get_items_features(item_ids)
+        search_counts = get_item_search_impressions(item_ids, days=7)
+        
+        density = self._competition_density(items)
+        
+        return [
+            self._build_features(item, stored[item.id], search_counts[item.id], target_date, density[i])
+            for i, item in enumerate(items)
+        ]
+    
+    def _analyze_bulk_competition(self, items: List[Item]) -> Dict[str, np.ndarray]:
+        """
+        Анализ конкуренции для нескольких товаров по индексу цен категорий (бинарный поиск).
+        
+        Returns:
+            Массивы competitor_count, avg_price и price_adjustment в порядке items
+        """
+        indexes = competition_index.get_many(item.category_id for item in items)
+        
+        current = np.array([float(item.price_per_day) for item in items])
+        competitor_count = np.zeros(len(items))
+        avg_price = current.copy()
+        percentile = np.full(len(items), 0.5)
+        
+        categories = np.array([item.category_id for item in items], dtype=object)
+        # Сам товар не считается своим конкурентом
+        is_member = np.array([
+            item.category_id in indexes and item.id in indexes[item.category_id].members for item in items
+        ], dtype=int)
+        for category_id, index in indexes.items():
+            mask = categories == category_id
+            count = index.count - is_member[mask]
+            has_competitors = count > 0
+            safe_count = np.maximum(count, 1)
+            below = index.count_below(current[mask])
+            
+            competitor_count[mask] = count
+            avg_price[mask] = np.where(
+                has_competitors, (index.total - current[mask] * is_member[mask]) / safe_count, current[mask]
+            )
+            percentile[mask] = np.where(has_competitors, below / safe_count, 0.5)
         
-        for item_id in item_ids:
-            try:
-                recommendation = self.get_pricing_recommendation(item_id, target_date)
-                recommendations.append(recommendation)
-            except Exception as e:
-                logger.error(f"Error getting recommendation for item {item_id}: {e}")
+        adjustment = np.select([percentile >= 0.8, percentile <= 0.2], [-0.05, 0.1], 0.02)
+        adjustment = np.where(competitor_count > 0, adjustment, 0.0)
         
-        return recommendations
+        return {
+            'competitor_count': competitor_count,
+            'avg_price': avg_price,
+            'price_adjustment': adjustment
+        }
+    
+    def _score_batch(
+        self,
+        items: List[Item],
+        features: List[PricingFeatures],
+        competition: Dict[str, np.ndarray],
+        target_date: datetime
+    ) -> List[PricingRecommendation]:
+        """Рассчитать рекомендации для матрицы признаков (векторный аналог _score_single)."""
+        X = np.array([self._features_to_vector(f) for f in features], dtype=float)
+        column = {name: X[:, index] for index, name in enumerate(FEATURE_VECTOR_COLUMNS)}
+        
+        if self.uses_heuristic:
+            demand = self._heuristic_demand(X)
+            base_price = self._heuristic_price(X, demand)
+        else:
+            # Один transform и по одному predict на модель
+            X_scaled = self.scaler.transform(X)
+            demand = np.clip(self.demand_model.predict(X_scaled), 0.0, 1.0)
+            base_price = np.maximum(0.01, self.price_model.predict(X_scaled))
+        
+        current = column['current_price']
+        booking_30d = column['booking_rate_30d']
+        rating = column['average_rating']
+        season = self._get_season(target_date)
+        seasonal_factor = self.model_config['seasonal_factors'].get(season, 1.0)
+        
+        # Корректировки (см. _apply_pricing_adjustments)
+        adjusted = base_price * seasonal_factor
+        adjusted = adjusted + adjusted * competition['price_adjustment']
+        adjusted = adjusted * np.select([booking_30d > 0.8, booking_30d < 0.3], [1.1, 0.95], 1.0)
+        adjusted = adjusted * np.select([rating >= 4.5, rating < 3.0], [1.05, 0.9], 1.0)
+        max_change = self.model_config['max_price_change']
+        final_price = np.round(np.clip(adjusted, current * (1 - max_change), current * (1 + max_change)), 2)
+        
+        price_change_pct = (final_price - current) / current * 100
+        
+        avg_price = competition['avg_price']
+        ratio = np.where(avg_price > 0, final_price / np.where(avg_price > 0, avg_price, 1), 1.0)
+        market_position = np.select([ratio >= 1.2, ratio <= 0.8], ['premium', 'budget'], 'competitive')
+        
+        confidence = np.minimum(0.5 + 0.1 * (
+            (column['total_reviews'] > 5).astype(int) +
+            (column['rental_history_count'] > 3) +
+            (column['views_count'] > 50) +
+            (column['similar_items_count'] > 5) +
+            (column['owner_rating'] > 4.0)
+        ), 1.0)
+        if self.uses_heuristic:
+            confidence = np.minimum(confidence, HEURISTIC_CONFIDENCE)
+        
+        # См. _estimate_booking_increase и _estimate_revenue_change
+        booking_increase = np.where(
+            price_change_pct == 0, 0.0, DEFAULT_PRICE_ELASTICITY * (price_change_pct / 100) * demand
+        )
+        current_revenue = current * DEFAULT_MONTHLY_BOOKINGS
+        revenue_change = (
+            final_price * DEFAULT_MONTHLY_BOOKINGS * (1 + booking_increase) - current_revenue
+        ) / current_revenue * 100
+        
+        abs_change = np.abs(price_change_pct)
+        risk_factors = (
+            np.select([abs_change > 20, abs_change > 10], [2, 1], 0) +
+            (column['competition_density'] > 0.7) +
+            (rating < 3.5) +
+            (booking_30d < 0.3)
+        )
+        risk = np.select([risk_factors >= 3, risk_factors >= 1], ['high', 'medium'], 'low')
+        
+        reasoning = self._generate_batch_reasoning(
+            price_change_pct, seasonal_factor, season,
+            competition['competitor_count'], booking_30d, rating
+        )
+        if self.uses_heuristic:
+            for item_reasoning in reasoning:
+                item_reasoning.append(HEURISTIC_REASON)
+        
+        return [
+            PricingRecommendation(
+                item_id=item.id,
+                current_price=float(current[i]),
+                recommended_price=float(final_price[i]),
+                price_change_percentage=float(price_change_pct[i]),
+                confidence_score=float(confidence[i]),
+                reasoning=reasoning[i],
+                expected_demand_change=float(demand[i]),
+                market_position=str(market_position[i]),
+                seasonal_adjustment=seasonal_factor,
+                competition_adjustment=float(competition['price_adjustment'][i]),
+                demand_adjustment=float(demand[i]),
+                estimated_bookings_increase=float(booking_increase[i]),
+                estimated_revenue_change=float(revenue_change[i]),
+                risk_assessment=str(risk[i])
+            )
+            for i, item in enumerate(items)
+        ]
+    
+    def _generate_batch_reasoning(
+        self,
+        price_change_pct: np.ndarray,
+        seasonal_factor: float,
+        season: str,
+        competitor_count: np.ndarray,
+        booking_30d: np.ndarray,
+        rating: np.ndarray
+    ) -> List[List[str]]:
+        """Объяснения для пакета рекомендаций (условия как в _generate_pricing_reasoning)."""
+        if seasonal_factor > 1.0:
+            season_reason = f"Сезон {season} благоприятен для повышения цен"
+        elif seasonal_factor < 1.0:
+            season_reason = f"Сезон {season} требует более конкурентных цен"
+        else:
+            season_reason = None
+        
+        # Выбираем текст для каждого условия масками, строки собираем в конце
+        competition_reason = np.select(
+            [competitor_count > 10, competitor_count < 3],
+            ["Высокая конкуренция в категории", "Низкая конкуренция дает преимущество в ценообразовании"],
+            ""
+        )
+        demand_reason = np.select(
+            [booking_30d > 0.7, booking_30d < 0.3],
+            ["Высокий спрос позволяет увеличить цену", "Низкий спрос требует более привлекательных цен"],
+            ""
+        )
+        rating_reason = np.select(
+            [rating >= 4.5, rating < 3.5],
+            ["Высокий рейтинг оправдывает премиальную цену", "Рейтинг ниже среднего ограничивает ценовые возможности"],
+            ""
+        )
+        
+        reasoning = []
+        for i, change in enumerate(price_change_pct):
+            if abs(change) < 2:
+                item_reasoning = ["Текущая цена близка к оптимальной"]
+            elif change > 0:
+                item_reasoning = [f"Рекомендуется повышение цены на {change:.1f}%"]
+            else:
+                item_reasoning = [f"Рекомендуется снижение цены на {abs(change):.1f}%"]
+            
+            if season_reason:
+                item_reasoning.append(season_reason)
+            item_reasoning.extend(
+                reason for reason in (competition_reason[i], demand_reason[i], rating_reason[i]) if reason
+            )
+            reasoning.append(item_reasoning)
+        
+        return reasoning
     
     def get_category_pricing_insights(
         self, 
@@ -294,17 +547,7 @@ class DynamicPricingModel:
         start_date = datetime.utcnow() - timedelta(days=period_days)
         
         # Базовая статистика по категории
-        category_stats = self.db.query(
-            func.count(Item.id).label('total_items'),
-            func.avg(Item.price_per_day).label('avg_price'),
-            func.min(Item.price_per_day).label('min_price'),
-            func.max(Item.price_per_day).label('max_price'),
-            func.percentile_cont(0.5).within_group(Item.price_per_day).label('median_price')
-        ).filter(
-            Item.category_id == category_id,
-            Item.status == ItemStatus.ACTIVE,
-            Item.is_approved == True
-        ).first()
+        distribution = CategoryPriceStats().get(category_id)
         
         # Анализ спроса
         demand_stats = self.db.query(
@@ -334,11 +577,11 @@ class DynamicPricingModel:
             'category_id': category_id,
             'period_days': period_days,
             'basic_stats': {
-                'total_items': category_stats.total_items or 0,
-                'average_price': float(category_stats.avg_price or 0),
-                'min_price': float(category_stats.min_price or 0),
-                'max_price': float(category_stats.max_price or 0),
-                'median_price': float(category_stats.median_price or 0)
+                'total_items': distribution.count if distribution else 0,
+                'average_price': distribution.mean if distribution else 0.0,
+                'min_price': distribution.min_price if distribution else 0.0,
+                'max_price': distribution.max_price if distribution else 0.0,
+                'median_price': distribution.median if distribution else 0.0
             },
             'demand_stats': {
                 'total_bookings': demand_stats.total_bookings or 0,
@@ -357,60 +600,115 @@ class DynamicPricingModel:
             'pricing_insights': price_recommendations
         }
     
-    def train_models(self) -> bool:
+    def train_models(self, progress: Optional[Callable[[str, int], None]] = None) -> bool:
         """
         Обучить модели ценообразования на исторических данных.
         
+        Выполняется в фоновой задаче train_ml_model, не в запросе. Выборка
+        читается порциями в три прохода (масштабирование, обучение, оценка),
+        поэтому память не зависит от объема истории.
+        
+        Args:
+            progress: Callback (этап, процент выполнения)
+        
         Returns:
             True если обучение прошло успешно
         """
+        report = progress or (lambda stage, percent: None)
+        
+        # Тяжелая выборка идет в реплику, если она доступна
+        read_db = get_read_session("pricing:training_data")
         try:
             logger.info("Starting dynamic pricing model training...")
+            started_at = datetime.utcnow()
+            query = self._training_data_query()
             
-            # Получаем обучающие данные
-            training_data = self._prepare_training_data()
+            def training_chunks():
+                """Порции выборки: признаки, спрос, цена и маска отложенных строк."""
+                for data in iter_frames(read_db, query):
+                    X, y_demand, y_price = self._prepare_features_and_targets(data)
+                    yield X, y_demand, y_price, holdout_mask(data['contract_id'])
             
-            if len(training_data) < self.model_config['min_training_samples']:
-                logger.warning(f"Insufficient training data: {len(training_data)} samples")
-                return False
+            # Проход 1: размер выборки и параметры масштабирования
+            # (новый scaler: загруженный из реестра общий для процесса)
+            report("scanning_data", 5)
+            self.scaler = StandardScaler()
+            samples = 0
+            train_chunks = 0
+            for X, _, _, holdout in training_chunks():
+                samples += len(X)
+                if (~holdout).sum() >= 2:
+                    self.scaler.partial_fit(X[~holdout])
+                    train_chunks += 1
             
-            # Подготавливаем признаки
-            X, y_demand, y_price = self._prepare_features_and_targets(training_data)
-            
-            # Разделяем на обучающую и тестовую выборки
-            X_train, X_test, y_demand_train, y_demand_test, y_price_train, y_price_test = train_test_split(
-                X, y_demand, y_price, test_size=0.2, random_state=42
-            )
-            
-            # Масштабируем признаки
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            if samples < self.model_config['min_training_samples'] or train_chunks == 0:
+                logger.warning(f"Insufficient training data: {samples} samples")
+                return False
             
-            # Обучаем модель предсказания спроса
+            # Проход 2: каждая порция добавляет деревья (warm_start) так, чтобы
+            # после всех порций их было ровно n_estimators. Если порций больше,
+            # чем деревьев, часть порций не добавляет деревьев и пропускается
+            report("training", 25)
+            total_trees = self.model_config['n_estimators']
             self.demand_model = GradientBoostingRegressor(
-                n_estimators=100,
+                n_estimators=0,
                 learning_rate=0.1,
                 max_depth=6,
-                random_state=42
+                random_state=42,
+                warm_start=True
             )
-            self.demand_model.fit(X_train_scaled, y_demand_train)
-            
-            # Обучаем модель оптимизации цены
             self.price_model = RandomForestRegressor(
-                n_estimators=100,
+                n_estimators=0,
                 max_depth=10,
-                random_state=42
+                random_state=42,
+                warm_start=True
             )
-            self.price_model.fit(X_train_scaled, y_price_train)
+            fitted_chunks = 0
+            for X, y_demand, y_price, holdout in training_chunks():
+                train = ~holdout
+                if train.sum() < 2:
+                    continue
+                
+                fitted_chunks += 1
+                target_trees = min(total_trees, math.ceil(total_trees * fitted_chunks / train_chunks))
+                if target_trees > self.price_model.n_estimators:
+                    X_train_scaled = self.scaler.transform(X[train])
+                    self.demand_model.n_estimators = target_trees
+                    self.demand_model.fit(X_train_scaled, y_demand[train])
+                    self.price_model.n_estimators = target_trees
+                    self.price_model.fit(X_train_scaled, y_price[train])
+                
+                report("training", min(85, 25 + 60 * fitted_chunks // train_chunks))
             
-            # Оцениваем качество моделей
-            demand_score = self.demand_model.score(X_test_scaled, y_demand_test)
-            price_score = self.price_model.score(X_test_scaled, y_price_test)
+            # Проход 3: оценка качества на отложенных строках
+            report("evaluating", 85)
+            demand_metrics = StreamingRegressionMetrics()
+            price_metrics = StreamingRegressionMetrics()
+            for X, y_demand, y_price, holdout in training_chunks():
+                if not holdout.any():
+                    continue
+                X_test_scaled = self.scaler.transform(X[holdout])
+                demand_metrics.update(y_demand[holdout], self.demand_model.predict(X_test_scaled))
+                price_metrics.update(y_price[holdout], self.price_model.predict(X_test_scaled))
             
-            logger.info(f"Model performance - Demand: {demand_score:.3f}, Price: {price_score:.3f}")
+            demand_result = demand_metrics.result()
+            price_result = price_metrics.result()
+            logger.info(
+                f"Model performance - Demand: {demand_result['r2']:.3f}, Price: {price_result['r2']:.3f}"
+            )
             
-            # Сохраняем модели
-            self._save_models()
+            # Публикуем новую версию в реестре моделей
+            report("publishing", 95)
+            self._save_models(
+                metrics={
+                    'mse': float(price_result['mse']),
+                    'mae': float(price_result['mae']),
+                    'demand_r2': float(demand_result['r2']),
+                    'price_r2': float(price_result['r2'])
+                },
+                training_samples=samples,
+                training_duration_seconds=int((datetime.utcnow() - started_at).total_seconds())
+            )
             
             logger.info("Dynamic pricing models trained successfully")
             return True
@@ -418,10 +716,35 @@ class DynamicPricingModel:
         except Exception as e:
             logger.error(f"Error training pricing models: {e}")
             return False
+        finally:
+            read_db.close()
     
     def _extract_item_features(self, item: Item, target_date: datetime) -> PricingFeatures:
         """Извлечь признаки для товара."""
         
+        # Рыночные, спросовые и владельческие признаки - одна строка из feature store
+        stored = self.feature_store.get_item_features(item.id)
+        
+        # Показы товара в поисковой выдаче за 7 дней
+        search_count = get_item_search_impressions([item.id], days=7)[item.id]
+        
+        return self._build_features(item, stored, search_count, target_date, self._competition_density([item])[0])
+    
+    def _competition_density(self, items: List[Item]) -> np.ndarray:
+        """Актуальная плотность конкуренции по индексу цен (вместо значения из feature store)."""
+        competitors = competition_index.competitors_within(items)
+        return np.minimum(competitors / COMPETITION_DENSITY_SCALE, 1.0)
+    
+    def _build_features(
+        self,
+        item: Item,
+        stored: Dict[str, Any],
+        search_count: int,
+        target_date: datetime,
+        competition_density: Optional[float] = None
+    ) -> PricingFeatures:
+        """Собрать признаки товара из строки feature store."""
+        
         # Базовые характеристики
         item_age_days = (datetime.utcnow() - item.created_at).days
         condition_scores = {
@@ -429,24 +752,9 @@ class DynamicPricingModel:
         }
         condition_score = condition_scores.get(str(item.condition).lower(), 0.7)
         
-        # Популярность бренда
-        brand_popularity = self._calculate_brand_popularity(item.brand) if item.brand else 0.5
-        
-        # Категорийная статистика
-        category_stats = self._get_category_stats(item.category_id)
-        
-        # Конкуренция
-        competition_density = self._calculate_competition_density(item)
-        
         # Временные факторы
         season = self._get_season(target_date)
         
-        # Спрос
-        demand_metrics = self._calculate_demand_metrics(item.id)
-        
-        # Владелец
-        owner_metrics = self._calculate_owner_metrics(item.owner_id)
-        
         return PricingFeatures(
             item_id=item.id,
             category_id=item.category_id,
@@ -455,7 +763,7 @@ class DynamicPricingModel:
             item_condition_score=condition_score,
             has_images=bool(item.images),
             description_length=len(item.description or ''),
-            brand_popularity_score=brand_popularity,
+            brand_popularity_score=stored['brand_popularity_score'],
             views_count=item.views_count or 0,
             favorites_count=item.favorites_count or 0,
             total_reviews=item.total_reviews or 0,
@@ -466,27 +774,30 @@ class DynamicPricingModel:
             day_of_week=target_date.weekday(),
             is_holiday=self._is_holiday(target_date),
             is_weekend=target_date.weekday() >= 5,
-            category_avg_price=category_stats['avg_price'],
-            category_median_price=category_stats['median_price'],
-            similar_items_count=category_stats['total_items'],
-            competition_density=competition_density,
-            location_demand_score=self._calculate_location_demand(item.location),
-            recent_search_count=demand_metrics['search_count'],
-            booking_rate_7d=demand_metrics['booking_rate_7d'],
-            booking_rate_30d=demand_metrics['booking_rate_30d'],
-            cancellation_rate=demand_metrics['cancellation_rate'],
-            owner_rating=owner_metrics['rating'],
-            owner_total_items=owner_metrics['total_items'],
-            owner_completion_rate=owner_metrics['completion_rate'],
-            owner_response_time_score=owner_metrics['response_score']
+            category_avg_price=stored['category_avg_price'],
+            category_median_price=stored['category_median_price'],
+            similar_items_count=stored['similar_items_count'],
+            competition_density=(
+                stored['competition_density'] if competition_density is None else float(competition_density)
+            ),
+            location_demand_score=stored['location_demand_score'],
+            recent_search_count=search_count,
+            booking_rate_7d=stored['booking_rate_7d'],
+            booking_rate_30d=stored['booking_rate_30d'],
+            cancellation_rate=stored['cancellation_rate'],
+            owner_rating=stored['owner_rating'],
+            owner_total_items=stored['owner_total_items'],
+            owner_completion_rate=stored['owner_completion_rate'],
+            owner_response_time_score=stored['owner_response_time_score']
         )
     
     def _predict_demand(self, features: PricingFeatures) -> float:
         """Предсказать спрос на товар."""
+        feature_vector = self._features_to_vector(features)
+        
         if not self.demand_model:
-            return 0.5  # Базовое значение
+            return float(self._heuristic_demand(np.array([feature_vector], dtype=float))[0])
         
-        feature_vector = self._features_to_vector(features)
         feature_vector_scaled = self.scaler.transform([feature_vector])
         
         demand_prediction = self.demand_model.predict(feature_vector_scaled)[0]
@@ -494,28 +805,46 @@ class DynamicPricingModel:
     
     def _predict_optimal_price(self, features: PricingFeatures, predicted_demand: float) -> float:
         """Предсказать оптимальную цену."""
-        if not self.price_model:
-            return features.current_price
-        
+        # Модель цены обучается на тех же признаках, что и модель спроса
         feature_vector = self._features_to_vector(features)
-        feature_vector.append(predicted_demand)  # Добавляем предсказанный спрос
+        
+        if not self.price_model:
+            return float(self._heuristic_price(
+                np.array([feature_vector], dtype=float), np.array([predicted_demand])
+            )[0])
         
         feature_vector_scaled = self.scaler.transform([feature_vector])
         price_prediction = self.price_model.predict(feature_vector_scaled)[0]
         
         return max(0.01, price_prediction)  # Минимальная цена
     
+    def _heuristic_demand(self, X: np.ndarray) -> np.ndarray:
+        """Оценка спроса без модели: загрузка за 30 и 7 дней и поисковый интерес."""
+        column = {name: X[:, index] for index, name in enumerate(FEATURE_VECTOR_COLUMNS)}
+        return np.clip(
+            0.6 * column['booking_rate_30d'] +
+            0.3 * column['booking_rate_7d'] +
+            0.1 * np.minimum(column['recent_search_count'] / 50.0, 1.0),
+            0.0, 1.0
+        )
+    
+    def _heuristic_price(self, X: np.ndarray, demand: np.ndarray) -> np.ndarray:
+        """Оценка цены без модели: середина между текущей и медианой категории с поправкой на спрос."""
+        column = {name: X[:, index] for index, name in enumerate(FEATURE_VECTOR_COLUMNS)}
+        current = column['current_price']
+        median = column['category_median_price']
+        anchor = np.where(median > 0, (current + median) / 2, current)
+        return np.maximum(0.01, anchor * (0.9 + 0.2 * demand))
+    
     def _analyze_competition(self, item: Item) -> Dict[str, Any]:
-        """Анализ конкуренции для товара."""
-        # Получаем похожие товары
-        similar_items = self.db.query(Item).filter(
-            Item.category_id == item.category_id,
-            Item.id != item.id,
-            Item.status == ItemStatus.ACTIVE,
-            Item.is_approved == True
-        ).all()
-        
-        if not similar_items:
+        """Анализ конкуренции для товара по индексу цен категории."""
+        index = competition_index.get(item.category_id)
+        
+        # Сам товар не считается своим конкурентом
+        is_member = int(index is not None and item.id in index.members)
+        competitor_count = index.count - is_member if index else 0
+        
+        if competitor_count <= 0:
             return {
                 'competitor_count': 0,
                 'avg_price': float(item.price_per_day),
@@ -523,12 +852,10 @@ class DynamicPricingModel:
                 'price_adjustment': 0
             }
         
-        prices = [float(i.price_per_day) for i in similar_items]
-        avg_price = np.mean(prices)
-        median_price = np.median(prices)
-        
         current_price = float(item.price_per_day)
-        price_percentile = len([p for p in prices if p < current_price]) / len(prices)
+        avg_price = (index.total - current_price * is_member) / competitor_count
+        median_price = index.median_excluding(current_price, bool(is_member))
+        price_percentile = int(index.count_below(np.array([current_price]))[0]) / competitor_count
         
         # Определяем позицию
         if price_percentile >= 0.8:
@@ -542,7 +869,7 @@ class DynamicPricingModel:
             adjustment = 0.02  # Небольшое увеличение
         
         return {
-            'competitor_count': len(similar_items),
+            'competitor_count': competitor_count,
             'avg_price': avg_price,
             'median_price': median_price,
             'price_position': position,
@@ -634,10 +961,10 @@ class DynamicPricingModel:
         
         return reasoning
     
-    def _prepare_training_data(self) -> pd.DataFrame:
-        """Подготовить данные для обучения."""
+    def _training_data_query(self):
+        """Запрос обучающей выборки (читается порциями через iter_frames)."""
         
-        # Получаем исторические данные о контрактах
+        # Исторические данные о контрактах
         contracts_query = """
         SELECT 
             c.id as contract_id,
@@ -667,17 +994,23 @@ class DynamicPricingModel:
         AND c.status IN ('completed', 'active')
         """
         
-        result = self.db.execute(text(contracts_query))
-        data = result.fetchall()
-        
-        return pd.DataFrame(data, columns=result.keys())
+        return text(contracts_query)
     
-    def _save_models(self):
-        """Сохранить обученные модели."""
-        joblib.dump(self.demand_model, os.path.join(self.model_path, 'demand_prediction_model.pkl'))
-        joblib.dump(self.price_model, os.path.join(self.model_path, 'price_optimization_model.pkl'))
-        joblib.dump(self.scaler, os.path.join(self.model_path, 'feature_scaler.pkl'))
-        joblib.dump(self.label_encoders, os.path.join(self.model_path, 'label_encoders.pkl'))
+    def _save_models(self, metrics: Dict[str, float], training_samples: int, training_duration_seconds: int):
+        """Опубликовать обученные модели новой версией в реестре."""
+        self.model_version = model_registry.publish(
+            PRICING_MODEL_NAME,
+            {
+                'demand_model': self.demand_model,
+                'price_model': self.price_model,
+                'scaler': self.scaler,
+                'label_encoders': self.label_encoders
+            },
+            metrics=metrics,
+            training_samples=training_samples,
+            training_duration_seconds=training_duration_seconds,
+            feature_count=len(FEATURE_VECTOR_COLUMNS)
+        )
     
     # Вспомогательные методы
     def _get_season(self, date: datetime) -> str:
@@ -697,155 +1030,6 @@ class DynamicPricingModel:
         # Упрощенная проверка - можно расширить
         return date.month == 12 and date.day in [25, 31] or date.month == 1 and date.day == 1
     
-    def _get_category_stats(self, category_id: uuid.UUID) -> Dict[str, float]:
-        """Получить статистику по категории."""
-        cache_key = f"category_stats_{category_id}"
-        
-        if cache_key in self._cache and self._cache_expiry.get(cache_key, 0) > datetime.utcnow().timestamp():
-            return self._cache[cache_key]
-        
-        stats = self.db.query(
-            func.count(Item.id).label('total_items'),
-            func.avg(Item.price_per_day).label('avg_price'),
-            func.percentile_cont(0.5).within_group(Item.price_per_day).label('median_price')
-        ).filter(
-            Item.category_id == category_id,
-            Item.status == ItemStatus.ACTIVE
-        ).first()
-        
-        result = {
-            'total_items': stats.total_items or 0,
-            'avg_price': float(stats.avg_price or 0),
-            'median_price': float(stats.median_price or 0)
-        }
-        
-        # Кешируем на 1 час
-        self._cache[cache_key] = result
-        self._cache_expiry[cache_key] = datetime.utcnow().timestamp() + 3600
-        
-        return result
-    
-    def _calculate_brand_popularity(self, brand: str) -> float:
-        """Рассчитать популярность бренда."""
-        if not brand:
-            return 0.5
-        
-        brand_items = self.db.query(func.count(Item.id)).filter(
-            Item.brand.ilike(f"%{brand}%"),
-            Item.status == ItemStatus.ACTIVE
-        ).scalar() or 0
-        
-        total_items = self.db.query(func.count(Item.id)).filter(
-            Item.status == ItemStatus.ACTIVE
-        ).scalar() or 1
-        
-        popularity = min(brand_items / total_items * 10, 1.0)  # Нормализуем от 0 до 1
-        return popularity
-    
-    def _calculate_competition_density(self, item: Item) -> float:
-        """Рассчитать плотность конкуренции."""
-        # Конкуренты в той же категории и ценовом диапазоне
-        price_range = float(item.price_per_day) * 0.3  # ±30% от цены
-        min_price = float(item.price_per_day) - price_range
-        max_price = float(item.price_per_day) + price_range
-        
-        competitors = self.db.query(func.count(Item.id)).filter(
-            Item.category_id == item.category_id,
-            Item.id != item.id,
-            Item.price_per_day.between(min_price, max_price),
-            Item.status == ItemStatus.ACTIVE,
-            Item.is_approved == True
-        ).scalar() or 0
-        
-        # Нормализуем плотность (0-1, где 1 = очень высокая конкуренция)
-        return min(competitors / 20.0, 1.0)
-    
-    def _calculate_location_demand(self, location: Optional[str]) -> float:
-        """Рассчитать спрос по локации."""
-        if not location:
-            return 0.5
-        
-        # Подсчитываем активность в данной локации
-        location_activity = self.db.query(func.count(Contract.id)).join(Item).filter(
-            Item.location.ilike(f"%{location}%"),
-            Contract.status.in_([ContractStatus.COMPLETED, ContractStatus.ACTIVE]),
-            Contract.created_at >= datetime.utcnow() - timedelta(days=90)
-        ).scalar() or 0
-        
-        # Нормализуем (предполагаем, что 50+ сделок = высокий спрос)
-        return min(location_activity / 50.0, 1.0)
-    
-    def _calculate_demand_metrics(self, item_id: uuid.UUID) -> Dict[str, float]:
-        """Рассчитать метрики спроса для товара."""
-        
-        # Букинги за последние 7 и 30 дней
-        bookings_7d = self.db.query(func.count(Contract.id)).filter(
-            Contract.item_id == item_id,
-            Contract.created_at >= datetime.utcnow() - timedelta(days=7),
-            Contract.status != ContractStatus.CANCELLED
-        ).scalar() or 0
-        
-        bookings_30d = self.db.query(func.count(Contract.id)).filter(
-            Contract.item_id == item_id,
-            Contract.created_at >= datetime.utcnow() - timedelta(days=30),
-            Contract.status != ContractStatus.CANCELLED
-        ).scalar() or 0
-        
-        # Отмены
-        cancellations = self.db.query(func.count(Contract.id)).filter(
-            Contract.item_id == item_id,
-            Contract.status == ContractStatus.CANCELLED,
-            Contract.created_at >= datetime.utcnow() - timedelta(days=90)
-        ).scalar() or 0
-        
-        total_contracts = self.db.query(func.count(Contract.id)).filter(
-            Contract.item_id == item_id,
-            Contract.created_at >= datetime.utcnow() - timedelta(days=90)
-        ).scalar() or 1
-        
-        return {
-            'search_count': 0,  # TODO: Implement search tracking
-            'booking_rate_7d': min(bookings_7d / 7.0, 1.0),
-            'booking_rate_30d': min(bookings_30d / 30.0, 1.0),
-            'cancellation_rate': cancellations / total_contracts
-        }
-    
-    def _calculate_owner_metrics(self, owner_id: uuid.UUID) -> Dict[str, float]:
-        """Рассчитать метрики владельца."""
-        owner = self.db.query(User).filter(User.id == owner_id).first()
-        
-        if not owner:
-            return {
-                'rating': 0.0,
-                'total_items': 0,
-                'completion_rate': 0.0,
-                'response_score': 0.5
-            }
-        
-        total_items = self.db.query(func.count(Item.id)).filter(
-            Item.owner_id == owner_id,
-            Item.status != ItemStatus.ARCHIVED
-        ).scalar() or 0
-        
-        # Коэффициент завершения сделок
-        total_contracts = self.db.query(func.count(Contract.id)).filter(
-            Contract.owner_id == owner_id
-        ).scalar() or 1
-        
-        completed_contracts = self.db.query(func.count(Contract.id)).filter(
-            Contract.owner_id == owner_id,
-            Contract.status == ContractStatus.COMPLETED
-        ).scalar() or 0
-        
-        completion_rate = completed_contracts / total_contracts
-        
-        return {
-            'rating': float(owner.rating or 0),
-            'total_items': total_items,
-            'completion_rate': completion_rate,
-            'response_score': 0.8  # TODO: Implement response time tracking
-        }
-    
     def _features_to_vector(self, features: PricingFeatures) -> List[float]:
         """Преобразовать признаки в вектор для ML модели."""
         return [
@@ -880,60 +1064,71 @@ class DynamicPricingModel:
         ]
     
     def _prepare_features_and_targets(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-        """Подготовить признаки и целевые переменные."""
-        features = []
-        demand_targets = []
-        price_targets = []
-        
-        for _, row in data.iterrows():
-            # Создаем объект PricingFeatures для каждой записи
-            item_features = PricingFeatures(
-                item_id=row['item_id'],
-                category_id=row['category_id'],
-                current_price=float(row['price_per_day']),
-                item_age_days=(row['created_at'] - row['item_created_at']).days,
-                item_condition_score=0.7,  # Упрощенно
-                has_images=True,  # Упрощенно
-                description_length=100,  # Упрощенно
-                brand_popularity_score=0.5,  # Упрощенно
-                views_count=row['views_count'] or 0,
-                favorites_count=row['favorites_count'] or 0,
-                total_reviews=row['total_reviews'] or 0,
-                average_rating=float(row['rating'] or 0),
-                rental_history_count=row['rentals_count'] or 0,
-                season=self._get_season(row['created_at']),
-                month=row['created_at'].month,
-                day_of_week=row['created_at'].weekday(),
-                is_holiday=self._is_holiday(row['created_at']),
-                is_weekend=row['created_at'].weekday() >= 5,
-                category_avg_price=float(row['price_per_day']),  # Упрощенно
-                category_median_price=float(row['price_per_day']),  # Упрощенно
-                similar_items_count=10,  # Упрощенно
-                competition_density=0.5,  # Упрощенно
-                location_demand_score=0.5,  # Упрощенно
-                recent_search_count=0,
-                booking_rate_7d=0.1,  # Упрощенно
-                booking_rate_30d=0.3,  # Упрощенно
-                cancellation_rate=0.1,  # Упрощенно
-                owner_rating=float(row['owner_rating'] or 0),
-                owner_total_items=1,  # Упрощенно
-                owner_completion_rate=0.8,  # Упрощенно
-                owner_response_time_score=0.7  # Упрощенно
-            )
-            
-            feature_vector = self._features_to_vector(item_features)
-            features.append(feature_vector)
-            
-            # Целевые переменные
-            # Спрос (0-1, основанный на том, был ли товар арендован)
-            demand = 1.0 if row['status'] == 'completed' else 0.5
-            demand_targets.append(demand)
-            
-            # Оптимальная цена (используем общую цену сделки как ориентир)
-            optimal_price = float(row['total_price']) / max((row['end_date'] - row['start_date']).days, 1)
-            price_targets.append(optimal_price)
+        """
+        Подготовить признаки и целевые переменные.
+        
+        Матрица строится по столбцам DataFrame целиком, без PricingFeatures
+        на каждую строку; порядок столбцов - FEATURE_VECTOR_COLUMNS, тип - float32.
+        """
+        def numeric(column: str) -> pd.Series:
+            # NULL и Decimal из выборки -> float (astype быстрее to_numeric для Decimal)
+            return data[column].astype(float).fillna(0)
+        
+        def dates(column: str) -> pd.Series:
+            return pd.to_datetime(data[column], cache=False)
+        
+        created_at = dates('created_at')
+        item_created_at = dates('item_created_at')
+        month = created_at.dt.month
+        day = created_at.dt.day
+        day_of_week = created_at.dt.weekday
+        price = numeric('price_per_day')
+        
+        columns = {
+            'current_price': price,
+            'item_age_days': (created_at - item_created_at).dt.days,
+            'item_condition_score': 0.7,  # Упрощенно
+            'has_images': 1.0,  # Упрощенно
+            'description_length': 100,  # Упрощенно
+            'brand_popularity_score': 0.5,  # Упрощенно
+            'views_count': numeric('views_count'),
+            'favorites_count': numeric('favorites_count'),
+            'total_reviews': numeric('total_reviews'),
+            'average_rating': numeric('rating'),
+            'rental_history_count': numeric('rentals_count'),
+            'month': month,
+            'day_of_week': day_of_week,
+            'is_holiday': ((month == 12) & day.isin([25, 31])) | ((month == 1) & (day == 1)),
+            'is_weekend': day_of_week >= 5,
+            'category_avg_price': price,  # Упрощенно
+            'category_median_price': price,  # Упрощенно
+            'similar_items_count': 10,  # Упрощенно
+            'competition_density': 0.5,  # Упрощенно
+            'location_demand_score': 0.5,  # Упрощенно
+            'recent_search_count': 0,
+            'booking_rate_7d': 0.1,  # Упрощенно
+            'booking_rate_30d': 0.3,  # Упрощенно
+            'cancellation_rate': 0.1,  # Упрощенно
+            'owner_rating': numeric('owner_rating'),
+            'owner_total_items': 1,  # Упрощенно
+            'owner_completion_rate': 0.8,  # Упрощенно
+            'owner_response_time_score': 0.7  # Упрощенно
+        }
+        
+        features = np.empty((len(data), len(FEATURE_VECTOR_COLUMNS)), dtype=np.float32)
+        for index, name in enumerate(FEATURE_VECTOR_COLUMNS):
+            value = columns[name]
+            features[:, index] = value.to_numpy(dtype=np.float32) if isinstance(value, pd.Series) else value
+        
+        # Целевые переменные
+        # Спрос (0-1, основанный на том, был ли товар арендован)
+        demand_targets = np.where(data['status'] == 'completed', 1.0, 0.5).astype(np.float32)
+        
+        # Оптимальная цена (используем общую цену сделки как ориентир)
+        rental_days = (dates('end_date') - dates('start_date')).dt.days.clip(lower=1)
+        price_targets = (numeric('total_price') / rental_days).to_numpy(dtype=np.float32)
         
-        return np.array(features), np.array(demand_targets), np.array(price_targets)
+        return features, demand_targets, price_targets
     
     def _determine_market_position(self, price: float, avg_market_price: float) -> str:
         """Определить рыночную позицию товара."""
@@ -972,7 +1167,7 @@ class DynamicPricingModel:
     def _estimate_booking_increase(self, price_change_pct: float, demand: float) -> float:
         """Оценить увеличение букингов."""
         # Эластичность спроса по цене (упрощенная модель)
-        price_elasticity = -1.5  # Эластичный спрос
+        price_elasticity = DEFAULT_PRICE_ELASTICITY  # Эластичный спрос
         
         if price_change_pct == 0:
             return 0.0
@@ -991,7 +1186,7 @@ class DynamicPricingModel:
         booking_change = self._estimate_booking_increase(price_change_pct, demand)
         
         # Новая выручка = новая цена * (текущие букинги * (1 + изменение букингов))
-        current_bookings = 10  # Предполагаемое количество букингов в месяц
+        current_bookings = DEFAULT_MONTHLY_BOOKINGS
         new_bookings = current_bookings * (1 + booking_change)
         
         current_revenue = current_price * current_bookings
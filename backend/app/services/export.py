@@ -0,0 +1,196 @@
+"""
+Streaming data export helpers.
+
+Rows are consumed from an iterator (typically a ``yield_per`` query backed by a
+server-side cursor) and written out in small chunks, so memory stays flat
+regardless of table size. CSV and JSON can be streamed straight to the client;
+Parquet is written to disk in row groups because the format needs a footer.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from datetime import datetime, date
+from decimal import Decimal
+from io import StringIO
+import csv
+import json
+import os
+import uuid
+
+from app.core.config import settings
+from app.utils.exceptions import BadRequestError
+
+# (key, header, type) where type is one of: string, bool, float, timestamp
+ExportColumn = Tuple[str, str, str]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+STREAMABLE_FORMATS = ("csv", "json")
+
+
+def validate_export_format(format: str) -> None:
+    """Raise BadRequestError for unknown export formats."""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise BadRequestError("Unsupported export format")
+
+
+def _json_value(value: Any) -> Any:
+    """Convert value to a JSON-compatible value."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    """Convert value to a CSV cell."""
+    if value is None:
+        return ''
+    return _json_value(value)
+
+
+def iter_csv(columns: List[ExportColumn], rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Yield CSV text in chunks of EXPORT_BATCH_SIZE rows.
+
+    Args:
+        columns: Export columns
+        rows: Row dicts keyed by column key
+
+    Yields:
+        CSV chunks
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header, _ in columns])
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(row.get(key)) for key, _, _ in columns])
+        if count % settings.EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def iter_json(
+    rows: Iterable[Dict[str, Any]],
+    prefix: str = "",
+    suffix: str = ""
+) -> Iterator[str]:
+    """
+    Yield a JSON array of rows incrementally.
+
+    Args:
+        rows: Row dicts
+        prefix: Text before the array (e.g. '{"contracts": ')
+        suffix: Text after the array (e.g. '}')
+
+    Yields:
+        JSON chunks
+    """
+    chunk = [prefix, "["]
+    for count, row in enumerate(rows):
+        if count:
+            chunk.append(",")
+        chunk.append(json.dumps({key: _json_value(value) for key, value in row.items()}))
+        if (count + 1) % settings.EXPORT_BATCH_SIZE == 0:
+            yield "".join(chunk)
+            chunk = []
+
+    chunk.extend(["]", suffix])
+    yield "".join(chunk)
+
+
+def write_parquet(file_path: str, columns: List[ExportColumn], rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Write rows to a Parquet file, one row group per EXPORT_BATCH_SIZE rows.
+
+    Args:
+        file_path: Target path
+        columns: Export columns
+        rows: Row dicts keyed by column key
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise BadRequestError("Parquet export requires pyarrow to be installed")
+
+    arrow_types = {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "float": pa.float64(),
+        "timestamp": pa.timestamp("us", tz="UTC")
+    }
+    schema = pa.schema([(key, arrow_types[type_name]) for key, _, type_name in columns])
+    converters = {
+        key: (str if type_name == "string" else float if type_name == "float" else None)
+        for key, _, type_name in columns
+    }
+
+    def flush(batch: Dict[str, list]) -> None:
+        writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+
+    with pq.ParquetWriter(file_path, schema) as writer:
+        batch: Dict[str, list] = {key: [] for key, _, _ in columns}
+        size = 0
+        for row in rows:
+            for key, _, _ in columns:
+                value = row.get(key)
+                convert = converters[key]
+                batch[key].append(convert(value) if value is not None and convert else value)
+            size += 1
+            if size == settings.EXPORT_BATCH_SIZE:
+                flush(batch)
+                batch = {key: [] for key, _, _ in columns}
+                size = 0
+
+        if size:
+            flush(batch)
+
+
+def write_export(
+    filename: str,
+    format: str,
+    columns: List[ExportColumn],
+    rows: Iterable[Dict[str, Any]],
+    json_prefix: str = "",
+    json_suffix: str = ""
+) -> str:
+    """
+    Write export to the exports directory without buffering it in memory.
+
+    Args:
+        filename: File name without extension
+        format: csv, json or parquet
+        columns: Export columns
+        rows: Row dicts
+        json_prefix: Text before the JSON array
+        json_suffix: Text after the JSON array
+
+    Returns:
+        File URL
+    """
+    validate_export_format(format)
+
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    filename = f"{filename}.{format}"
+    file_path = os.path.join(settings.EXPORT_DIR, filename)
+
+    if format == "parquet":
+        write_parquet(file_path, columns, rows)
+    else:
+        chunks = iter_csv(columns, rows) if format == "csv" else iter_json(rows, json_prefix, json_suffix)
+        with open(file_path, 'w', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    return f"/exports/{filename}"
@@ -25,6 +25,8 @@ from app.models.user import User, UserStatus
 from app.models.contract import Contract, ContractStatus
 from app.schemas.common import PaginatedResponse, PaginationMeta
 from app.core.config import settings
+from app.services.search_tracking import record_search
+from app.services.category_price_stats import mark_category_prices_changed
 from app.utils.exceptions import NotFoundError, ForbiddenError, BadRequestError
 
 logger = logging.getLogger(__name__)
@@ -106,6 +108,10 @@ class ItemService:
         offset = (search_params.page - 1) * search_params.size
         items = query.offset(offset).limit(search_params.size).all()
 
+        # Учет поисковых запросов и показов товаров в выдаче
+        if search_params.query:
+            record_search(search_params.query, [item.id for item in items])
+
         # Преобразуем SQLAlchemy объекты в словари
         items_data = []
         for item in items:
@@ -293,6 +299,7 @@ class ItemService:
             
             # Update fields
             update_data = item_data.dict(exclude_unset=True)
+            previous_category_id = item.category_id
             for field, value in update_data.items():
                 if field == "title" and value:
                     # Update slug if title changes
@@ -303,6 +310,9 @@ class ItemService:
             self.db.commit()
             self.db.refresh(item)
             
+            if {"price_per_day", "category_id", "status"} & update_data.keys():
+                mark_category_prices_changed([previous_category_id, item.category_id])
+            
             return item
         except SQLAlchemyError as e:
             self.db.rollback()
@@ -335,6 +345,7 @@ class ItemService:
             item.status = ItemStatus.ARCHIVED
             item.updated_at = datetime.utcnow()
             self.db.commit()
+            mark_category_prices_changed([item.category_id])
             
             return True
         except SQLAlchemyError as e:
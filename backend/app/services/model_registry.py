@@ -0,0 +1,257 @@
+"""
+Process-wide registry of trained ML models.
+
+Each published version is a directory ``MODEL_PATH/<name>/<version>/`` with one
+joblib file per artifact (model, scaler, ...). ``MODEL_PATH/<name>/CURRENT``
+holds the active version and is replaced atomically on publish; metadata and
+quality metrics of every version are recorded in ``PricingModelMetrics``.
+
+Models are loaded once per process (NumPy arrays memory-mapped, so worker
+processes share pages) and kept in memory. The pointer file is re-read at most
+every MODEL_REGISTRY_CHECK_INTERVAL seconds; when it changes, the new version
+is loaded and swapped in as a whole, so requests never see a half-loaded model.
+
+Training never runs in a request: ``request_training`` enqueues the
+``train_ml_model`` Celery job (``ml_training`` queue), deduplicated across
+processes, and callers serve a heuristic result until a version is published.
+"""
+
+from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+import os
+import shutil
+import threading
+import time
+
+import joblib
+
+from app.core.config import settings
+from app.core.database import SessionLocal, redis_client
+from app.models.pricing import PricingModelMetrics
+
+logger = logging.getLogger(__name__)
+
+CURRENT_POINTER = "CURRENT"
+TRAINING_LOCK_KEY = "ml:training:{name}"
+
+# Колонки PricingModelMetrics, которые можно передать в metrics
+METRIC_COLUMNS = ("accuracy_score", "precision_score", "recall_score", "f1_score", "mse", "mae")
+
+
+@dataclass
+class LoadedModel:
+    """Artifacts of one model version."""
+
+    name: str
+    version: str
+    artifacts: Dict[str, Any]
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class ModelRegistry:
+    """Versioned model storage with in-memory, hot-reloadable cache."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._models: Dict[str, LoadedModel] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._training_requested_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[LoadedModel]:
+        """
+        Get the active version of a model.
+
+        Args:
+            name: Model name
+
+        Returns:
+            Loaded model or None if no version was published
+        """
+        loaded = self._models.get(name)
+        now = time.monotonic()
+        if loaded is not None and now - self._checked_at.get(name, 0) < settings.MODEL_REGISTRY_CHECK_INTERVAL:
+            return loaded
+
+        self._checked_at[name] = now
+        version = self.current_version(name)
+        if version is None or (loaded is not None and loaded.version == version):
+            return loaded
+
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is None or loaded.version != version:
+                try:
+                    loaded = self._load(name, version)
+                    self._models[name] = loaded
+                    logger.info(f"Loaded model {name} version {version}")
+                except Exception as e:
+                    # Оставляем предыдущую версию в памяти
+                    logger.error(f"Failed to load model {name} version {version}: {e}")
+
+        return loaded
+
+    def current_version(self, name: str) -> Optional[str]:
+        """Read the active version from the pointer file."""
+        try:
+            with open(os.path.join(self.root, name, CURRENT_POINTER)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def request_training(self, name: str, force: bool = False) -> Optional[str]:
+        """
+        Enqueue a background training job for a model.
+
+        Repeated requests within MODEL_TRAINING_DEDUP_SECONDS are dropped
+        (per process, and across processes through Redis when available).
+
+        Args:
+            name: Model name
+            force: Enqueue even if a job was requested recently
+
+        Returns:
+            Celery task ID or None if a job is already pending
+        """
+        now = time.monotonic()
+        if not force:
+            requested_at = self._training_requested_at.get(name)
+            if requested_at is not None and now - requested_at < settings.MODEL_TRAINING_DEDUP_SECONDS:
+                return None
+        self._training_requested_at[name] = now
+
+        if not force and redis_client is not None:
+            try:
+                if not redis_client.set(
+                    TRAINING_LOCK_KEY.format(name=name), "1",
+                    nx=True, ex=settings.MODEL_TRAINING_DEDUP_SECONDS
+                ):
+                    return None
+            except Exception as e:
+                logger.warning(f"Failed to check training lock for {name}: {e}")
+
+        try:
+            from app.tasks import train_ml_model
+            task = train_ml_model.delay(name)
+            logger.info(f"Queued training of model {name}: {task.id}")
+            return task.id
+        except Exception as e:
+            logger.error(f"Failed to queue training of model {name}: {e}")
+            return None
+
+    def publish(
+        self,
+        name: str,
+        artifacts: Dict[str, Any],
+        metrics: Optional[Dict[str, float]] = None,
+        training_samples: Optional[int] = None,
+        training_duration_seconds: Optional[int] = None,
+        feature_count: Optional[int] = None
+    ) -> str:
+        """
+        Store a new model version and make it active.
+
+        Artifacts are written to a temporary directory that is renamed into
+        place, then the metadata row is committed and the pointer file is
+        replaced, so readers only ever see complete versions.
+
+        Args:
+            name: Model name
+            artifacts: Objects to persist by artifact name
+            metrics: Quality metrics (PricingModelMetrics columns; others go to business_metrics)
+            training_samples: Number of training samples
+            training_duration_seconds: Training time
+            feature_count: Number of features
+
+        Returns:
+            Published version
+        """
+        version = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        model_dir = os.path.join(self.root, name)
+        version_dir = os.path.join(model_dir, version)
+        tmp_dir = os.path.join(model_dir, f".{version}.tmp")
+
+        os.makedirs(tmp_dir, exist_ok=True)
+        for artifact_name, obj in artifacts.items():
+            # Без сжатия, чтобы массивы можно было отобразить в память
+            joblib.dump(obj, os.path.join(tmp_dir, f"{artifact_name}.joblib"))
+        if os.path.exists(version_dir):
+            shutil.rmtree(version_dir)
+        os.replace(tmp_dir, version_dir)
+
+        self._record_version(name, version, version_dir, metrics or {},
+                             training_samples, training_duration_seconds, feature_count)
+
+        pointer_tmp = os.path.join(model_dir, f".{CURRENT_POINTER}.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(model_dir, CURRENT_POINTER))
+
+        # Текущий процесс переключается сразу, остальные - при следующей проверке
+        with self._lock:
+            self._models[name] = LoadedModel(name=name, version=version, artifacts=dict(artifacts))
+            self._checked_at[name] = time.monotonic()
+
+        self._prune(name, version)
+        logger.info(f"Published model {name} version {version}")
+        return version
+
+    def _load(self, name: str, version: str) -> LoadedModel:
+        """Load all artifacts of a version (memory-mapped)."""
+        version_dir = os.path.join(self.root, name, version)
+        artifacts = {
+            filename[:-len(".joblib")]: joblib.load(os.path.join(version_dir, filename), mmap_mode="r")
+            for filename in os.listdir(version_dir)
+            if filename.endswith(".joblib")
+        }
+        return LoadedModel(name=name, version=version, artifacts=artifacts)
+
+    def _record_version(
+        self,
+        name: str,
+        version: str,
+        artifact_path: str,
+        metrics: Dict[str, float],
+        training_samples: Optional[int],
+        training_duration_seconds: Optional[int],
+        feature_count: Optional[int]
+    ) -> None:
+        """Record version metadata and mark it as the active one."""
+        db = SessionLocal()
+        try:
+            db.query(PricingModelMetrics).filter(
+                PricingModelMetrics.model_type == name,
+                PricingModelMetrics.is_active == True
+            ).update({"is_active": False}, synchronize_session=False)
+
+            db.add(PricingModelMetrics(
+                model_type=name,
+                model_version=version,
+                artifact_path=artifact_path,
+                is_active=True,
+                training_samples_count=training_samples,
+                training_duration_seconds=training_duration_seconds,
+                feature_count=feature_count,
+                business_metrics={k: v for k, v in metrics.items() if k not in METRIC_COLUMNS},
+                validated_at=datetime.utcnow(),
+                **{k: v for k, v in metrics.items() if k in METRIC_COLUMNS}
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self, name: str, current: str) -> None:
+        """Delete old version directories beyond MODEL_REGISTRY_KEEP_VERSIONS."""
+        model_dir = os.path.join(self.root, name)
+        versions = sorted(
+            entry for entry in os.listdir(model_dir)
+            if entry.isdigit() and os.path.isdir(os.path.join(model_dir, entry))
+        )
+        for version in versions[:-settings.MODEL_REGISTRY_KEEP_VERSIONS]:
+            if version != current:
+                shutil.rmtree(os.path.join(model_dir, version), ignore_errors=True)
+
+
+model_registry = ModelRegistry(settings.MODEL_PATH)
@@ -2,14 +2,16 @@
 Notification service for managing user notifications.
 """
 
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from datetime import datetime
+from sqlalchemy import desc, func, text, update
+from datetime import datetime, timedelta
 import uuid
 
 from app.models.notification import Notification, NotificationType
+from app.core.config import settings
 from app.schemas.common import PaginatedResponse, PaginationMeta
+from app.services.notification_stream import publish_notification_event, serialize_notification
 
 
 class NotificationService:
@@ -57,6 +59,9 @@ class NotificationService:
         self.db.commit()
         self.db.refresh(notification)
         
+        # Доставляем подключенным клиентам через SSE
+        publish_notification_event(user_id, serialize_notification(notification))
+        
         return notification
     
     def get_user_notifications(
@@ -132,26 +137,68 @@ class NotificationService:
         
         return True
     
-    def mark_all_notifications_read(self, user_id: uuid.UUID) -> int:
+    def mark_all_notifications_read(
+        self,
+        user_id: uuid.UUID,
+        before: Optional[datetime] = None
+    ) -> int:
         """
-        Mark all user notifications as read.
+        Mark all user notifications as read with a single UPDATE.
         
         Args:
             user_id: User ID
+            before: Optional upper bound on created_at (e.g. what the client has seen)
             
         Returns:
             Number of notifications marked as read
         """
-        count = self.db.query(Notification).filter(
+        statement = update(Notification).where(
             Notification.user_id == user_id,
             Notification.is_read == False
-        ).update({
-            "is_read": True,
-            "read_at": datetime.utcnow()
-        })
+        )
+        
+        if before:
+            statement = statement.where(Notification.created_at <= before)
+        
+        result = self.db.execute(
+            statement.values(is_read=True, read_at=func.now()).execution_options(
+                synchronize_session=False
+            )
+        )
         
         self.db.commit()
-        return count
+        return result.rowcount
+    
+    def mark_notifications_read(
+        self,
+        user_id: uuid.UUID,
+        notification_ids: List[uuid.UUID]
+    ) -> int:
+        """
+        Mark selected notifications as read with a single UPDATE.
+        
+        Args:
+            user_id: User ID
+            notification_ids: Notification IDs
+            
+        Returns:
+            Number of notifications marked as read
+        """
+        if not notification_ids:
+            return 0
+        
+        result = self.db.execute(
+            update(Notification).where(
+                Notification.user_id == user_id,
+                Notification.id.in_(notification_ids),
+                Notification.is_read == False
+            ).values(is_read=True, read_at=func.now()).execution_options(
+                synchronize_session=False
+            )
+        )
+        
+        self.db.commit()
+        return result.rowcount
     
     def delete_notification(
         self,
@@ -194,4 +241,79 @@ class NotificationService:
         return self.db.query(Notification).filter(
             Notification.user_id == user_id,
             Notification.is_read == False
-        ).count()
\ No newline at end of file
+        ).count()
+    
+    def purge_read_notifications(
+        self,
+        older_than_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        archive: Optional[bool] = None,
+        max_batches: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply retention policy to read notifications.
+        
+        Read notifications older than the cutoff are moved to
+        notifications_archive (or deleted) in short batches, each in its
+        own transaction, so the table never takes long locks.
+        
+        Args:
+            older_than_days: Retention period (default NOTIFICATION_RETENTION_DAYS)
+            batch_size: Rows per batch (default NOTIFICATION_PURGE_BATCH_SIZE)
+            archive: Archive instead of delete (default NOTIFICATION_ARCHIVE_ENABLED)
+            max_batches: Optional limit of batches per run
+            
+        Returns:
+            Purge statistics
+        """
+        older_than_days = older_than_days or settings.NOTIFICATION_RETENTION_DAYS
+        batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+        archive = settings.NOTIFICATION_ARCHIVE_ENABLED if archive is None else archive
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        
+        batch_select = """
+            SELECT id FROM notifications
+            WHERE is_read = true AND created_at < :cutoff
+            ORDER BY created_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        """
+        
+        if archive:
+            statement = text(f"""
+                WITH moved AS (
+                    DELETE FROM notifications
+                    WHERE id IN ({batch_select})
+                    RETURNING id, user_id, title, message, type, action_url, action_text,
+                              is_read, is_sent, data, created_at, read_at, sent_at
+                )
+                INSERT INTO notifications_archive (
+                    id, user_id, title, message, type, action_url, action_text,
+                    is_read, is_sent, data, created_at, read_at, sent_at
+                )
+                SELECT id, user_id, title, message, type, action_url, action_text,
+                       is_read, is_sent, data, created_at, read_at, sent_at
+                FROM moved
+            """)
+        else:
+            statement = text(f"DELETE FROM notifications WHERE id IN ({batch_select})")
+        
+        total = 0
+        batches = 0
+        
+        while max_batches is None or batches < max_batches:
+            result = self.db.execute(statement, {"cutoff": cutoff, "batch_size": batch_size})
+            self.db.commit()
+            
+            batches += 1
+            total += result.rowcount
+            
+            if result.rowcount < batch_size:
+                break
+        
+        return {
+            "cutoff": cutoff.isoformat(),
+            "mode": "archive" if archive else "delete",
+            "processed": total,
+            "batches": batches
+        }
\ No newline at end of file
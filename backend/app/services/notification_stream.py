@@ -0,0 +1,312 @@
+"""
+Real-time notification delivery over Server-Sent Events.
+
+Any process (API worker or Celery) publishes a notification with
+``publish_notification_event``. The event is appended to a capped per-user
+Redis stream (used to resume from ``Last-Event-ID``) and announced on a single
+shared pub/sub channel. Every API process keeps exactly one subscription to that
+channel and fans events out to its connected users through in-memory queues,
+so an idle SSE connection costs one coroutine and one small queue.
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+from datetime import datetime
+import asyncio
+import json
+import logging
+import re
+import uuid
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_CHANNEL = "notifications:events"
+NOTIFICATION_STREAM_KEY = "notifications:stream:{user_id}"
+
+# Формат ID записи Redis stream: "<ms>-<seq>"
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+
+
+def serialize_notification(notification: Any) -> Dict[str, Any]:
+    """
+    Convert a Notification model into a JSON-serializable event payload.
+
+    Args:
+        notification: Notification instance
+
+    Returns:
+        Event payload
+    """
+    notification_type = notification.type
+    created_at = notification.created_at or datetime.utcnow()
+
+    return {
+        "id": str(notification.id),
+        "user_id": str(notification.user_id),
+        "title": notification.title,
+        "message": notification.message,
+        "type": notification_type.value if hasattr(notification_type, "value") else notification_type,
+        "action_url": notification.action_url,
+        "action_text": notification.action_text,
+        "data": notification.data or {},
+        "created_at": created_at.isoformat()
+    }
+
+
+def publish_notification_event(user_id: uuid.UUID, payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Publish notification event for user.
+
+    Safe to call from request handlers and Celery tasks: delivery is
+    best-effort and never raises, the notification row stays the source of truth.
+
+    Args:
+        user_id: Recipient user ID
+        payload: Event payload (see serialize_notification)
+
+    Returns:
+        Stream event ID or None if Redis is unavailable
+    """
+    if redis_client is None:
+        return None
+
+    try:
+        body = json.dumps(payload, default=str)
+        event_id = redis_client.xadd(
+            NOTIFICATION_STREAM_KEY.format(user_id=user_id),
+            {"payload": body},
+            maxlen=settings.NOTIFICATION_STREAM_HISTORY_SIZE,
+            approximate=True
+        )
+        redis_client.publish(
+            NOTIFICATION_CHANNEL,
+            json.dumps({"id": event_id, "user_id": str(user_id), "payload": body})
+        )
+        return event_id
+    except Exception as e:
+        logger.warning(f"Failed to publish notification event for user {user_id}: {e}")
+        return None
+
+
+def is_valid_event_id(event_id: str) -> bool:
+    """Check that a client-supplied event ID is a Redis stream ID."""
+    return bool(EVENT_ID_PATTERN.fullmatch(event_id))
+
+
+def _event_id_key(event_id: str) -> Tuple[int, int]:
+    """Convert Redis stream ID ("<ms>-<seq>") to a comparable tuple."""
+    try:
+        millis, _, sequence = event_id.partition("-")
+        return int(millis), int(sequence or 0)
+    except (AttributeError, ValueError):
+        return 0, 0
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    Format event as an SSE frame.
+
+    Args:
+        event: Event with "id" and "payload" keys
+
+    Returns:
+        SSE frame
+    """
+    return f"id: {event['id']}\nevent: notification\ndata: {event['payload']}\n\n"
+
+
+class NotificationStreamHub:
+    """Per-process multiplexer of the shared notification channel."""
+
+    def __init__(self, redis_url: str, queue_size: int = 100):
+        self.redis_url = redis_url
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._redis: Optional[aioredis.Redis] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def connections_count(self) -> int:
+        """Number of open subscriber queues in this process."""
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def subscribe(self, user_id: uuid.UUID) -> asyncio.Queue:
+        """
+        Register a connection for user.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Queue receiving the user's events
+        """
+        await self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[str(user_id)].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: uuid.UUID, queue: asyncio.Queue) -> None:
+        """
+        Remove a connection for user.
+
+        Args:
+            user_id: User ID
+            queue: Queue returned by subscribe
+        """
+        key = str(user_id)
+        queues = self._subscribers.get(key)
+        if not queues:
+            return
+
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[key]
+
+    async def replay(self, user_id: uuid.UUID, last_event_id: str) -> List[Dict[str, Any]]:
+        """
+        Get events published after last_event_id.
+
+        Args:
+            user_id: User ID
+            last_event_id: Last event ID received by the client
+
+        Returns:
+            Missed events, oldest first
+        """
+        await self.start()
+        entries = await self._redis.xrange(
+            NOTIFICATION_STREAM_KEY.format(user_id=user_id),
+            min=f"({last_event_id}",
+            max="+",
+            count=settings.NOTIFICATION_STREAM_HISTORY_SIZE
+        )
+        return [
+            {"id": entry_id, "payload": fields.get("payload", "{}")}
+            for entry_id, fields in entries
+        ]
+
+    async def stream(self, user_id: uuid.UUID, last_event_id: Optional[str] = None):
+        """
+        Yield SSE frames for user until the client disconnects.
+
+        Args:
+            user_id: User ID
+            last_event_id: Optional ID to resume from
+        """
+        # Подписываемся до чтения истории, чтобы не потерять события между ними
+        queue = await self.subscribe(user_id)
+        last_sent = last_event_id
+
+        try:
+            yield "retry: 3000\n\n"
+
+            if last_event_id:
+                try:
+                    missed = await self.replay(user_id, last_event_id)
+                except Exception as e:
+                    # Без истории стрим продолжает работать с новыми событиями
+                    logger.warning(f"Failed to replay notifications for user {user_id}: {e}")
+                    missed = []
+
+                for event in missed:
+                    yield format_sse(event)
+                    last_sent = event["id"]
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if last_sent and _event_id_key(event["id"]) <= _event_id_key(last_sent):
+                    continue
+
+                yield format_sse(event)
+                last_sent = event["id"]
+        finally:
+            self.unsubscribe(user_id, queue)
+
+    async def close(self) -> None:
+        """Stop listener and close Redis connection."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def start(self) -> None:
+        """
+        Start the shared subscription (idempotent).
+
+        Raises:
+            redis.RedisError: If Redis is not reachable
+        """
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+
+        await self._redis.ping()
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Read the shared channel and dispatch events to local queues."""
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(NOTIFICATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification channel listener error: {e}. Reconnecting...")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    def _dispatch(self, raw: str) -> None:
+        """Deliver a raw channel message to the user's queues."""
+        try:
+            event = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning("Malformed notification event skipped")
+            return
+
+        queues = self._subscribers.get(event.get("user_id"))
+        if not queues:
+            return
+
+        for queue in list(queues):
+            if queue.full():
+                # Медленный клиент: отбрасываем самое старое событие,
+                # клиент догонит пропущенное через Last-Event-ID
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+
+notification_hub = NotificationStreamHub(
+    settings.REDIS_URL,
+    queue_size=settings.NOTIFICATION_STREAM_QUEUE_SIZE
+)
@@ -0,0 +1,311 @@
+"""
+Price elasticity simulator.
+
+Demand elasticity is estimated per category from ``PricingHistory``: for every
+price change the item's successful bookings in the PRICE_ELASTICITY_WINDOW_DAYS
+before and after it are compared, and the log change in bookings is regressed
+on the log change in price. Categories with few changes are shrunk towards
+DEFAULT_PRICE_ELASTICITY. Estimates are stored in
+``category_price_elasticities`` by a daily job.
+
+Simulation evaluates a whole grid of candidate prices for many items at once
+as (items x prices) NumPy arrays with the same linear demand response the
+recommendations use, so a request costs a few small queries and array
+operations.
+"""
+
+from typing import Any, Dict, List, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta
+import logging
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.models.item import Item, ItemStatus
+from app.models.contract import Contract, ContractStatus
+from app.models.pricing import PricingHistory, CategoryPriceElasticity
+from app.services.dynamic_pricing_model import DEFAULT_PRICE_ELASTICITY, DEFAULT_MONTHLY_BOOKINGS
+
+logger = logging.getLogger(__name__)
+
+# Статусы контрактов, которые считаются состоявшимся букингом
+BOOKED_STATUSES = [ContractStatus.SIGNED, ContractStatus.ACTIVE, ContractStatus.COMPLETED]
+
+# Кэш эластичностей в процессе: (время загрузки, category_id -> эластичность)
+_elasticity_cache: Tuple[float, Dict[uuid.UUID, float]] = (0.0, {})
+
+
+def price_multipliers(min_change_pct: float, max_change_pct: float, step_pct: float) -> np.ndarray:
+    """
+    Candidate prices as multipliers of the current price.
+
+    Args:
+        min_change_pct: Lowest change, % (e.g. -50)
+        max_change_pct: Highest change, % (e.g. 50)
+        step_pct: Grid step, %
+
+    Returns:
+        Multipliers from 1 + min/100 to 1 + max/100
+    """
+    points = int(np.floor((max_change_pct - min_change_pct) / step_pct + 1e-9)) + 1
+    return 1 + (min_change_pct + step_pct * np.arange(points)) / 100
+
+
+def revenue_curves(
+    current_prices: np.ndarray,
+    baseline_bookings: np.ndarray,
+    elasticities: np.ndarray,
+    multipliers: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bookings and revenue over a price grid for many items.
+
+    Bookings respond linearly to the relative price change
+    (bookings = baseline * (1 + elasticity * change)), as in
+    DynamicPricingModel._estimate_booking_increase, and cannot go below zero.
+
+    Args:
+        current_prices: Current prices, shape (items,)
+        baseline_bookings: Bookings per month at the current price, shape (items,)
+        elasticities: Elasticity per item, shape (items,)
+        multipliers: Price grid, shape (points,)
+
+    Returns:
+        Prices, bookings and revenue, each of shape (items, points)
+    """
+    prices = current_prices[:, None] * multipliers[None, :]
+    response = 1 + elasticities[:, None] * (multipliers[None, :] - 1)
+    bookings = baseline_bookings[:, None] * np.maximum(response, 0)
+    return prices, bookings, prices * bookings
+
+
+class PriceElasticitySimulator:
+    """Category elasticity estimation and revenue simulation over price grids."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def simulate(
+        self,
+        items: List[Item],
+        min_change_pct: float = -50.0,
+        max_change_pct: float = 50.0,
+        step_pct: float = 1.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Simulate monthly bookings and revenue across candidate prices.
+
+        Args:
+            items: Items to simulate
+            min_change_pct: Lowest price change, %
+            max_change_pct: Highest price change, %
+            step_pct: Grid step, %
+
+        Returns:
+            Revenue curve and revenue-maximizing price per item
+        """
+        items = [item for item in items if item.price_per_day and item.price_per_day > 0]
+        if not items:
+            return []
+
+        multipliers = price_multipliers(min_change_pct, max_change_pct, step_pct)
+        category_elasticities = self.get_elasticities()
+        baseline, baseline_source = self._baseline_bookings(items)
+
+        current = np.array([float(item.price_per_day) for item in items])
+        elasticity = np.array([
+            category_elasticities.get(item.category_id, DEFAULT_PRICE_ELASTICITY) for item in items
+        ])
+        prices, bookings, revenue = revenue_curves(current, baseline, elasticity, multipliers)
+
+        best = revenue.argmax(axis=1)
+        rows = np.arange(len(items))
+        current_revenue = current * baseline
+        best_revenue = revenue[rows, best]
+
+        return [
+            {
+                "item_id": item.id,
+                "current_price": float(current[i]),
+                "elasticity": float(elasticity[i]),
+                "elasticity_source": "category" if item.category_id in category_elasticities else "default",
+                "baseline_bookings": float(baseline[i]),
+                "baseline_source": baseline_source[i],
+                "price_changes": ((multipliers - 1) * 100).round(4).tolist(),
+                "prices": prices[i].round(8).tolist(),
+                "bookings": bookings[i].round(4).tolist(),
+                "revenue": revenue[i].round(8).tolist(),
+                "optimal_price": round(float(prices[i, best[i]]), 8),
+                "optimal_change_percentage": round(float((multipliers[best[i]] - 1) * 100), 4),
+                "optimal_revenue": round(float(best_revenue[i]), 8),
+                "current_revenue": round(float(current_revenue[i]), 8),
+                "revenue_change_percentage": round(
+                    float((best_revenue[i] - current_revenue[i]) / current_revenue[i] * 100), 4
+                )
+            }
+            for i, item in enumerate(items)
+        ]
+
+    def get_elasticities(self) -> Dict[uuid.UUID, float]:
+        """Stored elasticities by category (cached for PRICE_ELASTICITY_CACHE_SECONDS)."""
+        global _elasticity_cache
+
+        loaded_at, values = _elasticity_cache
+        if time.monotonic() - loaded_at < settings.PRICE_ELASTICITY_CACHE_SECONDS:
+            return values
+
+        values = {
+            category_id: elasticity
+            for category_id, elasticity in self.db.query(
+                CategoryPriceElasticity.category_id, CategoryPriceElasticity.elasticity
+            )
+        }
+        _elasticity_cache = (time.monotonic(), values)
+        return values
+
+    def fit_category_elasticities(self) -> int:
+        """
+        Estimate elasticity per category and store the results.
+
+        Returns:
+            Number of categories with an estimate
+        """
+        global _elasticity_cache
+
+        data = pd.DataFrame(
+            self.db.execute(self._price_change_outcomes_query()).all(),
+            columns=["category_id", "old_price", "new_price", "bookings_before", "bookings_after"]
+        )
+        if data.empty:
+            return 0
+
+        price_change = np.log(data["new_price"].astype(float) / data["old_price"].astype(float))
+        booking_change = np.log((data["bookings_after"] + 1) / (data["bookings_before"] + 1))
+        data["xy"] = price_change * booking_change
+        data["xx"] = price_change * price_change
+
+        # Регрессия через начало координат по каждой категории
+        fitted = data.groupby("category_id").agg(
+            xy=("xy", "sum"), xx=("xx", "sum"), sample_size=("xx", "size")
+        )
+        fitted["raw_elasticity"] = fitted["xy"] / fitted["xx"]
+
+        # Сжатие к априорной оценке: чем меньше изменений цены, тем ближе к ней
+        weight = fitted["sample_size"] / (fitted["sample_size"] + settings.PRICE_ELASTICITY_PRIOR_WEIGHT)
+        fitted["elasticity"] = (
+            weight * fitted["raw_elasticity"] + (1 - weight) * DEFAULT_PRICE_ELASTICITY
+        ).clip(settings.PRICE_ELASTICITY_MIN, settings.PRICE_ELASTICITY_MAX)
+
+        values = [
+            {
+                "category_id": category_id,
+                "elasticity": float(row.elasticity),
+                "raw_elasticity": float(row.raw_elasticity),
+                "sample_size": int(row.sample_size)
+            }
+            for category_id, row in fitted.iterrows()
+        ]
+
+        stmt = pg_insert(CategoryPriceElasticity).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CategoryPriceElasticity.category_id],
+            set_={
+                "elasticity": stmt.excluded.elasticity,
+                "raw_elasticity": stmt.excluded.raw_elasticity,
+                "sample_size": stmt.excluded.sample_size,
+                "fitted_at": func.now()
+            }
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+
+        _elasticity_cache = (0.0, {})
+        return len(values)
+
+    def _price_change_outcomes_query(self):
+        """Bookings before and after each price change with complete windows."""
+        now = datetime.utcnow()
+        window = timedelta(days=settings.PRICE_ELASTICITY_WINDOW_DAYS)
+
+        return select(
+            Item.category_id,
+            PricingHistory.old_price,
+            PricingHistory.new_price,
+            func.count(Contract.id).filter(Contract.created_at < PricingHistory.created_at),
+            func.count(Contract.id).filter(Contract.created_at >= PricingHistory.created_at)
+        ).select_from(PricingHistory).join(
+            Item, Item.id == PricingHistory.item_id
+        ).outerjoin(
+            Contract, and_(
+                Contract.item_id == PricingHistory.item_id,
+                Contract.status.in_(BOOKED_STATUSES),
+                Contract.created_at >= PricingHistory.created_at - window,
+                Contract.created_at < PricingHistory.created_at + window
+            )
+        ).where(
+            PricingHistory.created_at >= now - timedelta(days=settings.PRICE_ELASTICITY_LOOKBACK_DAYS),
+            PricingHistory.created_at <= now - window,
+            PricingHistory.old_price > 0,
+            PricingHistory.new_price > 0,
+            PricingHistory.new_price != PricingHistory.old_price
+        ).group_by(PricingHistory.id, Item.category_id)
+
+    def _baseline_bookings(self, items: List[Item]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Monthly bookings at the current price.
+
+        The item's own recent bookings, else the category average per active
+        item, else DEFAULT_MONTHLY_BOOKINGS.
+        """
+        window_days = settings.PRICE_ELASTICITY_WINDOW_DAYS
+        since = datetime.utcnow() - timedelta(days=window_days)
+        to_monthly = 30 / window_days
+
+        item_bookings = dict(
+            self.db.query(Contract.item_id, func.count(Contract.id)).filter(
+                Contract.item_id.in_([item.id for item in items]),
+                Contract.status.in_(BOOKED_STATUSES),
+                Contract.created_at >= since
+            ).group_by(Contract.item_id).all()
+        )
+
+        missing_categories = list({item.category_id for item in items if not item_bookings.get(item.id)})
+        category_bookings: Dict[uuid.UUID, float] = {}
+        if missing_categories:
+            category_items = dict(
+                self.db.query(Item.category_id, func.count(Item.id)).filter(
+                    Item.category_id.in_(missing_categories),
+                    Item.status == ItemStatus.ACTIVE
+                ).group_by(Item.category_id).all()
+            )
+            category_bookings = {
+                category_id: bookings / category_items[category_id]
+                for category_id, bookings in self.db.query(Item.category_id, func.count(Contract.id)).join(
+                    Contract, Contract.item_id == Item.id
+                ).filter(
+                    Item.category_id.in_(missing_categories),
+                    Contract.status.in_(BOOKED_STATUSES),
+                    Contract.created_at >= since
+                ).group_by(Item.category_id).all()
+                if category_items.get(category_id)
+            }
+
+        baseline, source = [], []
+        for item in items:
+            if item_bookings.get(item.id):
+                baseline.append(item_bookings[item.id] * to_monthly)
+                source.append("item")
+            elif category_bookings.get(item.category_id):
+                baseline.append(category_bookings[item.category_id] * to_monthly)
+                source.append("category")
+            else:
+                baseline.append(float(DEFAULT_MONTHLY_BOOKINGS))
+                source.append("default")
+
+        return np.array(baseline), source
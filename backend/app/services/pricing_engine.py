@@ -0,0 +1,439 @@
+"""
+Tiered pricing engine.
+
+One entry point for pricing recommendations. Items are answered by the
+cheapest tier that can serve them within the request's latency budget:
+
+- ``precomputed``: a stored recommendation (``pricing_recommendations``)
+  that is still valid for the current model, price and features;
+- ``ml``: the published pricing model, one batched inference over items whose
+  features are already in the feature store;
+- ``heuristic``: rule-based pricing from item columns and the cached category
+  price distribution, evaluated for all remaining items at once. It always
+  answers.
+
+The ML tier is skipped when its recent per-item latency says it would not
+fit into what is left of the budget; a tier that has started is not
+interrupted. Items priced by a lower tier are queued for a background
+recompute, so the next request is served from the table.
+
+Every recommendation carries the tier that produced it and that tier's
+latency. Per-tier request, item and latency counters are kept in Redis (see
+``get_pricing_tier_stats``).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
+import logging
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.models.item import Item, ItemStatus
+from app.models.pricing import ItemPricingFeatures
+from app.services.category_price_stats import CategoryPriceStats
+from app.services.dynamic_pricing_model import DynamicPricingModel, PricingRecommendation
+from app.services.pricing_recommendations import PricingRecommendationStore
+
+logger = logging.getLogger(__name__)
+
+TIER_PRECOMPUTED = "precomputed"
+TIER_ML = "ml"
+TIER_HEURISTIC = "heuristic"
+PRICING_TIERS = (TIER_PRECOMPUTED, TIER_ML, TIER_HEURISTIC)
+
+PRICING_TIER_METRICS_KEY = "pricing:tier_metrics"
+# Границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+SEASONAL_FACTORS = {
+    'spring': 1.0,
+    'summer': 1.2,
+    'autumn': 0.9,
+    'winter': 0.8
+}
+
+CATEGORY_PRICE_MULTIPLIERS = {
+    'electronics': 1.1,
+    'vehicles': 1.3,
+    'tools': 0.9,
+    'sports': 1.15,
+    'home': 0.95
+}
+
+# Эвристика меняет цену не более чем на 30%
+HEURISTIC_MAX_CHANGE = 0.3
+HEURISTIC_CONFIDENCE_SCORE = 0.8
+
+# Скользящая оценка задержки уровня на один товар в процессе, мс
+_tier_cost_ms: Dict[str, float] = {}
+TIER_COST_SMOOTHING = 0.2
+
+
+def get_season(date: datetime) -> str:
+    """Season of a date."""
+    month = date.month
+    if month in [3, 4, 5]:
+        return 'spring'
+    elif month in [6, 7, 8]:
+        return 'summer'
+    elif month in [9, 10, 11]:
+        return 'autumn'
+    return 'winter'
+
+
+def heuristic_prices(
+    current_prices: np.ndarray,
+    avg_category_prices: np.ndarray,
+    interactions: np.ndarray,
+    ratings: np.ndarray,
+    category_factors: np.ndarray,
+    seasonal_factor: float
+) -> Dict[str, np.ndarray]:
+    """
+    Rule-based recommended prices for many items.
+
+    Args:
+        current_prices: Current prices, shape (items,), all positive
+        avg_category_prices: Average competitor price per item
+        interactions: Views plus twice the favorites per item
+        ratings: Item ratings (0 if none)
+        category_factors: Category price multiplier per item
+        seasonal_factor: Seasonal price multiplier
+
+    Returns:
+        Recommended price, change in % and the competition, demand and rating factors
+    """
+    competition = np.clip(avg_category_prices / current_prices, 0.8, 1.2)
+    demand = np.clip(1 + (interactions / 100) * 0.1, 0.7, 1.3)
+    rating = np.where(ratings > 0, 0.9 + (ratings / 5.0) * 0.2, 1.0)
+
+    recommended = current_prices * seasonal_factor * category_factors * competition * demand * rating
+    recommended = np.clip(
+        recommended, current_prices * (1 - HEURISTIC_MAX_CHANGE), current_prices * (1 + HEURISTIC_MAX_CHANGE)
+    )
+
+    return {
+        'recommended_price': recommended,
+        'price_change_percentage': (recommended - current_prices) / current_prices * 100,
+        'competition_factor': competition,
+        'demand_factor': demand,
+        'rating_factor': rating
+    }
+
+
+class PricingEngine:
+    """Pricing recommendations from the cheapest tier that fits the latency budget."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.store = PricingRecommendationStore(db)
+
+    def recommend(
+        self,
+        item_ids: List[uuid.UUID],
+        target_date: Optional[datetime] = None,
+        budget_ms: Optional[float] = None
+    ) -> List[PricingRecommendation]:
+        """
+        Get recommendations for items.
+
+        Args:
+            item_ids: Item IDs
+            target_date: Target date (stored recommendations are only used for the current date)
+            budget_ms: Latency budget, ms (default: PRICING_LATENCY_BUDGET_MS)
+
+        Returns:
+            Recommendations in the order of item_ids (missing items are omitted)
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return []
+
+        budget_ms = settings.PRICING_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000
+        results: Dict[uuid.UUID, PricingRecommendation] = {}
+        timings: List[Tuple[str, int, Optional[float]]] = []
+
+        if target_date is None:
+            started = time.perf_counter()
+            self._answer(results, self.store.get_fresh(item_ids).values(), TIER_PRECOMPUTED, started, timings)
+
+        pending = [item_id for item_id in item_ids if item_id not in results]
+        if not pending:
+            _record_tier_metrics(timings)
+            return [results[item_id] for item_id in item_ids]
+
+        active, with_features = self._pending_state(pending)
+
+        ready = [item_id for item_id in pending if item_id in with_features]
+        if ready:
+            if _fits_budget(TIER_ML, len(ready), deadline):
+                started = time.perf_counter()
+                recommendations = self._score_ml(ready, target_date)
+                if recommendations is not None:
+                    self._answer(results, recommendations, TIER_ML, started, timings)
+            else:
+                timings.append((TIER_ML, len(ready), None))
+
+        remaining = [item_id for item_id in pending if item_id not in results]
+        if remaining:
+            started = time.perf_counter()
+            self._answer(results, self._score_heuristic(remaining, target_date), TIER_HEURISTIC, started, timings)
+
+        # Следующий запрос получит рекомендацию из таблицы
+        if target_date is None:
+            stale = [item_id for item_id in pending if item_id in active]
+            if stale:
+                self.store.schedule_refresh(stale)
+
+        _record_tier_metrics(timings)
+        return [results[item_id] for item_id in item_ids if item_id in results]
+
+    def _answer(
+        self,
+        results: Dict[uuid.UUID, PricingRecommendation],
+        recommendations,
+        tier: str,
+        started: float,
+        timings: List[Tuple[str, int, Optional[float]]]
+    ) -> None:
+        """Take a tier's recommendations and record its latency."""
+        latency_ms = (time.perf_counter() - started) * 1000
+        answered = 0
+        for recommendation in recommendations:
+            recommendation.tier = tier
+            recommendation.latency_ms = round(latency_ms, 3)
+            results[recommendation.item_id] = recommendation
+            answered += 1
+
+        timings.append((tier, answered, latency_ms))
+        if answered:
+            _update_tier_cost(tier, latency_ms / answered)
+
+    def _pending_state(self, item_ids: List[uuid.UUID]) -> Tuple[set, set]:
+        """Active items and items with stored features, with one query."""
+        rows = self.db.query(
+            Item.id, Item.status, ItemPricingFeatures.item_id
+        ).outerjoin(
+            ItemPricingFeatures, ItemPricingFeatures.item_id == Item.id
+        ).filter(Item.id.in_(item_ids)).all()
+
+        active = {item_id for item_id, status, _ in rows if status == ItemStatus.ACTIVE}
+        with_features = {item_id for item_id, _, feature_item_id in rows if feature_item_id is not None}
+        return active, with_features
+
+    def _score_ml(
+        self,
+        item_ids: List[uuid.UUID],
+        target_date: Optional[datetime]
+    ) -> Optional[List[PricingRecommendation]]:
+        """Batched inference with the published model (None if there is no usable model)."""
+        model = DynamicPricingModel(self.db)
+        if not model.initialize_models():
+            return None
+
+        try:
+            return model.get_bulk_recommendations(item_ids, target_date)
+        except Exception as e:
+            logger.warning(f"ML pricing failed for {len(item_ids)} items, using heuristic: {e}")
+            return None
+
+    def _score_heuristic(
+        self,
+        item_ids: List[uuid.UUID],
+        target_date: Optional[datetime]
+    ) -> List[PricingRecommendation]:
+        """Rule-based recommendations for items (one item query and one distribution read)."""
+        items = self.db.query(Item).options(joinedload(Item.category)).filter(Item.id.in_(item_ids)).all()
+        if not items:
+            return []
+
+        season = get_season(target_date or datetime.utcnow())
+        seasonal_factor = SEASONAL_FACTORS.get(season, 1.0)
+
+        current = np.array([float(item.price_per_day or 0) for item in items])
+        priced = current > 0
+        safe_current = np.where(priced, current, 1.0)
+        avg_price = self._avg_category_prices(items, safe_current)
+        interactions = np.array([(item.views_count or 0) + (item.favorites_count or 0) * 2 for item in items])
+        ratings = np.array([float(item.rating or 0) for item in items])
+        category_factors = np.array([
+            CATEGORY_PRICE_MULTIPLIERS.get(item.category.name.lower() if item.category else 'other', 1.0)
+            for item in items
+        ])
+
+        result = heuristic_prices(safe_current, avg_price, interactions, ratings, category_factors, seasonal_factor)
+        recommended = result['recommended_price']
+        change = result['price_change_percentage']
+        market_position = np.select(
+            [recommended > avg_price * 1.2, recommended < avg_price * 0.8], ['premium', 'budget'], 'competitive'
+        )
+        abs_change = np.abs(change)
+        risk = np.select([abs_change > 20, abs_change > 10], ['high', 'medium'], 'low')
+
+        recommendations = []
+        for i, item in enumerate(items):
+            if not priced[i]:
+                # Без положительной цены рекомендовать нечего
+                recommendations.append(PricingRecommendation(
+                    item_id=item.id,
+                    current_price=float(current[i]),
+                    recommended_price=float(current[i]),
+                    price_change_percentage=0.0,
+                    confidence_score=0.0,
+                    reasoning=["Ошибка в расчете рекомендации"],
+                    expected_demand_change=0.0,
+                    market_position='competitive',
+                    seasonal_adjustment=1.0,
+                    competition_adjustment=1.0,
+                    demand_adjustment=1.0,
+                    estimated_bookings_increase=0.0,
+                    estimated_revenue_change=0.0,
+                    risk_assessment='medium'
+                ))
+                continue
+
+            competition = float(result['competition_factor'][i])
+            demand = float(result['demand_factor'][i])
+            rating = float(result['rating_factor'][i])
+
+            reasoning = []
+            if abs(seasonal_factor - 1.0) > 0.05:
+                reasoning.append(f"Сезонная корректировка: {season} ({seasonal_factor:.2f})")
+            if abs(competition - 1.0) > 0.05:
+                reasoning.append(f"Конкурентная позиция: {competition:.2f}")
+            if abs(demand - 1.0) > 0.05:
+                reasoning.append(f"Спрос: {int(interactions[i])} взаимодействий ({demand:.2f})")
+            if abs(rating - 1.0) > 0.05:
+                reasoning.append(f"Рейтинг товара: {item.rating or 'нет'} ({rating:.2f})")
+
+            recommendations.append(PricingRecommendation(
+                item_id=item.id,
+                current_price=float(current[i]),
+                recommended_price=round(float(recommended[i]), 6),
+                price_change_percentage=round(float(change[i]), 2),
+                confidence_score=HEURISTIC_CONFIDENCE_SCORE,
+                reasoning=reasoning,
+                expected_demand_change=round((demand - 1) * 100, 1),
+                market_position=str(market_position[i]),
+                seasonal_adjustment=seasonal_factor,
+                competition_adjustment=competition,
+                demand_adjustment=demand,
+                estimated_bookings_increase=round(demand * 10, 1),
+                estimated_revenue_change=round(float(change[i]) * 0.7, 1),
+                risk_assessment=str(risk[i])
+            ))
+
+        return recommendations
+
+    def _avg_category_prices(self, items: List[Item], current: np.ndarray) -> np.ndarray:
+        """Average price of each item's category competitors (the item itself excluded)."""
+        distributions = CategoryPriceStats().get_many(item.category_id for item in items)
+
+        avg_price = current.copy()
+        for i, item in enumerate(items):
+            distribution = distributions.get(item.category_id)
+            if distribution is None:
+                continue
+            is_member = int(item.status == ItemStatus.ACTIVE and bool(item.is_approved))
+            competitors = distribution.count - is_member
+            if competitors > 0:
+                avg_price[i] = (distribution.total - current[i] * is_member) / competitors
+        return avg_price
+
+
+def _fits_budget(tier: str, items: int, deadline: float) -> bool:
+    """Whether the tier's recent latency for that many items fits before the deadline."""
+    cost_ms = _tier_cost_ms.get(tier)
+    remaining_ms = (deadline - time.perf_counter()) * 1000
+    if cost_ms is None:
+        return remaining_ms > 0
+    return cost_ms * items <= remaining_ms
+
+
+def _update_tier_cost(tier: str, cost_ms: float) -> None:
+    """Blend a measured per-item latency into the tier's estimate."""
+    previous = _tier_cost_ms.get(tier)
+    _tier_cost_ms[tier] = cost_ms if previous is None else (
+        previous + TIER_COST_SMOOTHING * (cost_ms - previous)
+    )
+
+
+def _latency_bucket(latency_ms: float) -> str:
+    """Histogram bucket of a latency."""
+    for bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+def _record_tier_metrics(timings: List[Tuple[str, int, Optional[float]]]) -> None:
+    """Add one request's tier timings to the counters (best-effort)."""
+    if redis_client is None or not timings:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tier, items, latency_ms in timings:
+            if latency_ms is None:
+                pipe.hincrby(PRICING_TIER_METRICS_KEY, f"{tier}|skipped", 1)
+                continue
+            pipe.hincrby(PRICING_TIER_METRICS_KEY, f"{tier}|requests", 1)
+            pipe.hincrby(PRICING_TIER_METRICS_KEY, f"{tier}|items", items)
+            pipe.hincrbyfloat(PRICING_TIER_METRICS_KEY, f"{tier}|latency_ms", latency_ms)
+            pipe.hincrby(PRICING_TIER_METRICS_KEY, f"{tier}|{_latency_bucket(latency_ms)}", 1)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def get_pricing_tier_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get pricing engine counters by tier.
+
+    Returns:
+        Requests, items answered, budget skips, average latency and
+        approximate p50/p95 latency per tier (upper bucket bounds, ms;
+        None above the largest bucket)
+    """
+    if redis_client is None:
+        return {}
+
+    try:
+        raw = redis_client.hgetall(PRICING_TIER_METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to read pricing tier stats: {e}")
+        return {}
+
+    counters: Dict[str, Dict[str, float]] = {tier: {} for tier in PRICING_TIERS}
+    for field, value in raw.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        tier, name = field.split("|", 1)
+        counters.setdefault(tier, {})[name] = float(value)
+
+    bounds = [*LATENCY_BUCKETS_MS, None]
+    stats = {}
+    for tier, values in counters.items():
+        requests = int(values.get("requests", 0))
+        histogram = [int(values.get(f"le_{bound}" if bound else "le_inf", 0)) for bound in bounds]
+        cumulative = np.cumsum(histogram)
+
+        def percentile(q: float) -> Optional[float]:
+            if not requests:
+                return None
+            bound = bounds[int(np.searchsorted(cumulative, q * requests))]
+            return float(bound) if bound else None
+
+        stats[tier] = {
+            "requests": requests,
+            "items": int(values.get("items", 0)),
+            "skipped": int(values.get("skipped", 0)),
+            "avg_latency_ms": round(values.get("latency_ms", 0) / requests, 3) if requests else None,
+            "p50_latency_ms": percentile(0.5),
+            "p95_latency_ms": percentile(0.95)
+        }
+    return stats
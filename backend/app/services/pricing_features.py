@@ -0,0 +1,407 @@
+"""
+Feature store for the dynamic pricing model.
+
+Per-item market, demand and owner features are computed for many items at
+once with grouped subqueries and upserted into ``pricing_item_features``, so a
+recommendation reads one row instead of issuing a dozen queries. Incremental
+runs only touch items whose price, status, category, owner, brand or location
+differ from the stored row, or whose contracts changed since the last run
+(item views do not count); a row is rewritten only when its values change. A
+periodic full rebuild picks up category-wide drift (average prices,
+competition). Brand share and location demand are kept in their own tables
+keyed by the items' normalized ``brand_key``/``location_key``,
+refreshed periodically and on full rebuilds.
+"""
+
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, or_, func, select, union, case, true, extract
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta
+from decimal import Decimal
+import uuid
+
+from app.models.user import User
+from app.models.item import Item, ItemStatus
+from app.models.contract import Contract, ContractStatus
+from app.models.pricing import ItemPricingFeatures, BrandDemand, LocationDemand
+from app.models.analytics import AnalyticsRollupState
+from app.services.competition_index import COMPETITION_PRICE_BAND, COMPETITION_DENSITY_SCALE
+
+# Колонки таблицы признаков (кроме computed_at) в порядке выборки
+FEATURE_COLUMNS = [
+    "item_id",
+    "category_id",
+    "owner_id",
+    "brand_popularity_score",
+    "category_avg_price",
+    "category_median_price",
+    "similar_items_count",
+    "competition_density",
+    "location_demand_score",
+    "booking_rate_7d",
+    "booking_rate_30d",
+    "cancellation_rate",
+    "owner_rating",
+    "owner_total_items",
+    "owner_completion_rate",
+    "owner_response_time_score",
+    # Поля товара, по которым считались признаки
+    "item_price",
+    "item_status",
+    "brand_key",
+    "location_key"
+]
+
+# Скорость ответа владельца: среднее время от запроса аренды до подписи
+# владельцем. За OWNER_RESPONSE_SCALE_HOURS балл падает до 0.5; без
+# подписанных сделок - OWNER_RESPONSE_DEFAULT_SCORE
+OWNER_RESPONSE_SCALE_HOURS = 24
+OWNER_RESPONSE_DEFAULT_SCORE = 0.8
+
+
+class PricingFeatureStore:
+    """Set-based computation and storage of per-item pricing features."""
+
+    STATE_NAME = "pricing_features"
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_item_features(self, item_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get stored features of an item.
+
+        Args:
+            item_id: Item ID
+
+        Returns:
+            Feature values by column name or None if the item does not exist
+        """
+        return self.get_items_features([item_id]).get(item_id)
+
+    def get_items_features(self, item_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Dict[str, Any]]:
+        """
+        Get stored features of several items in one query.
+
+        Items without a stored row (e.g. created after the last refresh) are
+        computed on the fly without writing, so this is safe on a read session.
+
+        Args:
+            item_ids: Item IDs
+
+        Returns:
+            Feature values by column name, keyed by item ID (missing items omitted)
+        """
+        if not item_ids:
+            return {}
+
+        rows = self.db.query(ItemPricingFeatures).filter(
+            ItemPricingFeatures.item_id.in_(item_ids)
+        ).all()
+        features = {
+            row.item_id: {column: getattr(row, column) for column in FEATURE_COLUMNS}
+            for row in rows
+        }
+
+        missing = [item_id for item_id in item_ids if item_id not in features]
+        if missing:
+            for computed in self.db.execute(self._features_select(Item.id.in_(missing))):
+                features[computed[0]] = {
+                    column: float(value) if isinstance(value, Decimal) else value
+                    for column, value in zip(FEATURE_COLUMNS, computed)
+                }
+
+        return features
+
+    def refresh(self, full_rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Refresh stored features.
+
+        Args:
+            full_rebuild: Recompute all items instead of changed ones
+
+        Returns:
+            Refresh summary
+        """
+        now = datetime.utcnow()
+
+        # Блокировка строки состояния сериализует параллельные запуски
+        state = self.db.query(AnalyticsRollupState).filter(
+            AnalyticsRollupState.name == self.STATE_NAME
+        ).with_for_update().first()
+
+        if state is None or full_rebuild:
+            self.refresh_demand_tables(commit=False)
+            item_filter = true()
+        else:
+            changed = self._changed_item_ids(state.high_water_mark).subquery()
+            item_filter = Item.id.in_(select(changed.c.id))
+
+        updated = self.refresh_items(item_filter, commit=False)
+
+        if state is None:
+            self.db.add(AnalyticsRollupState(name=self.STATE_NAME, high_water_mark=now))
+        else:
+            state.high_water_mark = now
+
+        self.db.commit()
+
+        return {
+            "full_rebuild": full_rebuild or state is None,
+            "items_updated": updated,
+            "high_water_mark": now.isoformat()
+        }
+
+    def refresh_demand_tables(self, commit: bool = True) -> Dict[str, int]:
+        """
+        Recompute brand share and location demand tables.
+
+        Args:
+            commit: Commit the transaction
+
+        Returns:
+            Number of brand and location keys
+        """
+        active = Item.status == ItemStatus.ACTIVE
+        total_active = select(func.count(Item.id)).where(active).scalar_subquery()
+
+        item_count = func.count(Item.id)
+        brands = pg_insert(BrandDemand).from_select(
+            ["brand_key", "item_count", "share", "popularity_score"],
+            select(
+                Item.brand_key,
+                item_count,
+                item_count * 1.0 / func.greatest(total_active, 1),
+                func.least(item_count * 10.0 / func.greatest(total_active, 1), 1.0)
+            ).where(active, Item.brand_key.isnot(None)).group_by(Item.brand_key)
+        )
+        brands = brands.on_conflict_do_update(
+            index_elements=[BrandDemand.brand_key],
+            set_={
+                "item_count": brands.excluded.item_count,
+                "share": brands.excluded.share,
+                "popularity_score": brands.excluded.popularity_score,
+                "refreshed_at": func.now()
+            }
+        )
+
+        bookings = func.count(Contract.id)
+        locations = pg_insert(LocationDemand).from_select(
+            ["location_key", "bookings_90d", "demand_score"],
+            select(
+                Item.location_key,
+                bookings,
+                func.least(bookings / 50.0, 1.0)
+            ).select_from(Contract).join(
+                Item, Contract.item_id == Item.id
+            ).where(
+                Contract.status.in_([ContractStatus.COMPLETED, ContractStatus.ACTIVE]),
+                Contract.created_at >= datetime.utcnow() - timedelta(days=90),
+                Item.location_key.isnot(None)
+            ).group_by(Item.location_key)
+        )
+        locations = locations.on_conflict_do_update(
+            index_elements=[LocationDemand.location_key],
+            set_={
+                "bookings_90d": locations.excluded.bookings_90d,
+                "demand_score": locations.excluded.demand_score,
+                "refreshed_at": func.now()
+            }
+        )
+
+        brand_count = self.db.execute(brands).rowcount
+        location_count = self.db.execute(locations).rowcount
+
+        # now() постоянно в транзакции: ключи, не попавшие в пересчет, удаляем
+        self.db.query(BrandDemand).filter(BrandDemand.refreshed_at < func.now()).delete(synchronize_session=False)
+        self.db.query(LocationDemand).filter(LocationDemand.refreshed_at < func.now()).delete(synchronize_session=False)
+
+        if commit:
+            self.db.commit()
+        return {"brands": brand_count, "locations": location_count}
+
+    def refresh_items(self, item_filter, commit: bool = True) -> int:
+        """
+        Recompute and upsert features of items matching a filter.
+
+        Rows whose values did not change are left untouched, so computed_at
+        only moves when the features do (stored recommendations compare
+        against it).
+
+        Args:
+            item_filter: SQL condition on Item (e.g. Item.id.in_(ids))
+            commit: Commit the transaction
+
+        Returns:
+            Number of inserted or changed rows
+        """
+        stmt = pg_insert(ItemPricingFeatures).from_select(
+            FEATURE_COLUMNS, self._features_select(item_filter)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ItemPricingFeatures.item_id],
+            set_={
+                **{column: stmt.excluded[column] for column in FEATURE_COLUMNS[1:]},
+                "computed_at": func.now()
+            },
+            where=or_(*[
+                ItemPricingFeatures.__table__.c[column].is_distinct_from(stmt.excluded[column])
+                for column in FEATURE_COLUMNS[1:]
+            ])
+        )
+
+        result = self.db.execute(stmt)
+        if commit:
+            self.db.commit()
+        return result.rowcount
+
+    def _changed_item_ids(self, since: datetime):
+        """Select IDs of items whose features may have changed since a time."""
+        contract_changed = or_(Contract.created_at >= since, Contract.updated_at >= since)
+
+        # Item.updated_at не подходит: он меняется и при просмотрах
+        item_changed = or_(
+            ItemPricingFeatures.item_price.is_distinct_from(Item.price_per_day),
+            ItemPricingFeatures.item_status.is_distinct_from(Item.status),
+            ItemPricingFeatures.category_id.is_distinct_from(Item.category_id),
+            ItemPricingFeatures.owner_id.is_distinct_from(Item.owner_id),
+            ItemPricingFeatures.brand_key.is_distinct_from(Item.brand_key),
+            ItemPricingFeatures.location_key.is_distinct_from(Item.location_key)
+        )
+
+        return union(
+            # Сам товар: цена, статус, категория, владелец, бренд или локация
+            select(Item.id).join(
+                ItemPricingFeatures, ItemPricingFeatures.item_id == Item.id
+            ).where(item_changed),
+            # Контракты по товару
+            select(Contract.item_id).where(contract_changed),
+            # Все товары владельцев, чьи сделки изменились
+            select(Item.id).where(
+                Item.owner_id.in_(select(Contract.owner_id).where(contract_changed))
+            ),
+            # Товары без строки признаков
+            select(Item.id).outerjoin(
+                ItemPricingFeatures, ItemPricingFeatures.item_id == Item.id
+            ).where(ItemPricingFeatures.item_id.is_(None))
+        )
+
+    def _features_select(self, item_filter):
+        """
+        Build the select computing features for items matching a filter.
+
+        Columns follow FEATURE_COLUMNS. Aggregates are grouped once per
+        category, item and owner and joined to the items; brand and location
+        scores are looked up in the demand tables by the items' normalized keys.
+        """
+        now = datetime.utcnow()
+        active = Item.status == ItemStatus.ACTIVE
+
+        category_stats = select(
+            Item.category_id,
+            func.count(Item.id).label("total_items"),
+            func.avg(Item.price_per_day).label("avg_price"),
+            func.percentile_cont(0.5).within_group(Item.price_per_day).label("median_price")
+        ).where(active).group_by(Item.category_id).subquery()
+
+        not_cancelled = Contract.status != ContractStatus.CANCELLED
+        contract_stats = select(
+            Contract.item_id,
+            func.count(Contract.id).filter(
+                Contract.created_at >= now - timedelta(days=7), not_cancelled
+            ).label("bookings_7d"),
+            func.count(Contract.id).filter(
+                Contract.created_at >= now - timedelta(days=30), not_cancelled
+            ).label("bookings_30d"),
+            func.count(Contract.id).filter(
+                Contract.status == ContractStatus.CANCELLED
+            ).label("cancellations"),
+            func.count(Contract.id).label("total")
+        ).where(
+            Contract.created_at >= now - timedelta(days=90)
+        ).group_by(Contract.item_id).subquery()
+
+        # Конкуренты: та же категория и цена в пределах ±30% (как в индексе конкуренции)
+        competitor = aliased(Item)
+        competition = select(
+            Item.id.label("item_id"),
+            func.count(competitor.id).label("competitors")
+        ).join(
+            competitor,
+            and_(
+                competitor.category_id == Item.category_id,
+                competitor.id != Item.id,
+                competitor.price_per_day.between(
+                    Item.price_per_day * (1 - COMPETITION_PRICE_BAND), Item.price_per_day * (1 + COMPETITION_PRICE_BAND)
+                ),
+                competitor.status == ItemStatus.ACTIVE,
+                competitor.is_approved == True
+            )
+        ).where(item_filter).group_by(Item.id).subquery()
+
+        owner_items = select(
+            Item.owner_id,
+            func.count(Item.id).label("item_count")
+        ).where(Item.status != ItemStatus.ARCHIVED).group_by(Item.owner_id).subquery()
+
+        owner_contracts = select(
+            Contract.owner_id,
+            func.count(Contract.id).label("total"),
+            func.count(Contract.id).filter(Contract.status == ContractStatus.COMPLETED).label("completed"),
+            func.avg(
+                extract("epoch", Contract.owner_signed_at - Contract.created_at)
+            ).filter(Contract.owner_signed_at.isnot(None)).label("response_seconds")
+        ).group_by(Contract.owner_id).subquery()
+
+        has_brand = Item.brand_key.isnot(None)
+        has_location = Item.location_key.isnot(None)
+
+        return select(
+            Item.id,
+            Item.category_id,
+            Item.owner_id,
+            case((has_brand, func.coalesce(BrandDemand.popularity_score, 0)), else_=0.5),
+            func.coalesce(category_stats.c.avg_price, 0),
+            func.coalesce(category_stats.c.median_price, 0),
+            func.coalesce(category_stats.c.total_items, 0),
+            func.least(func.coalesce(competition.c.competitors, 0) / float(COMPETITION_DENSITY_SCALE), 1.0),
+            case((has_location, func.coalesce(LocationDemand.demand_score, 0)), else_=0.5),
+            func.least(func.coalesce(contract_stats.c.bookings_7d, 0) / 7.0, 1.0),
+            func.least(func.coalesce(contract_stats.c.bookings_30d, 0) / 30.0, 1.0),
+            func.coalesce(contract_stats.c.cancellations, 0) * 1.0 / func.greatest(
+                func.coalesce(contract_stats.c.total, 0), 1
+            ),
+            func.coalesce(User.rating, 0),
+            func.coalesce(owner_items.c.item_count, 0),
+            func.coalesce(owner_contracts.c.completed, 0) * 1.0 / func.greatest(
+                func.coalesce(owner_contracts.c.total, 0), 1
+            ),
+            func.coalesce(
+                1.0 / (1.0 + func.greatest(owner_contracts.c.response_seconds, 0) / (OWNER_RESPONSE_SCALE_HOURS * 3600.0)),
+                OWNER_RESPONSE_DEFAULT_SCORE
+            ),
+            Item.price_per_day,
+            Item.status,
+            Item.brand_key,
+            Item.location_key
+        ).select_from(Item).join(
+            User, User.id == Item.owner_id
+        ).outerjoin(
+            category_stats, category_stats.c.category_id == Item.category_id
+        ).outerjoin(
+            BrandDemand, BrandDemand.brand_key == Item.brand_key
+        ).outerjoin(
+            LocationDemand, LocationDemand.location_key == Item.location_key
+        ).outerjoin(
+            contract_stats, contract_stats.c.item_id == Item.id
+        ).outerjoin(
+            competition, competition.c.item_id == Item.id
+        ).outerjoin(
+            owner_items, owner_items.c.owner_id == Item.owner_id
+        ).outerjoin(
+            owner_contracts, owner_contracts.c.owner_id == Item.owner_id
+        ).where(
+            Item.status != ItemStatus.ARCHIVED,
+            item_filter
+        )
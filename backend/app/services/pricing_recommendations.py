@@ -0,0 +1,208 @@
+"""
+Precomputed pricing recommendations.
+
+A nightly job scores every active item with the dynamic pricing model and
+upserts the results into ``pricing_recommendations`` together with the model
+version and computation time. The pricing engine serves rows from that table
+while they are valid: computed by the currently published model, for the
+item's current price and category, and not older than its stored features.
+Other items are priced by a lower tier and queued for a background
+recompute (at most once per PRICING_RECOMMENDATION_REFRESH_DEDUP_SECONDS).
+
+``Item.updated_at`` is not used: it also changes on every item view.
+"""
+
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import logging
+import uuid
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.models.item import Item, ItemStatus
+from app.models.pricing import ItemPricingFeatures, ItemPricingRecommendation
+from app.services.dynamic_pricing_model import DynamicPricingModel, PricingRecommendation, PRICING_MODEL_NAME
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+HEURISTIC_MODEL_VERSION = "heuristic"
+
+RECOMMENDATION_REFRESH_KEY = "pricing:recommendation_refresh:{item_id}"
+
+# Поля рекомендации, хранимые в таблице (кроме ключей и версии)
+RECOMMENDATION_FIELDS = [
+    "current_price",
+    "recommended_price",
+    "price_change_percentage",
+    "confidence_score",
+    "reasoning",
+    "expected_demand_change",
+    "market_position",
+    "seasonal_adjustment",
+    "competition_adjustment",
+    "demand_adjustment",
+    "estimated_bookings_increase",
+    "estimated_revenue_change",
+    "risk_assessment"
+]
+
+
+class PricingRecommendationStore:
+    """Read and refresh stored pricing recommendations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_fresh(self, item_ids: List[uuid.UUID]) -> Dict[uuid.UUID, PricingRecommendation]:
+        """
+        Get stored recommendations that are still valid.
+
+        A row is valid if it was computed by the current model version for the
+        item's current price and category, after its features were stored.
+
+        Args:
+            item_ids: Item IDs
+
+        Returns:
+            Recommendations by item (items without a valid row are omitted)
+        """
+        if not item_ids:
+            return {}
+
+        model_version = model_registry.current_version(PRICING_MODEL_NAME) or HEURISTIC_MODEL_VERSION
+
+        stale = or_(
+            ItemPricingRecommendation.model_version != model_version,
+            ItemPricingRecommendation.category_id != Item.category_id,
+            ItemPricingFeatures.computed_at > ItemPricingRecommendation.computed_at,
+            func.abs(ItemPricingRecommendation.current_price - Item.price_per_day) > 1e-8
+        )
+
+        rows = self.db.query(ItemPricingRecommendation).join(
+            Item, Item.id == ItemPricingRecommendation.item_id
+        ).outerjoin(
+            ItemPricingFeatures, ItemPricingFeatures.item_id == Item.id
+        ).filter(
+            ItemPricingRecommendation.item_id.in_(item_ids),
+            Item.status == ItemStatus.ACTIVE,
+            ~func.coalesce(stale, False)
+        ).all()
+
+        return {row.item_id: self._to_recommendation(row) for row in rows}
+
+    def compute_and_store(self, item_ids: List[uuid.UUID]) -> int:
+        """
+        Score items with one batched model call and upsert the results.
+
+        Args:
+            item_ids: Item IDs
+
+        Returns:
+            Number of stored recommendations
+        """
+        if not item_ids:
+            return 0
+
+        model = DynamicPricingModel(self.db)
+        recommendations = model.get_bulk_recommendations(item_ids)
+        if not recommendations:
+            return 0
+
+        items = {
+            item_id: (owner_id, category_id)
+            for item_id, owner_id, category_id in self.db.query(
+                Item.id, Item.owner_id, Item.category_id
+            ).filter(Item.id.in_([r.item_id for r in recommendations]))
+        }
+        model_version = model.model_version or HEURISTIC_MODEL_VERSION
+
+        values = [
+            {
+                "item_id": recommendation.item_id,
+                "owner_id": items[recommendation.item_id][0],
+                "category_id": items[recommendation.item_id][1],
+                "model_version": model_version,
+                **{field: getattr(recommendation, field) for field in RECOMMENDATION_FIELDS}
+            }
+            for recommendation in recommendations
+        ]
+
+        stmt = pg_insert(ItemPricingRecommendation).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ItemPricingRecommendation.item_id],
+            set_={
+                **{
+                    column: stmt.excluded[column]
+                    for column in ["owner_id", "category_id", "model_version", *RECOMMENDATION_FIELDS]
+                },
+                "computed_at": func.now()
+            }
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+
+        return len(values)
+
+    def active_item_batches(self, batch_size: int) -> List[List[str]]:
+        """
+        Split IDs of all active items into batches for parallel scoring.
+
+        Args:
+            batch_size: Items per batch
+
+        Returns:
+            Batches of item IDs (as strings, for task arguments)
+        """
+        item_ids = [
+            str(item_id) for (item_id,) in self.db.query(Item.id).filter(
+                Item.status == ItemStatus.ACTIVE
+            ).order_by(Item.category_id, Item.id)
+        ]
+        return [item_ids[i:i + batch_size] for i in range(0, len(item_ids), batch_size)]
+
+    def purge_inactive(self) -> int:
+        """
+        Delete recommendations of items that are no longer active.
+
+        Returns:
+            Number of deleted rows
+        """
+        active = self.db.query(Item.id).filter(
+            and_(Item.id == ItemPricingRecommendation.item_id, Item.status == ItemStatus.ACTIVE)
+        ).exists()
+
+        deleted = self.db.query(ItemPricingRecommendation).filter(~active).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+    def schedule_refresh(self, item_ids: List[uuid.UUID]) -> None:
+        """Recompute and persist recommendations of items in the background (deduplicated per item)."""
+        if redis_client is not None:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for item_id in item_ids:
+                    pipe.set(
+                        RECOMMENDATION_REFRESH_KEY.format(item_id=item_id), "1",
+                        nx=True, ex=settings.PRICING_RECOMMENDATION_REFRESH_DEDUP_SECONDS
+                    )
+                item_ids = [item_id for item_id, queued in zip(item_ids, pipe.execute()) if queued]
+            except Exception as e:
+                logger.warning(f"Failed to deduplicate pricing recommendation refresh: {e}")
+        if not item_ids:
+            return
+
+        try:
+            from app.tasks import compute_pricing_recommendations
+            compute_pricing_recommendations.delay([str(item_id) for item_id in item_ids])
+        except Exception as e:
+            logger.warning(f"Failed to queue pricing recommendations refresh: {e}")
+
+    def _to_recommendation(self, row: ItemPricingRecommendation) -> PricingRecommendation:
+        """Convert a stored row to a recommendation."""
+        return PricingRecommendation(
+            item_id=row.item_id,
+            **{field: getattr(row, field) for field in RECOMMENDATION_FIELDS}
+        )
@@ -7,189 +7,41 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc
 from datetime import datetime, timedelta
+from collections import Counter, defaultdict
 import uuid
 import numpy as np
 import logging
 from decimal import Decimal
 
-from app.models.item import Item, Category, ItemStatus
+from app.models.item import Item, ItemStatus
 from app.models.contract import Contract, ContractStatus
 from app.models.user import User
 from app.models.pricing import PricingHistory, AutoPricingConfiguration, PricingModelMetrics
 from app.utils.exceptions import NotFoundError, BadRequestError
+from app.core.config import settings
 from app.core.database import get_db
+from app.services.dynamic_pricing_model import PricingRecommendation
+from app.services.pricing_engine import PricingEngine, get_pricing_tier_stats
+from app.services.auto_pricing import AutoPricingExecutor
+from app.services.price_simulation import PriceElasticitySimulator
+from app.services.category_price_stats import CategoryPriceStats, mark_category_prices_changed
 
 logger = logging.getLogger(__name__)
 
 
-class PricingRecommendation:
-    """Класс для рекомендации по ценообразованию."""
-    
-    def __init__(self, **kwargs):
-        self.item_id = kwargs.get('item_id')
-        self.current_price = kwargs.get('current_price', 0.0)
-        self.recommended_price = kwargs.get('recommended_price', 0.0)
-        self.price_change_percentage = kwargs.get('price_change_percentage', 0.0)
-        self.confidence_score = kwargs.get('confidence_score', 0.0)
-        self.reasoning = kwargs.get('reasoning', [])
-        self.expected_demand_change = kwargs.get('expected_demand_change', 0.0)
-        self.market_position = kwargs.get('market_position', 'competitive')
-        self.seasonal_adjustment = kwargs.get('seasonal_adjustment', 1.0)
-        self.competition_adjustment = kwargs.get('competition_adjustment', 1.0)
-        self.demand_adjustment = kwargs.get('demand_adjustment', 1.0)
-        self.estimated_bookings_increase = kwargs.get('estimated_bookings_increase', 0.0)
-        self.estimated_revenue_change = kwargs.get('estimated_revenue_change', 0.0)
-        self.risk_assessment = kwargs.get('risk_assessment', 'medium')
-
-
-class PricingModel:
-    """ML модель для ценообразования."""
-    
-    def __init__(self):
-        self.seasonal_factors = {
-            'spring': 1.0,
-            'summer': 1.2,
-            'autumn': 0.9,
-            'winter': 0.8
-        }
-        
-        self.category_multipliers = {
-            'electronics': 1.1,
-            'vehicles': 1.3,
-            'tools': 0.9,
-            'sports': 1.15,
-            'home': 0.95
-        }
-    
-    def _get_season(self, date: datetime) -> str:
-        """Определяет сезон по дате."""
-        month = date.month
-        if month in [3, 4, 5]:
-            return 'spring'
-        elif month in [6, 7, 8]:
-            return 'summer'
-        elif month in [9, 10, 11]:
-            return 'autumn'
-        else:
-            return 'winter'
-    
-    def predict_optimal_price(self, item: Item, market_data: Dict) -> PricingRecommendation:
-        """Предсказывает оптимальную цену для товара."""
-        try:
-            current_price = float(item.price_per_day)
-            
-            # Сезонные корректировки
-            season = self._get_season(datetime.utcnow())
-            seasonal_factor = self.seasonal_factors.get(season, 1.0)
-            
-            # Категорийные корректировки
-            category_factor = self.category_multipliers.get(
-                item.category.name.lower() if item.category else 'other', 1.0
-            )
-            
-            # Анализ конкуренции (упрощенный)
-            avg_category_price = market_data.get('avg_category_price', current_price)
-            competition_factor = min(1.2, max(0.8, avg_category_price / current_price))
-            
-            # Анализ спроса (на основе просмотров и избранного)
-            demand_score = (item.views_count or 0) + (item.favorites_count or 0) * 2
-            demand_factor = min(1.3, max(0.7, 1 + (demand_score / 100) * 0.1))
-            
-            # Рейтинг товара
-            rating_factor = 1.0
-            if item.rating:
-                rating_factor = 0.9 + (float(item.rating) / 5.0) * 0.2
-            
-            # Расчет рекомендуемой цены
-            recommended_price = current_price * seasonal_factor * category_factor * competition_factor * demand_factor * rating_factor
-            
-            # Ограничиваем изменения
-            max_change = 0.3  # Максимум 30% изменения
-            price_change_ratio = recommended_price / current_price
-            if price_change_ratio > 1 + max_change:
-                recommended_price = current_price * (1 + max_change)
-            elif price_change_ratio < 1 - max_change:
-                recommended_price = current_price * (1 - max_change)
-            
-            price_change_percentage = ((recommended_price - current_price) / current_price) * 100
-            
-            # Формируем reasoning
-            reasoning = []
-            if abs(seasonal_factor - 1.0) > 0.05:
-                reasoning.append(f"Сезонная корректировка: {season} ({seasonal_factor:.2f})")
-            
-            if abs(competition_factor - 1.0) > 0.05:
-                reasoning.append(f"Конкурентная позиция: {competition_factor:.2f}")
-            
-            if abs(demand_factor - 1.0) > 0.05:
-                reasoning.append(f"Спрос: {demand_score} взаимодействий ({demand_factor:.2f})")
-            
-            if abs(rating_factor - 1.0) > 0.05:
-                reasoning.append(f"Рейтинг товара: {item.rating or 'нет'} ({rating_factor:.2f})")
-            
-            # Определяем рыночную позицию
-            if recommended_price > avg_category_price * 1.2:
-                market_position = 'premium'
-            elif recommended_price < avg_category_price * 0.8:
-                market_position = 'budget'
-            else:
-                market_position = 'competitive'
-            
-            # Оценка риска
-            if abs(price_change_percentage) > 20:
-                risk_assessment = 'high'
-            elif abs(price_change_percentage) > 10:
-                risk_assessment = 'medium'
-            else:
-                risk_assessment = 'low'
-            
-            # Оценка влияния на доходность
-            estimated_revenue_change = price_change_percentage * 0.7  # Упрощенная модель
-            
-            return PricingRecommendation(
-                item_id=item.id,
-                current_price=current_price,
-                recommended_price=round(recommended_price, 6),
-                price_change_percentage=round(price_change_percentage, 2),
-                confidence_score=0.8,  # Базовый уровень доверия
-                reasoning=reasoning,
-                expected_demand_change=round((demand_factor - 1) * 100, 1),
-                market_position=market_position,
-                seasonal_adjustment=seasonal_factor,
-                competition_adjustment=competition_factor,
-                demand_adjustment=demand_factor,
-                estimated_bookings_increase=round(demand_factor * 10, 1),
-                estimated_revenue_change=round(estimated_revenue_change, 1),
-                risk_assessment=risk_assessment
-            )
-            
-        except Exception as e:
-            logger.error(f"Error predicting price for item {item.id}: {e}")
-            # Возвращаем нейтральную рекомендацию
-            return PricingRecommendation(
-                item_id=item.id,
-                current_price=float(item.price_per_day),
-                recommended_price=float(item.price_per_day),
-                price_change_percentage=0.0,
-                confidence_score=0.0,
-                reasoning=["Ошибка в расчете рекомендации"],
-                market_position='competitive',
-                risk_assessment='medium'
-            )
-
-
 class PricingService:
     """Сервис для управления динамическим ценообразованием."""
     
     def __init__(self, db: Session):
         self.db = db
-        self.pricing_model = PricingModel()
+        self.pricing_engine = PricingEngine(db)
     
     def get_pricing_recommendation(
         self, 
         item_id: uuid.UUID, 
         user_id: uuid.UUID,
-        target_date: Optional[datetime] = None
+        target_date: Optional[datetime] = None,
+        budget_ms: Optional[float] = None
     ) -> PricingRecommendation:
         """
         Получить рекомендацию по ценообразованию для товара.
@@ -198,12 +50,13 @@ class PricingService:
             item_id: ID товара
             user_id: ID пользователя
             target_date: Целевая дата для анализа
+            budget_ms: Бюджет времени в мс (по умолчанию PRICING_LATENCY_BUDGET_MS)
             
         Returns:
-            PricingRecommendation: Рекомендация по ценообразованию
+            PricingRecommendation: Рекомендация по ценообразованию (с уровнем движка в tier)
         """
         # Проверяем, что товар принадлежит пользователю
-        item = self.db.query(Item).filter(
+        item = self.db.query(Item.id).filter(
             Item.id == item_id,
             Item.owner_id == user_id
         ).first()
@@ -211,56 +64,88 @@ class PricingService:
         if not item:
             raise NotFoundError("Item", str(item_id))
         
-        # Собираем рыночные данные
-        market_data = self._get_market_data(item)
-        
-        # Получаем рекомендацию от ML модели
-        recommendation = self.pricing_model.predict_optimal_price(item, market_data)
+        recommendations = self.pricing_engine.recommend([item_id], target_date, budget_ms)
+        if not recommendations:
+            raise NotFoundError("Item", str(item_id))
         
-        return recommendation
+        return recommendations[0]
     
     def get_bulk_recommendations(
         self, 
         user_id: uuid.UUID, 
         category_id: Optional[uuid.UUID] = None,
-        limit: Optional[int] = 50
+        limit: Optional[int] = 50,
+        budget_ms: Optional[float] = None
     ) -> List[PricingRecommendation]:
         """
         Получить рекомендации для всех товаров пользователя.
         
+        Товары оцениваются движком ценообразования: сохраненная рекомендация,
+        ML модель или эвристика - в пределах бюджета времени.
+        
         Args:
             user_id: ID пользователя
             category_id: Опциональный фильтр по категории
             limit: Максимальное количество рекомендаций
+            budget_ms: Бюджет времени в мс (по умолчанию PRICING_LATENCY_BUDGET_MS)
             
         Returns:
             List[PricingRecommendation]: Список рекомендаций
         """
-        query = self.db.query(Item).filter(
+        query = self.db.query(Item.id).filter(
             Item.owner_id == user_id,
             Item.status == ItemStatus.ACTIVE
         )
-        
         if category_id:
             query = query.filter(Item.category_id == category_id)
         
-        items = query.limit(limit).all()
-        
-        recommendations = []
-        for item in items:
-            try:
-                market_data = self._get_market_data(item)
-                recommendation = self.pricing_model.predict_optimal_price(item, market_data)
-                recommendations.append(recommendation)
-            except Exception as e:
-                logger.error(f"Error getting recommendation for item {item.id}: {e}")
-                continue
+        item_ids = [item_id for (item_id,) in query.limit(limit).all()]
+        recommendations = self.pricing_engine.recommend(item_ids, budget_ms=budget_ms)
         
         # Сортируем по потенциальному влиянию на доходность
         recommendations.sort(key=lambda x: abs(x.estimated_revenue_change), reverse=True)
         
         return recommendations
     
+    def simulate_prices(
+        self,
+        user_id: uuid.UUID,
+        item_ids: List[uuid.UUID],
+        min_change_pct: float = -50.0,
+        max_change_pct: float = 50.0,
+        step_pct: float = 1.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Смоделировать выручку товаров пользователя на сетке цен.
+        
+        Args:
+            user_id: ID пользователя
+            item_ids: ID товаров
+            min_change_pct: Минимальное изменение цены в %
+            max_change_pct: Максимальное изменение цены в %
+            step_pct: Шаг сетки в %
+            
+        Returns:
+            List[Dict]: Кривые выручки и цена с максимальной выручкой по каждому товару
+        """
+        if not item_ids or len(item_ids) > settings.PRICE_SIMULATION_MAX_ITEMS:
+            raise BadRequestError(f"Укажите от 1 до {settings.PRICE_SIMULATION_MAX_ITEMS} товаров")
+        if step_pct <= 0 or min_change_pct < -100 or min_change_pct >= max_change_pct:
+            raise BadRequestError("Некорректная ценовая сетка")
+        if (max_change_pct - min_change_pct) / step_pct + 1 > settings.PRICE_SIMULATION_MAX_POINTS:
+            raise BadRequestError(f"Не более {settings.PRICE_SIMULATION_MAX_POINTS} точек ценовой сетки")
+        
+        items = self.db.query(Item).filter(
+            Item.id.in_(item_ids),
+            Item.owner_id == user_id
+        ).all()
+        
+        if len(items) != len(set(item_ids)):
+            missing = set(item_ids) - {item.id for item in items}
+            raise NotFoundError("Item", str(next(iter(missing))))
+        
+        return PriceElasticitySimulator(self.db).simulate(items, min_change_pct, max_change_pct, step_pct)
+    
     def apply_pricing_recommendation(
         self, 
         item_id: uuid.UUID, 
@@ -321,7 +206,8 @@ class PricingService:
             market_factors={
                 'seasonal_adjustment': recommendation.seasonal_adjustment,
                 'competition_adjustment': recommendation.competition_adjustment,
-                'demand_adjustment': recommendation.demand_adjustment
+                'demand_adjustment': recommendation.demand_adjustment,
+                'tier': recommendation.tier
             }
         )
         
@@ -332,6 +218,7 @@ class PricingService:
         item.updated_at = datetime.utcnow()
         
         self.db.commit()
+        mark_category_prices_changed([item.category_id])
         
         return {
             "status": "applied",
@@ -356,18 +243,10 @@ class PricingService:
         Returns:
             Dict с инсайтами по категории
         """
-        # Базовая статистика по категории
-        category_stats = self.db.query(
-            func.count(Item.id).label('total_items'),
-            func.avg(Item.price_per_day).label('avg_price'),
-            func.min(Item.price_per_day).label('min_price'),
-            func.max(Item.price_per_day).label('max_price'),
-            func.avg(Item.views_count).label('avg_views'),
-            func.avg(Item.rating).label('avg_rating')
-        ).filter(
-            Item.category_id == category_id,
-            Item.status == ItemStatus.ACTIVE
-        ).first()
+        # Базовая статистика по категории (кэшированное распределение цен)
+        distribution = CategoryPriceStats().get(category_id)
+        avg_price = distribution.mean if distribution else 0.0
+        avg_views = distribution.avg_views if distribution else 0
         
         # Статистика спроса (контракты)
         demand_stats = self.db.query(
@@ -389,12 +268,13 @@ class PricingService:
         
         insights = {
             'basic_stats': {
-                'total_items': category_stats.total_items or 0,
-                'avg_price': float(category_stats.avg_price or 0),
-                'min_price': float(category_stats.min_price or 0),
-                'max_price': float(category_stats.max_price or 0),
-                'avg_views': category_stats.avg_views or 0,
-                'avg_rating': float(category_stats.avg_rating or 0)
+                'total_items': distribution.count if distribution else 0,
+                'avg_price': avg_price,
+                'min_price': distribution.min_price if distribution else 0.0,
+                'max_price': distribution.max_price if distribution else 0.0,
+                'median_price': distribution.median if distribution else 0.0,
+                'avg_views': avg_views,
+                'avg_rating': distribution.avg_rating if distribution else 0.0
             },
             'demand_stats': {
                 'total_bookings': demand_stats.total_bookings or 0,
@@ -412,11 +292,11 @@ class PricingService:
             ],
             'pricing_insights': {
                 'recommended_price_range': {
-                    'min': float(category_stats.avg_price or 0) * 0.8,
-                    'max': float(category_stats.avg_price or 0) * 1.2
+                    'min': avg_price * 0.8,
+                    'max': avg_price * 1.2
                 },
                 'market_saturation': 'medium',  # Упрощенная оценка
-                'growth_potential': 'high' if (category_stats.avg_views or 0) > 100 else 'medium'
+                'growth_potential': 'high' if avg_views > 100 else 'medium'
             }
         }
         
@@ -454,11 +334,13 @@ class PricingService:
         """
         start_date = datetime.utcnow() - timedelta(days=period_days)
         
-        # Получаем товары пользователя
-        user_items = self.db.query(Item).filter(
-            Item.owner_id == user_id,
-            Item.status == ItemStatus.ACTIVE
-        ).all()
+        # Категории товаров пользователя (сами товары не загружаем)
+        item_categories = dict(
+            self.db.query(Item.id, Item.category_id).filter(
+                Item.owner_id == user_id,
+                Item.status == ItemStatus.ACTIVE
+            ).all()
+        )
         
         # Получаем рекомендации для всех товаров
         recommendations = self.get_bulk_recommendations(user_id)
@@ -475,22 +357,11 @@ class PricingService:
         }
         
         # Анализ по категориям
-        category_analysis = {}
-        categories = self.db.query(Category).all()
-        
-        for category in categories:
-            category_items = [item for item in user_items if item.category_id == category.id]
-            if category_items:
-                category_recs = [r for r in recommendations if any(item.id == r.item_id for item in category_items)]
-                category_analysis[str(category.id)] = {
-                    'items_count': len(category_items),
-                    'avg_price_change': sum(r.price_change_percentage for r in category_recs) / len(category_recs) if category_recs else 0,
-                    'revenue_potential': sum(r.estimated_revenue_change for r in category_recs if r.estimated_revenue_change > 0)
-                }
+        category_analysis = self._analyze_categories(item_categories, recommendations)
         
         return {
             'period_days': period_days,
-            'total_items': len(user_items),
+            'total_items': len(item_categories),
             'recommendations_count': len(recommendations),
             'optimization_potential': {
                 'total_revenue_increase': total_revenue_increase,
@@ -502,6 +373,39 @@ class PricingService:
             'top_recommendations': recommendations[:5]  # Топ-5 рекомендаций
         }
     
+    def _analyze_categories(
+        self,
+        item_categories: Dict[uuid.UUID, uuid.UUID],
+        recommendations: List[PricingRecommendation]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Сводка рекомендаций по категориям за один проход по товарам и рекомендациям.
+        
+        Args:
+            item_categories: Категория каждого товара пользователя
+            recommendations: Рекомендации по товарам
+            
+        Returns:
+            Dict: Количество товаров, среднее изменение цены и потенциал выручки по категориям
+        """
+        items_count = Counter(item_categories.values())
+        category_recs: Dict[uuid.UUID, List[PricingRecommendation]] = defaultdict(list)
+        for r in recommendations:
+            category_id = item_categories.get(r.item_id)
+            if category_id is not None:
+                category_recs[category_id].append(r)
+        
+        category_analysis = {}
+        for category_id, count in items_count.items():
+            recs = category_recs.get(category_id, [])
+            category_analysis[str(category_id)] = {
+                'items_count': count,
+                'avg_price_change': sum(r.price_change_percentage for r in recs) / len(recs) if recs else 0,
+                'revenue_potential': sum(r.estimated_revenue_change for r in recs if r.estimated_revenue_change > 0)
+            }
+        
+        return category_analysis
+    
     def enable_auto_pricing(
         self, 
         user_id: uuid.UUID, 
@@ -629,73 +533,49 @@ class PricingService:
     
     def schedule_automatic_pricing_updates(self) -> Dict[str, Any]:
         """
-        Запланировать автоматические обновления цен (для админов).
+        Запустить автопрайсинг для всех конфигураций, у которых подошел срок (для админов).
+        
+        Сам запуск выполняет задача run_auto_pricing (она же вызывается по расписанию).
         
         Returns:
             Dict с результатом планирования
         """
-        # Получаем все активные конфигурации автопрайсинга
-        active_configs = self.db.query(AutoPricingConfiguration).filter(
-            AutoPricingConfiguration.enabled == True
-        ).all()
-        
-        updates_scheduled = 0
+        from app.tasks import run_auto_pricing
         
-        for config in active_configs:
-            # Проверяем, нужно ли обновление
-            if config.last_applied_at:
-                time_since_update = datetime.utcnow() - config.last_applied_at
-                if time_since_update.total_seconds() < config.update_frequency_hours * 3600:
-                    continue
-            
-            # Здесь должна быть логика постановки задачи в очередь (Celery)
-            # Пока просто считаем
-            updates_scheduled += 1
+        due_configs = self.db.query(func.count(AutoPricingConfiguration.id)).filter(
+            AutoPricingExecutor(self.db)._due()
+        ).scalar() or 0
+        task = run_auto_pricing.delay()
         
         return {
-            'total_configs': len(active_configs),
-            'updates_scheduled': updates_scheduled,
+            'due_configs': due_configs,
+            'task_id': task.id,
             'scheduled_at': datetime.utcnow()
         }
     
-    def _get_market_data(self, item: Item) -> Dict[str, Any]:
+    def get_pricing_tier_stats(self) -> Dict[str, Any]:
         """
-        Собрать рыночные данные для товара.
+        Получить метрики уровней движка ценообразования (для админов).
+        
+        Returns:
+            Dict с количеством запросов, пропусков по бюджету и задержками по уровням
+        """
+        return {
+            "default_budget_ms": settings.PRICING_LATENCY_BUDGET_MS,
+            "tiers": get_pricing_tier_stats()
+        }
+    
+    def get_auto_pricing_run(self, run_id: uuid.UUID) -> Dict[str, Any]:
+        """
+        Получить метрики запуска автопрайсинга (для админов).
         
         Args:
-            item: Товар
+            run_id: ID запуска
             
         Returns:
-            Dict с рыночными данными
+            Dict с прогрессом и пропускной способностью
         """
-        if not item.category_id:
-            return {'avg_category_price': float(item.price_per_day)}
-        
-        # Средняя цена в категории
-        avg_price_result = self.db.query(func.avg(Item.price_per_day)).filter(
-            Item.category_id == item.category_id,
-            Item.status == ItemStatus.ACTIVE,
-            Item.id != item.id
-        ).scalar()
-        
-        avg_category_price = float(avg_price_result) if avg_price_result else float(item.price_per_day)
-        
-        # Количество товаров в категории
-        category_items_count = self.db.query(func.count(Item.id)).filter(
-            Item.category_id == item.category_id,
-            Item.status == ItemStatus.ACTIVE
-        ).scalar() or 0
-        
-        # Активность в категории (контракты за последние 30 дней)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        category_activity = self.db.query(func.count(Contract.id)).join(Item).filter(
-            Item.category_id == item.category_id,
-            Contract.created_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        return {
-            'avg_category_price': avg_category_price,
-            'category_items_count': category_items_count,
-            'category_activity': category_activity,
-            'market_competition': 'high' if category_items_count > 100 else 'medium' if category_items_count > 20 else 'low'
-        }
\ No newline at end of file
+        run = AutoPricingExecutor(self.db).get_run(run_id)
+        if not run:
+            raise NotFoundError("AutoPricingRun", str(run_id))
+        return run
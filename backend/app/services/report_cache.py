@@ -0,0 +1,247 @@
+"""
+Shared cache for expensive report methods.
+
+``cached_report`` wraps a service method so that identical calls share one
+Redis entry:
+
+* datetime arguments are floored to REPORT_CACHE_ALIGN_SECONDS, so reports for
+  "now minus N days" requested a few seconds apart map to the same key;
+* on a miss only the caller holding the per-key lock computes the report,
+  other callers wait for its result instead of running the same query;
+* an entry older than REPORT_CACHE_TTL is still returned while a single
+  background refresh recomputes it (stale-while-revalidate).
+
+Waiting for another caller's result blocks the calling thread, so endpoints
+that use cached reports are plain ``def`` and run in the threadpool. Values
+are stored with their types (datetime, date, UUID, Decimal), so a cached
+result has the same types as a freshly computed one.
+"""
+
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.database import redis_client, get_read_session
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_KEY = "report:{name}:{digest}"
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-refresh")
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values json does not handle natively, keeping their type."""
+    if isinstance(value, datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"__type__": "uuid", "value": str(value)}
+    if isinstance(value, Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if hasattr(value, "item"):  # NumPy scalars
+        return value.item()
+    return str(value)
+
+
+# Восстановление типов, сохраненных _json_default
+_JSON_DECODERS = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "uuid": uuid.UUID,
+    "decimal": Decimal
+}
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    """Restore values serialized by _json_default."""
+    if len(obj) == 2 and obj.get("__type__") in _JSON_DECODERS and "value" in obj:
+        return _JSON_DECODERS[obj["__type__"]](obj["value"])
+    return obj
+
+
+def _align(value: Any) -> Any:
+    """Floor datetimes to the cache alignment window."""
+    if isinstance(value, datetime):
+        step = timedelta(seconds=settings.REPORT_CACHE_ALIGN_SECONDS)
+        return value - (value - datetime.min.replace(tzinfo=value.tzinfo)) % step
+    return value
+
+
+def _digest(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Stable digest of call arguments."""
+    raw = json.dumps([args, sorted(kwargs.items())], default=_json_default)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _read(key: str) -> Optional[Dict[str, Any]]:
+    """Read cache entry."""
+    try:
+        raw = redis_client.get(key)
+        return json.loads(raw, object_hook=_json_object_hook) if raw else None
+    except Exception as e:
+        logger.warning(f"Failed to read report cache {key}: {e}")
+        return None
+
+
+def _write(key: str, payload: str) -> None:
+    """Store serialized cache entry."""
+    try:
+        redis_client.set(key, payload, ex=settings.REPORT_CACHE_STALE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to write report cache {key}: {e}")
+
+
+def _compute_and_store(key: str, compute: Callable[[], Any]) -> Any:
+    """Compute report, store it and return it exactly as a cache read would."""
+    data = compute()
+    payload = json.dumps({"computed_at": time.time(), "data": data}, default=_json_default)
+    _write(key, payload)
+    return json.loads(payload, object_hook=_json_object_hook)["data"]
+
+
+def _acquire(lock_key: str) -> bool:
+    """Try to take the per-key computation lock."""
+    try:
+        return bool(redis_client.set(lock_key, "1", nx=True, ex=settings.REPORT_CACHE_LOCK_TIMEOUT))
+    except Exception as e:
+        logger.warning(f"Failed to lock {lock_key}: {e}")
+        return False
+
+
+def _release(lock_key: str) -> None:
+    """Release the computation lock."""
+    try:
+        redis_client.delete(lock_key)
+    except Exception as e:
+        logger.warning(f"Failed to unlock {lock_key}: {e}")
+
+
+def _refresh(key: str, compute: Callable[[], Any]) -> None:
+    """Background refresh holding the key lock."""
+    try:
+        _compute_and_store(key, compute)
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e}")
+    finally:
+        _release(f"{key}:lock")
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], Any],
+    refresh: Callable[[], Any],
+    ttl: int
+) -> Any:
+    """
+    Get cached report with single-flight computation and stale-while-revalidate.
+
+    Args:
+        key: Cache key
+        compute: Computes the report in the caller's context
+        refresh: Computes the report in a background thread (own DB session)
+        ttl: Seconds after which the entry is refreshed
+
+    Returns:
+        Report data
+    """
+    lock_key = f"{key}:lock"
+
+    entry = _read(key)
+    if entry is not None:
+        if time.time() - entry["computed_at"] > ttl and _acquire(lock_key):
+            _refresh_executor.submit(_refresh, key, refresh)
+        return entry["data"]
+
+    if _acquire(lock_key):
+        try:
+            return _compute_and_store(key, compute)
+        finally:
+            _release(lock_key)
+
+    # Отчет уже считает другой запрос: ждем его результат
+    deadline = time.monotonic() + settings.REPORT_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = _read(key)
+        if entry is not None:
+            return entry["data"]
+
+    return _compute_and_store(key, compute)
+
+
+def invalidate_reports(name: Optional[str] = None) -> int:
+    """
+    Drop cached reports.
+
+    Args:
+        name: Cache namespace to drop (all reports if None)
+
+    Returns:
+        Number of deleted keys
+    """
+    if redis_client is None:
+        return 0
+
+    pattern = REPORT_CACHE_KEY.format(name=name or "*", digest="*")
+    deleted = 0
+    for key in redis_client.scan_iter(match=pattern, count=500):
+        deleted += redis_client.delete(key)
+    return deleted
+
+
+def cached_report(name: str, ttl: Optional[int] = None) -> Callable:
+    """
+    Cache a service report method.
+
+    The service class must be constructible from a DB session; background
+    refreshes get their own read session.
+
+    Args:
+        name: Cache namespace (usually "<service>.<method>")
+        ttl: Freshness in seconds (default REPORT_CACHE_TTL)
+    """
+    def decorator(method: Callable) -> Callable:
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if redis_client is None or not settings.REPORT_CACHE_ENABLED:
+                return method(self, *args, **kwargs)
+
+            # Позиционные, именованные и пропущенные (по умолчанию) аргументы
+            # дают один и тот же ключ
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {key: _align(value) for key, value in list(bound.arguments.items())[1:]}
+            bound.arguments.update(arguments)
+            args, kwargs = bound.args[1:], bound.kwargs
+            cache_key = REPORT_CACHE_KEY.format(name=name, digest=_digest((), arguments))
+
+            def refresh():
+                db = get_read_session(f"report:{name}")
+                try:
+                    return method(type(self)(db), *args, **kwargs)
+                finally:
+                    db.close()
+
+            return get_or_compute(
+                cache_key,
+                lambda: method(self, *args, **kwargs),
+                refresh,
+                ttl or settings.REPORT_CACHE_TTL
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,190 @@
+"""
+Search query and impression tracking.
+
+Counts live in Redis sorted sets bucketed by UTC day: one set of normalized
+queries and one set of item impressions (how often an item was shown in
+search results). Recording is a single pipelined round trip. Each daily set is
+periodically trimmed to its heaviest members, so memory stays bounded no
+matter how many distinct queries users type.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime, timedelta
+import logging
+import random
+import re
+import unicodedata
+import uuid
+
+from app.core.config import settings
+from app.core.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+SEARCH_QUERIES_KEY = "search:queries:{day}"
+SEARCH_IMPRESSIONS_KEY = "search:impressions:{day}"
+SEARCH_TRENDING_KEY = "search:trending:{days}:{day}"
+
+# Доля вызовов, на которых обрезаем дневной набор до top-N
+TRIM_PROBABILITY = 0.01
+MAX_QUERY_LENGTH = 100
+
+
+def normalize_search_query(query: Optional[str]) -> Optional[str]:
+    """
+    Normalize search query for counting.
+
+    Args:
+        query: Raw query
+
+    Returns:
+        Lowercased query with collapsed whitespace or None if too short
+    """
+    if not query:
+        return None
+
+    normalized = unicodedata.normalize("NFKC", query).lower()
+    normalized = re.sub(r"\s+", " ", normalized).strip()[:MAX_QUERY_LENGTH]
+    return normalized if len(normalized) >= 2 else None
+
+
+def _day_keys(template: str, days: int, offset: int = 0) -> List[str]:
+    """Keys of daily buckets for the last `days` days, skipping `offset` most recent."""
+    today = datetime.utcnow().date()
+    return [
+        template.format(day=(today - timedelta(days=delta)).strftime("%Y%m%d"))
+        for delta in range(offset, offset + days)
+    ]
+
+
+def record_search(query: Optional[str], item_ids: Iterable[uuid.UUID]) -> None:
+    """
+    Record a search query and the items shown for it.
+
+    Best-effort: never raises and does nothing when Redis is unavailable.
+
+    Args:
+        query: Raw search query
+        item_ids: IDs of items on the returned page
+    """
+    if redis_client is None or not settings.SEARCH_TRACKING_ENABLED:
+        return
+
+    normalized = normalize_search_query(query)
+    if normalized is None:
+        return
+
+    day = datetime.utcnow().strftime("%Y%m%d")
+    queries_key = SEARCH_QUERIES_KEY.format(day=day)
+    impressions_key = SEARCH_IMPRESSIONS_KEY.format(day=day)
+    ttl = settings.SEARCH_TRACKING_RETENTION_DAYS * 86400
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zincrby(queries_key, 1, normalized)
+        for item_id in item_ids:
+            pipe.zincrby(impressions_key, 1, str(item_id))
+        pipe.expire(queries_key, ttl)
+        pipe.expire(impressions_key, ttl)
+
+        if random.random() < TRIM_PROBABILITY:
+            # Оставляем только самые частые запросы дня
+            pipe.zremrangebyrank(queries_key, 0, -(settings.SEARCH_TRACKING_MAX_QUERIES_PER_DAY + 1))
+
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record search query: {e}")
+
+
+def get_trending_searches(days: int = 30, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Get most frequent queries in the last `days` days with growth vs the previous window.
+
+    Args:
+        days: Window length in days
+        limit: Number of queries
+
+    Returns:
+        Queries with counts, previous window counts and growth in percent
+        (previous_count and growth are None when the previous window is
+        not fully within SEARCH_TRACKING_RETENTION_DAYS)
+    """
+    if redis_client is None:
+        return []
+
+    day = datetime.utcnow().strftime("%Y%m%d")
+    current_key = SEARCH_TRENDING_KEY.format(days=days, day=day)
+    previous_key = f"{current_key}:previous"
+
+    # Дневные наборы старше срока хранения удалены: неполное предыдущее
+    # окно дало бы бессмысленный рост
+    has_previous = 2 * days <= settings.SEARCH_TRACKING_RETENTION_DAYS
+
+    try:
+        # Объединение дневных наборов кэшируется на несколько минут
+        if not redis_client.exists(current_key):
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zunionstore(current_key, _day_keys(SEARCH_QUERIES_KEY, days))
+            pipe.expire(current_key, settings.SEARCH_TRENDING_CACHE_SECONDS)
+            if has_previous:
+                pipe.zunionstore(previous_key, _day_keys(SEARCH_QUERIES_KEY, days, offset=days))
+                pipe.expire(previous_key, settings.SEARCH_TRENDING_CACHE_SECONDS)
+            pipe.execute()
+
+        top = redis_client.zrevrange(current_key, 0, limit - 1, withscores=True)
+        if not top:
+            return []
+
+        if has_previous:
+            previous_counts = redis_client.zmscore(previous_key, [query for query, _ in top])
+        else:
+            previous_counts = [None] * len(top)
+    except Exception as e:
+        logger.warning(f"Failed to read search trends: {e}")
+        return []
+
+    trends = []
+    for (query, count), previous in zip(top, previous_counts):
+        previous = int(previous or 0) if has_previous else None
+        trends.append({
+            "query": query,
+            "count": int(count),
+            "previous_count": previous,
+            "growth": round((count - previous) / previous * 100, 2) if previous else None
+        })
+
+    return trends
+
+
+def get_item_search_impressions(item_ids: List[uuid.UUID], days: int = 7) -> Dict[uuid.UUID, int]:
+    """
+    Get how often items were shown in search results in the last `days` days.
+
+    Args:
+        item_ids: Item IDs
+        days: Window length in days
+
+    Returns:
+        Impressions by item ID (0 when unknown or Redis is unavailable)
+    """
+    counts = {item_id: 0 for item_id in item_ids}
+    if redis_client is None or not item_ids:
+        return counts
+
+    members = [str(item_id) for item_id in item_ids]
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in _day_keys(SEARCH_IMPRESSIONS_KEY, days):
+            pipe.zmscore(key, members)
+        daily_scores = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to read search impressions: {e}")
+        return counts
+
+    for scores in daily_scores:
+        for item_id, score in zip(item_ids, scores or []):
+            if score:
+                counts[item_id] += int(score)
+
+    return counts
@@ -0,0 +1,115 @@
+"""
+Cached snapshots of expensive aggregate reports.
+
+A snapshot is a JSON document stored in Redis together with the time it was
+computed. Readers accept a snapshot up to ``max_staleness`` seconds old; an
+older snapshot is still served while a background refresh is scheduled, so a
+dashboard load costs one Redis GET no matter how large the tables grow. The
+report is computed inline only when no snapshot exists yet (or Redis is down).
+"""
+
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime
+import json
+import logging
+
+from app.core.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "snapshot:{name}"
+SNAPSHOT_REFRESH_LOCK_KEY = "snapshot:{name}:refreshing"
+
+
+def read_snapshot(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Read snapshot.
+
+    Args:
+        name: Snapshot name
+
+    Returns:
+        Snapshot with "computed_at" (unix time) and "data" keys or None
+    """
+    if redis_client is None:
+        return None
+
+    try:
+        raw = redis_client.get(SNAPSHOT_KEY.format(name=name))
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"Failed to read snapshot {name}: {e}")
+        return None
+
+
+def write_snapshot(name: str, data: Dict[str, Any], ttl: int) -> None:
+    """
+    Store snapshot.
+
+    Args:
+        name: Snapshot name
+        data: Report data (JSON-serializable)
+        ttl: Seconds to keep the snapshot in Redis
+    """
+    if redis_client is None:
+        return
+
+    try:
+        payload = {"computed_at": datetime.utcnow().timestamp(), "data": data}
+        redis_client.set(SNAPSHOT_KEY.format(name=name), json.dumps(payload, default=str), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Failed to write snapshot {name}: {e}")
+    finally:
+        try:
+            redis_client.delete(SNAPSHOT_REFRESH_LOCK_KEY.format(name=name))
+        except Exception:
+            pass
+
+
+def snapshot_age(snapshot: Dict[str, Any]) -> float:
+    """Get snapshot age in seconds."""
+    return datetime.utcnow().timestamp() - float(snapshot.get("computed_at", 0))
+
+
+def get_snapshot(
+    name: str,
+    compute: Callable[[], Dict[str, Any]],
+    max_staleness: int,
+    ttl: int,
+    schedule_refresh: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Get report from snapshot, refreshing it when needed.
+
+    Args:
+        name: Snapshot name
+        compute: Computes the report from the database
+        max_staleness: Maximum acceptable snapshot age in seconds (0 = always recompute)
+        ttl: Seconds to keep the snapshot in Redis
+        schedule_refresh: Enqueues a background refresh of this snapshot
+
+    Returns:
+        Report data
+    """
+    snapshot = read_snapshot(name) if max_staleness > 0 else None
+
+    if snapshot is not None:
+        if snapshot_age(snapshot) > max_staleness and schedule_refresh is not None:
+            _schedule_refresh_once(name, schedule_refresh, max_staleness)
+        return snapshot["data"]
+
+    data = compute()
+    write_snapshot(name, data, ttl)
+    return data
+
+
+def _schedule_refresh_once(name: str, schedule_refresh: Callable[[], Any], lock_seconds: int) -> None:
+    """Enqueue refresh unless one is already pending for this snapshot."""
+    try:
+        acquired = redis_client.set(
+            SNAPSHOT_REFRESH_LOCK_KEY.format(name=name), "1", nx=True, ex=max(lock_seconds, 30)
+        )
+        if acquired:
+            schedule_refresh()
+    except Exception as e:
+        logger.warning(f"Failed to schedule snapshot refresh for {name}: {e}")
@@ -0,0 +1,88 @@
+"""
+Streaming access to ML training data.
+
+Training queries are read through server-side cursors in chunks of
+ML_TRAINING_CHUNK_SIZE rows, so models are fitted chunk by chunk and memory
+does not grow with the history. Rows are split into training and holdout sets
+by a stable hash of a key column, so every pass over the data sees the same
+split.
+"""
+
+from typing import Dict, Iterator, Optional
+from sqlalchemy.orm import Session
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+
+def iter_frames(db: Session, statement, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Execute a query with a server-side cursor and yield its rows in chunks.
+
+    Args:
+        db: Database session
+        statement: Select or text() statement
+        chunk_size: Rows per chunk (default ML_TRAINING_CHUNK_SIZE)
+
+    Yields:
+        DataFrame per chunk with the query's column names
+    """
+    chunk_size = chunk_size or settings.ML_TRAINING_CHUNK_SIZE
+    result = db.execute(
+        statement,
+        execution_options={"stream_results": True, "yield_per": chunk_size}
+    )
+    columns = list(result.keys())
+    for rows in result.partitions(chunk_size):
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def holdout_mask(keys: pd.Series, fraction: Optional[float] = None) -> np.ndarray:
+    """
+    Stable train/holdout split.
+
+    Args:
+        keys: Row keys (e.g. IDs)
+        fraction: Holdout share (default ML_TRAINING_HOLDOUT_FRACTION)
+
+    Returns:
+        Boolean mask of holdout rows
+    """
+    fraction = settings.ML_TRAINING_HOLDOUT_FRACTION if fraction is None else fraction
+    hashes = pd.util.hash_pandas_object(keys.astype(str), index=False).to_numpy()
+    return (hashes % 1000) < int(fraction * 1000)
+
+
+class StreamingRegressionMetrics:
+    """MSE, MAE and R² accumulated over chunks."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum_y = 0.0
+        self.sum_y2 = 0.0
+        self.squared_error = 0.0
+        self.absolute_error = 0.0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        """Add a chunk of targets and predictions."""
+        y_true = np.asarray(y_true, dtype=np.float64)
+        error = y_true - np.asarray(y_pred, dtype=np.float64)
+        self.count += len(y_true)
+        self.sum_y += y_true.sum()
+        self.sum_y2 += np.square(y_true).sum()
+        self.squared_error += np.square(error).sum()
+        self.absolute_error += np.abs(error).sum()
+
+    def result(self) -> Dict[str, float]:
+        """Metrics over all chunks seen."""
+        if self.count == 0:
+            return {"mse": 0.0, "mae": 0.0, "r2": 0.0}
+
+        total_variance = self.sum_y2 - self.sum_y ** 2 / self.count
+        return {
+            "mse": self.squared_error / self.count,
+            "mae": self.absolute_error / self.count,
+            "r2": 1 - self.squared_error / total_variance if total_variance > 0 else 0.0
+        }
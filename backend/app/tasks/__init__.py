@@ -5,10 +5,13 @@ Celery tasks for background processing.
 ИСПРАВЛЕНО: Убраны несуществующие таски и добавлена отладка
 """
 
+from celery import group
 from app.core.celery import celery_app
-from app.core.database import SessionLocal
+from app.core.config import settings
+from app.core.database import SessionLocal, get_read_session
 from app.services.email import EmailService
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -102,28 +105,362 @@ def cleanup_expired_tokens():
         return {"success": False, "error": str(e)}
 
 @celery_app.task
-def update_item_analytics():
+def update_item_analytics(full_rebuild: bool = False):
     """
-    Update item analytics and statistics.
+    Update daily analytics rollups from the last high-water mark.
+    
+    Args:
+        full_rebuild: Rebuild the whole backfill window
     """
     try:
         logger.info("Starting item analytics update")
         
-        # Базовая логика обновления аналитики
         db = SessionLocal()
         try:
-            # Здесь можно добавить логику обновления аналитики
-            # Например, пересчет рейтингов, просмотров и т.д.
-            pass
+            from app.services.analytics_rollup import AnalyticsRollupService
+            
+            result = AnalyticsRollupService(db).update_daily_rollups(full_rebuild=full_rebuild)
         finally:
             db.close()
         
-        logger.info("✅ Item analytics updated successfully")
-        return {"success": True}
+        logger.info(f"✅ Item analytics updated successfully from {result['from_date']}")
+        return {"success": True, **result}
     except Exception as e:
         logger.error(f"❌ Failed to update analytics: {str(e)}")
         return {"success": False, "error": str(e)}
 
+@celery_app.task
+def refresh_pricing_features(full_rebuild: bool = False):
+    """
+    Refresh the pricing feature store.
+    
+    Args:
+        full_rebuild: Recompute all items instead of changed ones
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.pricing_features import PricingFeatureStore
+            summary = PricingFeatureStore(db).refresh(full_rebuild=full_rebuild)
+        finally:
+            db.close()
+        
+        logger.info(f"✅ Pricing features refreshed: {summary['items_updated']} items")
+        return {"success": True, **summary}
+    except Exception as e:
+        logger.error(f"❌ Failed to refresh pricing features: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def refresh_pricing_dimensions():
+    """
+    Recompute brand share and location demand tables used by pricing features.
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.pricing_features import PricingFeatureStore
+            counts = PricingFeatureStore(db).refresh_demand_tables()
+        finally:
+            db.close()
+        
+        logger.info(f"✅ Pricing dimensions refreshed: {counts['brands']} brands, {counts['locations']} locations")
+        return {"success": True, **counts}
+    except Exception as e:
+        logger.error(f"❌ Failed to refresh pricing dimensions: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def refresh_category_price_stats():
+    """
+    Recompute price distributions of categories whose items changed.
+    """
+    try:
+        # Распределения считаются на primary (реплика может не видеть изменение)
+        from app.services.category_price_stats import CategoryPriceStats
+        refreshed = CategoryPriceStats().refresh()
+        
+        return {"success": True, "categories": len(refreshed)}
+    except Exception as e:
+        logger.error(f"❌ Failed to refresh category price stats: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def refresh_pricing_recommendations():
+    """
+    Recompute stored pricing recommendations for all active items.
+    
+    The pricing feature store is fully rebuilt first, then items are split
+    into batches scored in parallel by compute_pricing_recommendations.
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.pricing_features import PricingFeatureStore
+            from app.services.pricing_recommendations import PricingRecommendationStore
+            
+            # Иначе полный пересчет признаков позже сделал бы все рекомендации устаревшими
+            PricingFeatureStore(db).refresh(full_rebuild=True)
+            
+            store = PricingRecommendationStore(db)
+            purged = store.purge_inactive()
+            batches = store.active_item_batches(settings.PRICING_RECOMMENDATIONS_BATCH_SIZE)
+        finally:
+            db.close()
+        
+        if batches:
+            group(compute_pricing_recommendations.s(batch) for batch in batches).apply_async()
+        
+        logger.info(f"✅ Queued {len(batches)} pricing recommendation batches, purged {purged}")
+        return {"success": True, "batches": len(batches), "purged": purged}
+    except Exception as e:
+        logger.error(f"❌ Failed to schedule pricing recommendations: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def compute_pricing_recommendations(item_ids: list):
+    """
+    Score a batch of items and store their pricing recommendations.
+    
+    Args:
+        item_ids: Item IDs
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.pricing_recommendations import PricingRecommendationStore
+            
+            stored = PricingRecommendationStore(db).compute_and_store(
+                [uuid.UUID(item_id) for item_id in item_ids]
+            )
+        finally:
+            db.close()
+        
+        return {"success": True, "stored": stored}
+    except Exception as e:
+        logger.error(f"❌ Failed to compute pricing recommendations: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def fit_price_elasticities():
+    """
+    Re-estimate per-category price elasticities from pricing history.
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.price_simulation import PriceElasticitySimulator
+            categories = PriceElasticitySimulator(db).fit_category_elasticities()
+        finally:
+            db.close()
+        
+        logger.info(f"✅ Fitted price elasticities for {categories} categories")
+        return {"success": True, "categories": categories}
+    except Exception as e:
+        logger.error(f"❌ Failed to fit price elasticities: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def run_auto_pricing():
+    """
+    Claim due auto-pricing configs and fan them out to chunk tasks.
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.auto_pricing import AutoPricingExecutor
+            run, chunks = AutoPricingExecutor(db).start_run()
+            run_id = str(run.id)
+        finally:
+            db.close()
+        
+        if chunks:
+            group(apply_auto_pricing_chunk.s(run_id, chunk) for chunk in chunks).apply_async()
+        
+        logger.info(f"✅ Auto-pricing run {run_id}: {sum(map(len, chunks))} configs in {len(chunks)} chunks")
+        return {"success": True, "run_id": run_id, "chunks": len(chunks)}
+    except Exception as e:
+        logger.error(f"❌ Failed to start auto-pricing run: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def apply_auto_pricing_chunk(run_id: str, config_ids: list):
+    """
+    Apply auto-pricing for a chunk of configs.
+    
+    Args:
+        run_id: Auto-pricing run ID
+        config_ids: Config IDs
+    """
+    try:
+        db = SessionLocal()
+        try:
+            from app.services.auto_pricing import AutoPricingExecutor
+            stats = AutoPricingExecutor(db).run_chunk(
+                uuid.UUID(run_id), [uuid.UUID(config_id) for config_id in config_ids]
+            )
+        finally:
+            db.close()
+        
+        return {"success": stats["errors"] == 0, **stats}
+    except Exception as e:
+        logger.error(f"❌ Failed to apply auto-pricing chunk: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task(
+    bind=True,
+    time_limit=settings.MODEL_TRAINING_TIME_LIMIT,
+    soft_time_limit=settings.MODEL_TRAINING_TIME_LIMIT - 300
+)
+def train_ml_model(self, model_name: str):
+    """
+    Train an ML model and publish it as a new registry version.
+    
+    Progress is reported as PROGRESS state with stage and percent.
+    
+    Args:
+        model_name: Registry model name (pricing, rental_prediction)
+    """
+    def report(stage: str, percent: int):
+        self.update_state(state="PROGRESS", meta={"model": model_name, "stage": stage, "progress": percent})
+    
+    try:
+        logger.info(f"Starting training of model {model_name}")
+        
+        # Обучение только читает данные; версия публикуется реестром через основную БД
+        db = get_read_session("task:train_ml_model")
+        try:
+            from app.services.model_registry import model_registry
+            
+            if model_name == "pricing":
+                from app.services.dynamic_pricing_model import DynamicPricingModel
+                if not DynamicPricingModel(db).train_models(progress=report):
+                    raise ValueError("Pricing model training failed, see worker logs")
+            elif model_name == "rental_prediction":
+                from app.services.analytics import AnalyticsService
+                AnalyticsService(db)._train_rental_prediction_model(progress=report)
+            else:
+                raise ValueError(f"Unknown model: {model_name}")
+        finally:
+            db.close()
+        
+        version = model_registry.current_version(model_name)
+        logger.info(f"✅ Model {model_name} trained, version {version}")
+        return {"success": True, "model": model_name, "version": version}
+    except Exception as e:
+        logger.error(f"❌ Failed to train model {model_name}: {str(e)}")
+        return {"success": False, "model": model_name, "error": str(e)}
+
+@celery_app.task
+def purge_old_notifications():
+    """
+    Archive or delete read notifications older than the retention period.
+    """
+    try:
+        logger.info("Starting notifications retention cleanup")
+        
+        db = SessionLocal()
+        try:
+            from app.services.notification import NotificationService
+            
+            result = NotificationService(db).purge_read_notifications()
+        finally:
+            db.close()
+        
+        logger.info(f"✅ Notifications cleanup completed: {result['processed']} rows ({result['mode']})")
+        return {"success": True, **result}
+    except Exception as e:
+        logger.error(f"❌ Failed to purge notifications: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def refresh_dashboard_snapshots(periods: list = None, include_admin: bool = True):
+    """
+    Recompute cached dashboard snapshots.
+    
+    Args:
+        periods: Analytics dashboard periods to refresh (default: all)
+        include_admin: Refresh admin overview as well
+    """
+    try:
+        db = get_read_session("task:refresh_dashboard_snapshots")
+        try:
+            from app.services.analytics import AnalyticsService
+            from app.services.admin import AdminService
+            
+            if periods is None:
+                periods = ["7d", "30d", "90d", "1y"]
+            
+            analytics_service = AnalyticsService(db)
+            for period in periods:
+                analytics_service.refresh_dashboard_stats(period)
+            
+            if include_admin:
+                AdminService(db).refresh_dashboard_overview()
+        finally:
+            db.close()
+        
+        return {"success": True, "periods": periods, "admin": include_admin}
+    except Exception as e:
+        logger.error(f"❌ Failed to refresh dashboard snapshots: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@celery_app.task
+def export_data_task(
+    export_type: str,
+    format: str,
+    requested_by: str,
+    start_date: str = None,
+    end_date: str = None
+):
+    """
+    Write a data export to disk and notify the requesting admin.
+    
+    Args:
+        export_type: users or analytics
+        format: csv, json or parquet
+        requested_by: Admin user ID
+        start_date: Range start (ISO format, analytics only)
+        end_date: Range end (ISO format, analytics only)
+    """
+    try:
+        read_db = get_read_session("task:export_data")
+        db = SessionLocal()
+        try:
+            from datetime import datetime
+            import uuid
+            from app.services.admin import AdminService
+            from app.services.notification import NotificationService
+            from app.models.notification import NotificationType
+            
+            admin_service = AdminService(read_db)
+            if export_type == "users":
+                file_url = admin_service.export_users_data(format)
+            else:
+                file_url = admin_service.export_analytics_data(
+                    datetime.fromisoformat(start_date),
+                    datetime.fromisoformat(end_date),
+                    format
+                )
+            
+            NotificationService(db).create_notification(
+                user_id=uuid.UUID(requested_by),
+                title="Export ready",
+                message=f"Your {export_type} export ({format}) is ready for download",
+                type=NotificationType.SUCCESS,
+                action_url=file_url,
+                action_text="Download"
+            )
+        finally:
+            read_db.close()
+            db.close()
+        
+        logger.info(f"✅ Export written: {file_url}")
+        return {"success": True, "file_url": file_url}
+    except Exception as e:
+        logger.error(f"❌ Failed to export {export_type} data: {str(e)}")
+        return {"success": False, "error": str(e)}
+
 @celery_app.task
 def send_contract_notification_task(user_id: str, contract_id: str, notification_type: str):
     """
@@ -0,0 +1,96 @@
+"""
+Benchmark: nested category loops vs grouped category analysis.
+
+Runs without a database: synthetic items and recommendations are fed to the
+old per-category scan and to PricingService._analyze_categories, so the
+numbers isolate the in-memory aggregation of get_pricing_analytics.
+
+Usage (from backend/):
+    python -m benchmarks.pricing_analytics_grouping --items 5000 --categories 200
+"""
+
+from types import SimpleNamespace
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from app.services.pricing_service import PricingService
+
+
+def make_data(rng: np.random.Generator, item_count: int, category_count: int, recommendation_count: int):
+    """Synthetic categories, items and recommendations for part of the items."""
+    categories = [SimpleNamespace(id=uuid.uuid4()) for _ in range(category_count)]
+    # Пользователь торгует только в части категорий
+    used = categories[:max(1, category_count // 4)]
+    items = [
+        SimpleNamespace(id=uuid.uuid4(), category_id=used[rng.integers(len(used))].id)
+        for _ in range(item_count)
+    ]
+    recommendations = [
+        SimpleNamespace(
+            item_id=item.id,
+            price_change_percentage=float(rng.uniform(-20, 20)),
+            estimated_revenue_change=float(rng.uniform(-10, 30))
+        )
+        for item in rng.choice(items, size=min(recommendation_count, item_count), replace=False)
+    ]
+    return categories, items, recommendations
+
+
+def nested_category_analysis(categories, user_items, recommendations):
+    """Per-category scan the grouped analysis replaces."""
+    category_analysis = {}
+    for category in categories:
+        category_items = [item for item in user_items if item.category_id == category.id]
+        if category_items:
+            category_recs = [r for r in recommendations if any(item.id == r.item_id for item in category_items)]
+            category_analysis[str(category.id)] = {
+                'items_count': len(category_items),
+                'avg_price_change': sum(r.price_change_percentage for r in category_recs) / len(category_recs) if category_recs else 0,
+                'revenue_potential': sum(r.estimated_revenue_change for r in category_recs if r.estimated_revenue_change > 0)
+            }
+    return category_analysis
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--recommendations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    categories, items, recommendations = make_data(rng, args.items, args.categories, args.recommendations)
+    service = PricingService(db=None)
+
+    def run_nested():
+        return nested_category_analysis(categories, items, recommendations)
+
+    def run_grouped():
+        return service._analyze_categories({item.id: item.category_id for item in items}, recommendations)
+
+    identical = run_nested() == run_grouped()
+
+    timings = {}
+    for name, run in (("nested", run_nested), ("grouped", run_grouped)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best
+
+    print(f"items:           {args.items}")
+    print(f"categories:      {args.categories}")
+    print(f"recommendations: {len(recommendations)}")
+    print(f"nested:          {timings['nested'] * 1000:.1f} ms")
+    print(f"grouped:         {timings['grouped'] * 1000:.1f} ms")
+    print(f"speedup:         {timings['nested'] / timings['grouped']:.1f}x")
+    print(f"identical:       {identical}")
+
+
+if __name__ == "__main__":
+    main()
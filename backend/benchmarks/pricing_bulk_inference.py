@@ -0,0 +1,139 @@
+"""
+Benchmark: per-item pricing loop vs matrix-batched inference.
+
+Runs without a database: models are trained on synthetic data and both paths
+score the same pre-extracted features and competition data, so the numbers
+isolate the inference and post-processing cost.
+
+Usage (from backend/):
+    python -m benchmarks.pricing_bulk_inference --items 1000
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import argparse
+import time
+import uuid
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from app.services.dynamic_pricing_model import DynamicPricingModel, PricingFeatures
+
+
+def make_features(rng: np.random.Generator, count: int, target_date: datetime):
+    """Synthetic items, features and competition data."""
+    items, features, competition = [], [], []
+    categories = [uuid.uuid4() for _ in range(10)]
+
+    for _ in range(count):
+        price = float(rng.uniform(0.01, 2.0))
+        item = SimpleNamespace(
+            id=uuid.uuid4(),
+            category_id=categories[rng.integers(len(categories))],
+            price_per_day=price,
+            created_at=target_date - timedelta(days=int(rng.integers(1, 700)))
+        )
+        items.append(item)
+        features.append(PricingFeatures(
+            item_id=item.id,
+            category_id=item.category_id,
+            current_price=price,
+            item_age_days=(target_date - item.created_at).days,
+            item_condition_score=float(rng.choice([1.0, 0.9, 0.7, 0.5, 0.3])),
+            has_images=bool(rng.integers(2)),
+            description_length=int(rng.integers(0, 2000)),
+            brand_popularity_score=float(rng.random()),
+            views_count=int(rng.integers(0, 500)),
+            favorites_count=int(rng.integers(0, 50)),
+            total_reviews=int(rng.integers(0, 30)),
+            average_rating=float(rng.uniform(1, 5)),
+            rental_history_count=int(rng.integers(0, 20)),
+            season='summer',
+            month=target_date.month,
+            day_of_week=target_date.weekday(),
+            is_holiday=False,
+            is_weekend=target_date.weekday() >= 5,
+            category_avg_price=float(rng.uniform(0.01, 2.0)),
+            category_median_price=float(rng.uniform(0.01, 2.0)),
+            similar_items_count=int(rng.integers(0, 100)),
+            competition_density=float(rng.random()),
+            location_demand_score=float(rng.random()),
+            recent_search_count=int(rng.integers(0, 100)),
+            booking_rate_7d=float(rng.random()),
+            booking_rate_30d=float(rng.random()),
+            cancellation_rate=float(rng.random() * 0.3),
+            owner_rating=float(rng.uniform(1, 5)),
+            owner_total_items=int(rng.integers(1, 20)),
+            owner_completion_rate=float(rng.random()),
+            owner_response_time_score=0.8
+        ))
+        percentile = float(rng.random())
+        competition.append({
+            'competitor_count': int(rng.integers(0, 30)),
+            'avg_price': float(rng.uniform(0.01, 2.0)),
+            'price_adjustment': -0.05 if percentile >= 0.8 else 0.1 if percentile <= 0.2 else 0.02
+        })
+
+    return items, features, competition
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    target_date = datetime(2026, 7, 15)
+
+    model = DynamicPricingModel(db=None)
+    X_train = rng.random((2000, 28))
+    model.scaler = StandardScaler().fit(X_train)
+    model.demand_model = GradientBoostingRegressor(n_estimators=100, max_depth=6, random_state=42).fit(
+        model.scaler.transform(X_train), rng.random(2000)
+    )
+    model.price_model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42).fit(
+        model.scaler.transform(X_train), rng.uniform(0.01, 2.0, 2000)
+    )
+
+    items, features, competition = make_features(rng, args.items, target_date)
+    competition_arrays = {
+        key: np.array([row[key] for row in competition], dtype=float)
+        for key in ('competitor_count', 'avg_price', 'price_adjustment')
+    }
+
+    def run_loop():
+        return [
+            model._score_single(item, item_features, item_competition, target_date)
+            for item, item_features, item_competition in zip(items, features, competition)
+        ]
+
+    def run_batch():
+        return model._score_batch(items, features, competition_arrays, target_date)
+
+    loop_result, batch_result = run_loop(), run_batch()
+    mismatches = sum(
+        abs(a.recommended_price - b.recommended_price) > 0.011 or a.risk_assessment != b.risk_assessment
+        for a, b in zip(loop_result, batch_result)
+    )
+
+    timings = {}
+    for name, run in (("loop", run_loop), ("batch", run_batch)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best
+
+    print(f"items:      {args.items}")
+    print(f"loop:       {timings['loop'] * 1000:.1f} ms")
+    print(f"batch:      {timings['batch'] * 1000:.1f} ms")
+    print(f"speedup:    {timings['loop'] / timings['batch']:.1f}x")
+    print(f"mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Price rank and quantile lookups on the cached category distribution.
+"""
+
+import numpy as np
+
+from app.services.category_price_stats import CategoryPriceDistribution, share_below
+
+
+def make_distribution(prices: np.ndarray, steps: int = 100) -> CategoryPriceDistribution:
+    return CategoryPriceDistribution(
+        count=len(prices),
+        total=float(prices.sum()),
+        min_price=float(prices.min()),
+        max_price=float(prices.max()),
+        quantiles=np.quantile(prices, np.linspace(0, 1, steps + 1)).tolist(),
+        avg_views=0.0,
+        avg_rating=0.0,
+        computed_at=0.0
+    )
+
+
+def test_quantile_lookups_match_exact_percentiles_on_grid():
+    prices = np.random.default_rng(3).lognormal(0, 1, 2000)
+    distribution = make_distribution(prices)
+
+    assert np.isclose(distribution.median, np.median(prices))
+    assert np.isclose(distribution.quantile(0.9), np.quantile(prices, 0.9))
+    assert np.isclose(distribution.mean, prices.mean())
+
+
+def test_share_below_approximates_exact_rank():
+    rng = np.random.default_rng(5)
+    prices = np.round(rng.lognormal(0, 1, 5000), 4)
+    distribution = make_distribution(prices)
+    probes = np.concatenate([rng.choice(prices, 300), [prices.min(), prices.max(), prices.max() + 1, 0.0]])
+
+    exact = np.array([(prices < price).mean() for price in probes])
+    approx = share_below(np.asarray(distribution.quantiles), probes)
+
+    assert np.abs(exact - approx).max() < 0.01
+    assert approx[-4] == 0.0 and approx[-2] == 1.0 and approx[-1] == 0.0
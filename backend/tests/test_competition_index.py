@@ -0,0 +1,41 @@
+"""
+Binary-search lookups of the in-memory competition index.
+"""
+
+import uuid
+
+import numpy as np
+
+from app.services.competition_index import CategoryPriceIndex
+
+
+def make_index(prices: np.ndarray) -> CategoryPriceIndex:
+    prices = np.sort(prices)
+    return CategoryPriceIndex(prices=prices, item_ids=np.array([uuid.uuid4() for _ in prices], dtype=object))
+
+
+def test_band_counts_and_ranks_match_brute_force():
+    prices = np.round(np.random.default_rng(11).lognormal(0, 0.5, 1000), 2)
+    index = make_index(prices)
+    probes = np.concatenate([prices[:100], [0.0, 1.0, 100.0]])
+
+    in_band = index.count_between(probes * 0.7, probes * 1.3)
+    below = index.count_below(probes)
+
+    assert in_band.tolist() == [int(((prices >= p * 0.7) & (prices <= p * 1.3)).sum()) for p in probes]
+    assert below.tolist() == [int((prices < p).sum()) for p in probes]
+
+
+def test_nearest_and_median_excluding_self():
+    prices = np.array([1.0, 2.0, 2.0, 3.0, 5.0, 8.0])
+    index = make_index(prices)
+
+    lower, higher = index.nearest(np.array([2.0, 0.5, 9.0]))
+    np.testing.assert_array_equal(lower, [1.0, np.nan, 8.0])
+    np.testing.assert_array_equal(higher, [3.0, 1.0, np.nan])
+
+    for price in prices:
+        others = list(prices)
+        others.remove(price)
+        assert index.median_excluding(price, exclude=True) == np.median(others)
+    assert index.median_excluding(4.0, exclude=False) == np.median(prices)
@@ -0,0 +1,38 @@
+"""
+Vectorized revenue simulation over price grids.
+"""
+
+import numpy as np
+
+from app.services.price_simulation import price_multipliers, revenue_curves
+
+
+def test_price_multipliers_cover_grid_inclusively():
+    multipliers = price_multipliers(-50, 50, 1)
+
+    assert len(multipliers) == 101
+    assert multipliers[0] == 0.5 and multipliers[-1] == 1.5
+    assert np.isclose(multipliers[50], 1.0)
+
+
+def test_revenue_curves_match_scalar_model_and_analytic_optimum():
+    current = np.array([10.0, 2.0, 5.0])
+    baseline = np.array([10.0, 4.0, 1.0])
+    elasticity = np.array([-1.5, -0.5, -3.0])
+    multipliers = price_multipliers(-50, 50, 0.1)
+
+    prices, bookings, revenue = revenue_curves(current, baseline, elasticity, multipliers)
+
+    assert prices.shape == bookings.shape == revenue.shape == (3, len(multipliers))
+    for i in range(3):
+        for j in (0, 123, 700, len(multipliers) - 1):
+            change = multipliers[j] - 1
+            expected = baseline[i] * max(1 + elasticity[i] * change, 0)
+            assert np.isclose(bookings[i, j], expected)
+            assert np.isclose(revenue[i, j], current[i] * multipliers[j] * expected)
+
+    # Для линейного спроса выручка максимальна при цене current * (e - 1) / (2e)
+    best = multipliers[revenue.argmax(axis=1)]
+    analytic = np.clip((elasticity - 1) / (2 * elasticity), 0.5, 1.5)
+    np.testing.assert_allclose(best, analytic, atol=1e-3)
+    assert (bookings >= 0).all()
@@ -0,0 +1,35 @@
+"""
+Vectorized heuristic tier of the pricing engine.
+"""
+
+import numpy as np
+
+from app.services.pricing_engine import heuristic_prices, HEURISTIC_MAX_CHANGE
+
+
+def test_factors_are_bounded_and_price_change_is_capped():
+    current = np.array([100.0, 100.0, 100.0, 10.0])
+    avg_price = np.array([100.0, 1000.0, 1.0, 10.0])
+    interactions = np.array([0, 10000, 0, 100])
+    ratings = np.array([0.0, 5.0, 1.0, 4.0])
+    category = np.array([1.0, 1.3, 0.9, 1.0])
+
+    result = heuristic_prices(current, avg_price, interactions, ratings, category, 1.2)
+
+    assert result['competition_factor'].tolist() == [1.0, 1.2, 0.8, 1.0]
+    assert result['demand_factor'].tolist() == [1.0, 1.3, 1.0, 1.1]
+    assert result['rating_factor'][0] == 1.0
+    assert np.all(np.abs(result['recommended_price'] / current - 1) <= HEURISTIC_MAX_CHANGE + 1e-12)
+    assert result['price_change_percentage'][1] == np.float64(30.0)
+
+
+def test_matches_single_item_formula():
+    current, avg_price, interactions, rating = 50.0, 60.0, 40, 4.5
+
+    result = heuristic_prices(
+        np.array([current]), np.array([avg_price]), np.array([interactions]), np.array([rating]),
+        np.array([0.95]), 0.9
+    )
+
+    expected = current * 0.9 * 0.95 * 1.2 * 1.04 * (0.9 + rating / 5.0 * 0.2)
+    assert np.isclose(result['recommended_price'][0], expected)
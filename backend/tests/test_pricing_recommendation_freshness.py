@@ -0,0 +1,107 @@
+"""
+Stored pricing recommendations stay valid across item views.
+"""
+
+from datetime import datetime, timedelta
+import re
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.item import Item, ItemStatus, ItemView
+from app.models.contract import Contract
+from app.models.pricing import ItemPricingFeatures, ItemPricingRecommendation
+from app.services.item import ItemService
+from app.services.pricing_features import PricingFeatureStore
+from app.services.pricing_recommendations import PricingRecommendationStore
+from app.services import pricing_recommendations
+
+TABLES = [Item.__table__, ItemView.__table__, Contract.__table__,
+          ItemPricingFeatures.__table__, ItemPricingRecommendation.__table__]
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def register_functions(connection, _):
+        # Функции вычисляемых brand_key/location_key
+        connection.create_function("btrim", 1, lambda value: value.strip() if value is not None else None,
+                                   deterministic=True)
+        connection.create_function(
+            "regexp_replace", 4,
+            lambda value, pattern, replacement, _flags: re.sub(pattern, replacement, value) if value is not None else None,
+            deterministic=True
+        )
+
+    Base.metadata.create_all(engine, tables=TABLES)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def stored_item(db, monkeypatch):
+    monkeypatch.setattr(pricing_recommendations.model_registry, "current_version", lambda name: "v1")
+
+    now = datetime.utcnow()
+    item = Item(
+        title="Drill", description="Cordless drill", category_id=uuid.uuid4(), owner_id=uuid.uuid4(),
+        price_per_day=10, brand="Bosch", location="Berlin", status=ItemStatus.ACTIVE,
+        slug="drill", created_at=now - timedelta(days=2)
+    )
+    db.add(item)
+    db.flush()
+
+    db.add(ItemPricingFeatures(
+        item_id=item.id, category_id=item.category_id, owner_id=item.owner_id,
+        item_price=item.price_per_day, item_status=item.status,
+        brand_key=item.brand_key, location_key=item.location_key,
+        computed_at=now - timedelta(days=1)
+    ))
+    db.add(ItemPricingRecommendation(
+        item_id=item.id, owner_id=item.owner_id, category_id=item.category_id,
+        current_price=10.0, recommended_price=11.0, price_change_percentage=10.0, confidence_score=0.8,
+        reasoning=[], expected_demand_change=0.05, market_position="average",
+        seasonal_adjustment=0.0, competition_adjustment=0.0, demand_adjustment=0.0,
+        estimated_bookings_increase=0.0, estimated_revenue_change=0.0, risk_assessment="low",
+        model_version="v1", computed_at=now - timedelta(hours=1)
+    ))
+    db.commit()
+    return item
+
+
+def changed_item_ids(db, since):
+    return {item_id for (item_id,) in db.execute(PricingFeatureStore(db)._changed_item_ids(since))}
+
+
+def test_item_view_keeps_stored_recommendation_fresh(db, stored_item):
+    since = datetime.utcnow() - timedelta(minutes=30)
+
+    assert ItemService(db).add_item_view(stored_item.id)
+    db.refresh(stored_item)
+    assert stored_item.views_count == 1 and stored_item.updated_at is not None
+
+    assert stored_item.id not in changed_item_ids(db, since)
+    assert stored_item.id in PricingRecommendationStore(db).get_fresh([stored_item.id])
+
+
+def test_price_change_marks_item_changed_and_recommendation_stale(db, stored_item):
+    since = datetime.utcnow() - timedelta(minutes=30)
+
+    stored_item.price_per_day = 12
+    db.commit()
+
+    assert stored_item.id in changed_item_ids(db, since)
+    assert PricingRecommendationStore(db).get_fresh([stored_item.id]) == {}
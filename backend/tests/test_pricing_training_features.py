@@ -0,0 +1,132 @@
+"""
+Parity of the vectorized pricing training-set builder with the per-row one.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.services.dynamic_pricing_model import DynamicPricingModel, PricingFeatures, FEATURE_VECTOR_COLUMNS
+
+
+def make_training_rows(count: int, seed: int = 7) -> list:
+    """Rows shaped like the _prepare_training_data query result."""
+    rng = np.random.default_rng(seed)
+    # Праздники и выходные попадают в выборку
+    dates = [datetime(2025, 12, 25, 10), datetime(2025, 12, 31, 23), datetime(2026, 1, 1, 0, 30)]
+    rows = []
+    for index in range(count):
+        created_at = dates[index] if index < len(dates) else datetime(2026, 1, 1) + timedelta(
+            days=int(rng.integers(0, 365)), seconds=int(rng.integers(0, 86400))
+        )
+        start_date = created_at + timedelta(days=int(rng.integers(0, 10)))
+        rows.append((
+            uuid.uuid4(),
+            uuid.uuid4(),
+            Decimal(str(round(float(rng.uniform(0.01, 20.0)), 8))),
+            start_date,
+            start_date + timedelta(days=int(rng.integers(0, 14)), hours=int(rng.integers(0, 24))),
+            created_at,
+            "completed" if rng.random() < 0.6 else "active",
+            Decimal(str(round(float(rng.uniform(0.01, 2.0)), 8))),
+            uuid.uuid4(),
+            "good",
+            int(rng.integers(0, 1000)),
+            int(rng.integers(0, 100)),
+            Decimal(str(round(float(rng.uniform(0, 5)), 2))),
+            int(rng.integers(0, 50)),
+            int(rng.integers(0, 30)),
+            "Almaty",
+            "Brand",
+            created_at - timedelta(days=int(rng.integers(0, 700)), seconds=int(rng.integers(0, 86400))),
+            Decimal(str(round(float(rng.uniform(0, 5)), 2))),
+            int(rng.integers(0, 40))
+        ))
+    return rows
+
+
+COLUMNS = [
+    "contract_id", "item_id", "total_price", "start_date", "end_date", "created_at", "status",
+    "price_per_day", "category_id", "condition", "views_count", "favorites_count", "rating",
+    "total_reviews", "rentals_count", "location", "brand", "item_created_at", "owner_rating",
+    "completed_deals"
+]
+
+
+def rowwise_features_and_targets(model: DynamicPricingModel, data: pd.DataFrame):
+    """Per-row builder the vectorized one replaces."""
+    features, demand_targets, price_targets = [], [], []
+
+    for _, row in data.iterrows():
+        item_features = PricingFeatures(
+            item_id=row['item_id'],
+            category_id=row['category_id'],
+            current_price=float(row['price_per_day']),
+            item_age_days=(row['created_at'] - row['item_created_at']).days,
+            item_condition_score=0.7,
+            has_images=True,
+            description_length=100,
+            brand_popularity_score=0.5,
+            views_count=row['views_count'] or 0,
+            favorites_count=row['favorites_count'] or 0,
+            total_reviews=row['total_reviews'] or 0,
+            average_rating=float(row['rating'] or 0),
+            rental_history_count=row['rentals_count'] or 0,
+            season=model._get_season(row['created_at']),
+            month=row['created_at'].month,
+            day_of_week=row['created_at'].weekday(),
+            is_holiday=model._is_holiday(row['created_at']),
+            is_weekend=row['created_at'].weekday() >= 5,
+            category_avg_price=float(row['price_per_day']),
+            category_median_price=float(row['price_per_day']),
+            similar_items_count=10,
+            competition_density=0.5,
+            location_demand_score=0.5,
+            recent_search_count=0,
+            booking_rate_7d=0.1,
+            booking_rate_30d=0.3,
+            cancellation_rate=0.1,
+            owner_rating=float(row['owner_rating'] or 0),
+            owner_total_items=1,
+            owner_completion_rate=0.8,
+            owner_response_time_score=0.7
+        )
+        features.append(model._features_to_vector(item_features))
+        demand_targets.append(1.0 if row['status'] == 'completed' else 0.5)
+        price_targets.append(float(row['total_price']) / max((row['end_date'] - row['start_date']).days, 1))
+
+    return np.array(features), np.array(demand_targets), np.array(price_targets)
+
+
+def test_vectorized_training_features_match_rowwise():
+    model = DynamicPricingModel(db=None)
+    data = pd.DataFrame(make_training_rows(500), columns=COLUMNS)
+
+    X, y_demand, y_price = model._prepare_features_and_targets(data)
+    X_ref, y_demand_ref, y_price_ref = rowwise_features_and_targets(model, data)
+
+    assert X.shape == (500, len(FEATURE_VECTOR_COLUMNS))
+    assert X.dtype == np.float32 and y_demand.dtype == np.float32 and y_price.dtype == np.float32
+    np.testing.assert_allclose(X, X_ref.astype(np.float32), rtol=1e-6)
+    np.testing.assert_array_equal(y_demand, y_demand_ref.astype(np.float32))
+    np.testing.assert_allclose(y_price, y_price_ref.astype(np.float32), rtol=1e-6)
+
+    is_holiday = X[:, FEATURE_VECTOR_COLUMNS.index('is_holiday')]
+    assert is_holiday[:3].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_vectorized_training_features_treat_nulls_as_zero():
+    model = DynamicPricingModel(db=None)
+    rows = make_training_rows(3)
+    rows[0] = rows[0][:10] + (None, None, None, None, None) + rows[0][15:18] + (None, None)
+    data = pd.DataFrame(rows, columns=COLUMNS)
+
+    X, _, _ = model._prepare_features_and_targets(data)
+
+    for name in ('views_count', 'favorites_count', 'average_rating', 'total_reviews',
+                 'rental_history_count', 'owner_rating'):
+        assert X[0, FEATURE_VECTOR_COLUMNS.index(name)] == 0.0
+    assert not np.isnan(X).any()